@@ -0,0 +1,73 @@
+"""
+Measure the latency of ``User.create`` as a tenant grows.
+
+Requires a MongoDB server at ``TEST_MONGO_URI``, whose database is dropped.
+Run with ``make benchmark BENCHMARK=create_user``.
+"""
+
+import asyncio
+from datetime import datetime
+
+from sop_chatbot import session
+from sop_chatbot.models.users import CreateCommonUserRequest, User
+from sop_chatbot.services.auth import Auth
+from sop_chatbot.services.sequences import sequences
+
+from .utils import measure, print_table, reset_database, summarize
+
+OWNER = '001.0001.000'
+TENANT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+REPEAT = 200
+BATCH_SIZE = 10_000
+
+
+async def fill_tenant(size: int):
+    password = Auth.encrypt_password('password')
+    now = datetime.now()
+    for start in range(0, size, BATCH_SIZE):
+        await session.db.users.insert_many(
+            [
+                {
+                    'name': f'user {number}',
+                    'password': password,
+                    'role': 'user',
+                    'company': '002.0001.001',
+                    'departments': ['003.0001.001'],
+                    'owner': OWNER,
+                    'registration': User.format_registration(OWNER, number),
+                    'created_at': now,
+                    'updated_at': now,
+                }
+                for number in range(
+                    start + 1, min(start + BATCH_SIZE, size) + 1
+                )
+            ]
+        )
+    await sequences.seed({User.sequence_key(OWNER): size})
+
+
+async def create_user():
+    await User.create(
+        CreateCommonUserRequest(
+            name='benchmark',
+            password='password',
+            company='002.0001.001',
+            departments=['003.0001.001'],
+        ),
+        owner=OWNER,
+    )
+
+
+async def main():
+    rows = []
+    for size in TENANT_SIZES:
+        reset_database()
+        await fill_tenant(size)
+        rows.append(
+            {'users': size, **summarize(await measure(create_user, REPEAT))}
+        )
+    print_table('User.create latency (ms) by tenant size', rows)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Compare the throughput of the Motor and the native PyMongo asyncio
+backends, with many requests reading users concurrently.
+
+Requires a MongoDB server at ``TEST_MONGO_URI``, whose database is dropped.
+Run with ``make benchmark BENCHMARK=drivers``.
+"""
+
+import asyncio
+import time
+
+from sop_chatbot.config import settings
+from sop_chatbot.migrations.indexes import create_indexes
+from sop_chatbot.models.mixins import PaginationRequest
+from sop_chatbot.models.users import User
+
+from .create_user import OWNER, fill_tenant
+from .utils import print_table, reset_database
+
+TENANT_SIZE = 1_000
+CONCURRENCY = (1, 10, 100)
+REQUESTS = 2_000
+VIEWER = User.format_registration(OWNER, 1)
+
+
+async def get_user(number: int):
+    await User.get(User.format_registration(OWNER, number % TENANT_SIZE + 1))
+
+
+async def list_users(number: int):
+    await User.get_all(PaginationRequest(), OWNER, VIEWER)
+
+
+OPERATIONS = (get_user, list_users)
+
+
+async def throughput(operation, concurrency: int) -> float:
+    """
+    Run ``REQUESTS`` operations, ``concurrency`` at a time.
+
+    :return: The operations completed per second.
+    :rtype: float
+    """
+    numbers = iter(range(REQUESTS))
+
+    async def worker():
+        for number in numbers:
+            await operation(number)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    rows = []
+    for driver in ('motor', 'pymongo'):
+        settings.MONGO_DRIVER = driver
+        reset_database()
+        await create_indexes()
+        await fill_tenant(TENANT_SIZE)
+        for operation in OPERATIONS:
+            for concurrency in CONCURRENCY:
+                rows.append(
+                    {
+                        'driver': driver,
+                        'operation': operation.__name__,
+                        'concurrency': concurrency,
+                        'ops/s': await throughput(operation, concurrency),
+                    }
+                )
+    print_table('Throughput by Mongo backend', rows)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Compare the per document cost of validating a model with ``cls(**obj)``
+against the trusted ``hydrate`` path used for documents read from Mongo,
+for ``User``, ``Admin``, ``Company`` and ``Department``.
+
+Does not need a database. Run with ``make benchmark BENCHMARK=hydration``.
+"""
+
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+from bson import ObjectId
+
+from sop_chatbot.models.companies import Company
+from sop_chatbot.models.departments import Department
+from sop_chatbot.models.mixins import hydrate
+from sop_chatbot.models.users import Admin, User
+
+from .utils import print_table
+
+DOCUMENTS = 10_000
+REPEAT = 20
+
+
+def document(**fields) -> dict:
+    now = datetime.now()
+    return {
+        '_id': ObjectId(),
+        'registration': '001.0001.001',
+        'owner': '001.0001.000',
+        'created_at': now,
+        'updated_at': now,
+        **fields,
+    }
+
+
+MODELS = {
+    User: document(
+        name='user',
+        name_lower='user',
+        password='$2b$12$' + 'x' * 53,
+        role='user',
+        company='002.0001.001',
+        departments=['003.0001.001', '003.0001.002'],
+        token_version=0,
+    ),
+    Admin: document(
+        name='admin',
+        name_lower='admin',
+        password='$2b$12$' + 'x' * 53,
+        role='admin',
+        email='admin@example.com',
+        company_name='company',
+        company_description='description',
+        company='002.0001.001',
+        departments=['003.0001.001'],
+        token_version=0,
+    ),
+    Company: document(
+        name='company', name_lower='company', description='description'
+    ),
+    Department: document(
+        name='department',
+        name_lower='department',
+        description='description',
+        company='002.0001.001',
+    ),
+}
+
+
+def validate(model, obj: dict):
+    return model(id=str(obj['_id']), **obj)
+
+
+def per_document(function: Callable, model, objs: list[dict]) -> float:
+    """
+    :return: The fastest of ``REPEAT`` runs, in microseconds per document.
+    :rtype: float
+    """
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for obj in objs:
+            function(model, obj)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(objs) * 1_000_000
+
+
+def main():
+    rows = []
+    for model, obj in MODELS.items():
+        objs = [dict(obj, _id=ObjectId()) for _ in range(DOCUMENTS)]
+        validated = per_document(validate, model, objs)
+        hydrated = per_document(hydrate, model, objs)
+        rows.append(
+            {
+                'model': model.__name__,
+                'validate': validated,
+                'hydrate': hydrated,
+                'speedup': validated / hydrated,
+            }
+        )
+    print_table('Hydration cost (µs per document)', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare importing users one ``User.create`` at a time with
+``User.import_rows``, and the peak memory of imports as files grow.
+
+Requires a MongoDB server at ``TEST_MONGO_URI``, whose database is dropped.
+Run with ``make benchmark BENCHMARK=import_users``.
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+import orjson
+
+from sop_chatbot.models.users import CreateCommonUserRequest, User
+from sop_chatbot.services.imports import NDJSON, read_rows
+
+from .create_user import OWNER
+from .utils import print_table, reset_database
+
+FILE_SIZES = (1_000, 10_000, 100_000)
+SEQUENTIAL_LIMIT = 10_000
+CHUNK_SIZE = 64 * 1024
+
+
+def user(number: int) -> dict:
+    return {
+        'name': f'user {number}',
+        'password': 'password',
+        'company': '002.0001.001',
+        'departments': ['003.0001.001'],
+    }
+
+
+async def body(size: int):
+    """
+    Stream an NDJSON file of ``size`` users in chunks, like a request body,
+    without holding the whole file in memory.
+    """
+    chunk = b''
+    for number in range(size):
+        chunk += orjson.dumps(user(number)) + b'\n'
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = b''
+    yield chunk
+
+
+async def create_sequentially(size: int):
+    for number in range(size):
+        await User.create(CreateCommonUserRequest(**user(number)), OWNER)
+
+
+async def import_rows(size: int):
+    await User.import_rows(read_rows(body(size), NDJSON), OWNER)
+
+
+async def main():
+    rows = []
+    for size in FILE_SIZES:
+        row = {'users': size}
+        if size <= SEQUENTIAL_LIMIT:
+            reset_database()
+            start = time.perf_counter()
+            await create_sequentially(size)
+            row['create (s)'] = time.perf_counter() - start
+        else:
+            row['create (s)'] = '-'
+        reset_database()
+        tracemalloc.start()
+        start = time.perf_counter()
+        await import_rows(size)
+        row['import (s)'] = time.perf_counter() - start
+        row['peak (MiB)'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        rows.append(row)
+    print_table('Importing users by file size', rows)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
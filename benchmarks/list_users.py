@@ -0,0 +1,84 @@
+"""
+Measure the latency of listing users, comparing the reads ``get_all``
+issues now with the sequential user, count and page reads it used to.
+
+Requires a MongoDB server at ``TEST_MONGO_URI``, whose database is dropped.
+Run with ``make benchmark BENCHMARK=list_users``.
+"""
+
+import asyncio
+
+from sop_chatbot import session
+from sop_chatbot.migrations.indexes import create_indexes
+from sop_chatbot.models.mixins import PaginationRequest
+from sop_chatbot.models.users import User
+
+from .create_user import OWNER, fill_tenant
+from .utils import measure, print_table, reset_database, summarize
+
+TENANT_SIZES = (1_000, 10_000, 100_000)
+PAGES = (0, 50)
+REPEAT = 200
+VIEWER = User.format_registration(OWNER, 1)
+
+
+async def sequential(pagination_request: PaginationRequest):
+    user = await session.db.users.find_one({'registration': VIEWER})
+    find = {'owner': OWNER, 'company': user['company']}
+    objs = (
+        session.db.users.find(find)
+        .skip(pagination_request.skip * pagination_request.limit)
+        .limit(pagination_request.limit)
+    )
+    await session.db.users.count_documents(find)
+    return [User(id=str(obj['_id']), **obj) async for obj in objs]
+
+
+async def exact_total(pagination_request: PaginationRequest):
+    return await User.get_all(pagination_request, OWNER, VIEWER)
+
+
+async def cached_total(pagination_request: PaginationRequest):
+    return await User.get_all(
+        pagination_request.model_copy(update={'cached_total': True}),
+        OWNER,
+        VIEWER,
+    )
+
+
+async def no_total(pagination_request: PaginationRequest):
+    return await User.get_all(
+        pagination_request.model_copy(update={'include_total': False}),
+        OWNER,
+        VIEWER,
+    )
+
+
+STRATEGIES = (sequential, exact_total, cached_total, no_total)
+
+
+async def main():
+    rows = []
+    for size in TENANT_SIZES:
+        reset_database()
+        await create_indexes()
+        await fill_tenant(size)
+        for page in PAGES:
+            pagination_request = PaginationRequest(skip=page)
+            for strategy in STRATEGIES:
+                timings = await measure(
+                    lambda: strategy(pagination_request), REPEAT
+                )
+                rows.append(
+                    {
+                        'users': size,
+                        'page': page + 1,
+                        'strategy': strategy.__name__,
+                        **summarize(timings),
+                    }
+                )
+    print_table('Listing users latency (ms) by tenant size', rows)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Measure the latency of signing up an admin, comparing ``Admin.create``
+with the sequential company, department and admin creations it used to
+run.
+
+Requires a MongoDB server at ``TEST_MONGO_URI``, whose database is dropped.
+Transactions also require it to be a replica set member.
+Run with ``make benchmark BENCHMARK=signup``.
+"""
+
+import asyncio
+from datetime import datetime
+
+from sop_chatbot import session
+from sop_chatbot.config import settings
+from sop_chatbot.migrations.indexes import create_indexes
+from sop_chatbot.models.companies import Company, CreateCompanyRequest
+from sop_chatbot.models.departments import (
+    CreateDepartmentRequest,
+    Department,
+)
+from sop_chatbot.models.users import Admin, CreateAdminRequest, UserRoles
+from sop_chatbot.services.auth import Auth
+
+from .utils import measure, print_table, reset_database, summarize
+
+REPEAT = 200
+
+
+def signup_request() -> CreateAdminRequest:
+    return CreateAdminRequest(
+        name='benchmark',
+        password='password',
+        role=UserRoles.ADMIN,
+        email='benchmark@example.com',
+        company_name='Benchmark',
+        company_description='A company signed up by the benchmark',
+    )
+
+
+async def sequential():
+    create_request = signup_request()
+    now = datetime.now()
+    registration, owner = await Admin.gen_registration()
+    company = await Company.create(
+        CreateCompanyRequest(
+            name=create_request.company_name,
+            description=create_request.company_description,
+        ),
+        owner=registration,
+    )
+    department = await Department.create(
+        CreateDepartmentRequest(
+            name='administration',
+            description='This department is only accessible by the'
+            + ' administration',
+        ),
+        owner=company.owner,
+        company=company.registration,
+    )
+    create_request.password = Auth.encrypt_password(create_request.password)
+    await session.db.users.insert_one(
+        {
+            **create_request.mongo(),
+            'owner': owner,
+            'registration': registration,
+            'created_at': now,
+            'updated_at': now,
+            'company': company.registration,
+            'departments': [department.registration],
+        }
+    )
+
+
+async def concurrent():
+    settings.MONGO_TRANSACTIONS = False
+    await Admin.create(signup_request(), None)
+
+
+async def transaction():
+    settings.MONGO_TRANSACTIONS = True
+    await Admin.create(signup_request(), None)
+
+
+STRATEGIES = (sequential, concurrent, transaction)
+
+
+async def main():
+    rows = []
+    reset_database()
+    await create_indexes()
+    for strategy in STRATEGIES:
+        try:
+            timings = await measure(strategy, REPEAT)
+        except Exception as e:
+            print(f'{strategy.__name__} skipped: {e}')
+            continue
+        rows.append({'strategy': strategy.__name__, **summarize(timings)})
+    print_table('Admin signup latency (ms)', rows)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
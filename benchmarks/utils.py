@@ -0,0 +1,64 @@
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+from pymongo import MongoClient
+
+from sop_chatbot import session
+from sop_chatbot.config import settings
+from sop_chatbot.services.cache import CACHES
+from sop_chatbot.services.sequences import sequences
+
+
+def reset_database():
+    """
+    Point the application at an empty ``TEST_MONGO_URI`` database.
+    """
+    db = settings.TEST_MONGO_URI.split('/')[-1]
+    MongoClient(settings.TEST_MONGO_URI).drop_database(db)
+    session.db = session.connect(settings.TEST_MONGO_URI).get_database()
+    for cache in CACHES.values():
+        cache.clear()
+    sequences.clear()
+
+
+async def measure(
+    function: Callable[[], Awaitable], repeat: int
+) -> list[float]:
+    """
+    Await ``function`` ``repeat`` times, one after the other.
+
+    :return: The duration of each call, in milliseconds.
+    :rtype: list[float]
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: list[float]) -> dict:
+    percentiles = statistics.quantiles(timings, n=100)
+    return {
+        'mean': statistics.fmean(timings),
+        'p50': percentiles[49],
+        'p99': percentiles[98],
+    }
+
+
+def print_table(title: str, rows: list[dict]):
+    print(title)
+    columns = list(rows[0])
+    print(' | '.join(f'{column:>12}' for column in columns))
+    for row in rows:
+        print(
+            ' | '.join(
+                f'{value:>12.3f}'
+                if isinstance(value, float)
+                else f'{value!s:>12}'
+                for value in row.values()
+            )
+        )
+    print()
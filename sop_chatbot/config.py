@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -20,6 +21,50 @@ class Settings(BaseSettings):
     MONGO_URI: str = 'mongodb://localhost:27017/sops'
     TEST_MONGO_URI: str = 'mongodb://localhost:27017/sops_test'
     GEMINI_API_KEY: str = 'This is my Gemini API key'
+    TOKEN_CACHE_MAXSIZE: int = 4096
+    TOKEN_CACHE_TTL: int = 1800
+    USER_CACHE_MAXSIZE: int = 4096
+    USER_CACHE_TTL: int = 30
+    TOKEN_CLAIMS: bool = True
+    TOKEN_VERSION_CACHE_TTL: int = 10
+    REGISTRATION_BLOCK_SIZE: int = 1
+    COUNT_CACHE_MAXSIZE: int = 4096
+    COUNT_CACHE_TTL: int = 5
+    SEARCH_MAX_LENGTH: int = 64
+    RAW_READS: bool = False
+    MEMBERSHIP_MAX_SIZE: int = 1000
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 100
+    # Bytes kept of a line being read, longer lines are reported as errors.
+    IMPORT_MAX_LINE_LENGTH: int = 65536
+    MONGO_TRANSACTIONS: bool = False
+    MONGO_DRIVER: Literal['motor', 'pymongo'] = 'motor'
+    # Pool options left unset keep the ones of the URI, or the driver's.
+    MONGO_MAX_POOL_SIZE: int | None = None
+    MONGO_MIN_POOL_SIZE: int | None = None
+    MONGO_MAX_IDLE_TIME_MS: int | None = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int | None = None
+    # Comma separated, in order of preference, as 'zstd,snappy'.
+    MONGO_COMPRESSORS: str = ''
+    REQUEST_TIMING: bool = True
+    REQUEST_QUERY_LIMIT: int = 10
+    METRICS: bool = True
+    # Shared by the workers of a server to add up their metrics.
+    METRICS_DIR: str | None = None
+    METRICS_FLUSH_INTERVAL: float = 5.0
+    LOOP_LAG_INTERVAL: float = 0.5
+    WATCHDOG: bool = False
+    WATCHDOG_INTERVAL: float = 0.05
+    WATCHDOG_THRESHOLD: float = 0.1
+    WATCHDOG_SAMPLES: int = 1200
+    WATCHDOG_DEBUG: bool = False
+    JOB_WORKERS: int = 1
+    JOB_CONCURRENCY: int = 4
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 5.0
+    JOB_LOCK_TIMEOUT: int = 300
+    JOB_BATCH_SIZE: int = 1000
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8',
@@ -1,13 +1,19 @@
-import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from .config import settings
 from .migrations.indexes import create_indexes
 from .migrations.migrations import run_migrations
+from .models.mixins import ConflictError
 from .routes.api import router as api_router
+from .routes.metrics import router as metrics_router
+from .services.jobs import jobs
+from .services.metrics import MetricsMiddleware, metrics
+from .services.monitoring import RequestTimingMiddleware
+from .services.watchdog import WatchdogMiddleware, watchdog
 
 tags_info = [
     {'name': 'Version', 'description': 'Version information'},
@@ -28,16 +34,31 @@ tags_info = [
         'name': 'Admin: Departments',
         'description': 'Departments related operations for administrators',
     },
+    {
+        'name': 'Admin: Jobs',
+        'description': 'Background jobs of administrators',
+    },
+    {'name': 'Metrics', 'description': 'Metrics of the running server'},
 ]
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # pragma: no cover
-    await asyncio.gather(create_indexes(), run_migrations())
+    # The migrations drop the indexes the declared ones replace.
+    await run_migrations()
+    await create_indexes()
+    jobs.start()
+    if settings.METRICS:
+        metrics.start()
+    if settings.WATCHDOG:
+        watchdog.start()
     yield
+    await watchdog.stop()
+    await jobs.stop()
+    await metrics.stop()
     from . import session
 
-    session.client.close()
+    await session.close()
     # Application shutdown
 
 
@@ -50,7 +71,20 @@ app = FastAPI(
     openapi_tags=tags_info,
 )
 
+if settings.REQUEST_TIMING:
+    app.add_middleware(RequestTimingMiddleware)
+if settings.METRICS:
+    app.add_middleware(MetricsMiddleware)
+if settings.WATCHDOG:
+    app.add_middleware(WatchdogMiddleware)
+
 app.include_router(api_router)
+app.include_router(metrics_router)
+
+
+@app.exception_handler(ConflictError)
+async def conflict_handler(request: Request, exc: ConflictError):
+    return ORJSONResponse(status_code=409, content={'detail': str(exc)})
 
 
 class VersionInfo(BaseModel):
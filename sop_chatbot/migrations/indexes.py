@@ -1,31 +1,25 @@
 import asyncio
 
-from pymongo import IndexModel
-
 from .. import session
+from ..models.companies import Company
+from ..models.departments import Department
+from ..models.users import User
+from ..services.jobs import jobs
+
+# Everything whose ``indexes`` declare the indexes of its ``table_name``.
+INDEXED = (Company, Department, User, jobs)
 
 
 async def create_indexes():
+    """
+    Create the declared indexes. Indexes no longer declared are dropped
+    by the migrations, which must run first.
+    """
     await asyncio.gather(
-        session.db.users.create_indexes(
-            [
-                IndexModel([('email', 1)]),
-                IndexModel([('registration', 1)]),
-                IndexModel([('name', 'text')]),
-            ]
-        ),
-        session.db.companies.create_indexes(
-            [
-                IndexModel([('name', 'text')]),
-                IndexModel([('registration', 1)]),
-            ]
-        ),
-        session.db.departments.create_indexes(
-            [
-                IndexModel([('name', 'text')]),
-                IndexModel([('registration', 1)]),
-            ]
-        ),
+        *(
+            session.db[model.table_name()].create_indexes(list(model.indexes))
+            for model in INDEXED
+        )
     )
 
 
@@ -0,0 +1,52 @@
+import asyncio
+
+from sop_chatbot import session
+from sop_chatbot.models.companies import Company
+from sop_chatbot.models.departments import Department
+from sop_chatbot.models.mixins import BaseClass
+from sop_chatbot.models.users import Admin, User
+from sop_chatbot.services.sequences import sequences
+
+
+def registration_part(index: int) -> dict:
+    return {
+        '$toInt': {'$arrayElemAt': [{'$split': ['$registration', '.']}, index]}
+    }
+
+
+async def seed_owner_counters(cls: type[BaseClass]):
+    pipeline = [
+        {'$match': {'owner': {'$type': 'string'}}},
+        {'$group': {'_id': '$owner', 'seq': {'$max': registration_part(2)}}},
+    ]
+    counters = {
+        cls.sequence_key(counter['_id']): counter['seq']
+        async for counter in session.aggregate(
+            session.db[cls.table_name()], pipeline
+        )
+    }
+    await sequences.seed(counters)
+
+
+async def seed_admin_counter():
+    pipeline = [
+        {'$match': {'registration': {'$regex': r'\.000$'}}},
+        {'$group': {'_id': None, 'seq': {'$max': registration_part(1)}}},
+    ]
+    counters = {
+        Admin.sequence_key(): counter['seq']
+        async for counter in session.aggregate(
+            session.db[Admin.table_name()], pipeline
+        )
+    }
+    await sequences.seed(counters)
+
+
+async def run():
+    await asyncio.gather(
+        seed_owner_counters(Company),
+        seed_owner_counters(Department),
+        seed_owner_counters(User),
+        seed_admin_counter(),
+    )
+    return __name__
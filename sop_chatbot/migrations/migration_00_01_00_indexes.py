@@ -0,0 +1,59 @@
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+from sop_chatbot import session
+from sop_chatbot.models.companies import Company
+from sop_chatbot.models.departments import Department
+from sop_chatbot.models.mixins import BaseClass
+from sop_chatbot.models.users import User
+
+# The indexes replaced by the declared ones of the models. Other indexes,
+# such as the ones added by operators, are left alone.
+LEGACY_INDEXES = ('registration_1',)
+INDEX_NOT_FOUND = 27
+
+
+async def check_duplicates(cls: type[BaseClass]):
+    """
+    Fail before the unique ``(registration, owner)`` index is built if
+    the documents of ``cls`` repeat them, so they can be fixed by hand.
+    """
+    pipeline = [
+        {
+            '$group': {
+                '_id': {'registration': '$registration', 'owner': '$owner'},
+                'count': {'$sum': 1},
+            }
+        },
+        {'$match': {'count': {'$gt': 1}}},
+        {'$limit': 10},
+    ]
+    duplicates = [
+        duplicate['_id']
+        async for duplicate in session.aggregate(
+            session.db[cls.table_name()], pipeline
+        )
+    ]
+    if duplicates:
+        raise RuntimeError(
+            f'{cls.table_name()} has duplicate registrations: {duplicates}'
+        )
+
+
+async def drop_legacy_indexes(cls: type[BaseClass]):
+    collection = session.db[cls.table_name()]
+    for name in LEGACY_INDEXES:
+        try:
+            await collection.drop_index(name)
+        except OperationFailure as e:
+            # Already dropped, by another worker or never created.
+            if e.code != INDEX_NOT_FOUND:
+                raise
+
+
+async def run():
+    models = (Company, Department, User)
+    await asyncio.gather(*(check_duplicates(cls) for cls in models))
+    await asyncio.gather(*(drop_legacy_indexes(cls) for cls in models))
+    return __name__
@@ -0,0 +1,51 @@
+import asyncio
+
+from pymongo import UpdateOne
+
+from sop_chatbot import session
+from sop_chatbot.models.companies import Company
+from sop_chatbot.models.departments import Department
+from sop_chatbot.models.mixins import (
+    SEARCH_FIELDS,
+    BaseClass,
+    search_key,
+    shadow_field,
+)
+from sop_chatbot.models.users import User
+
+BATCH_SIZE = 1000
+
+
+async def backfill_shadow_fields(cls: type[BaseClass]):
+    """
+    Set the shadow fields of every document the way new writes do, in
+    Python, as ``$toLower`` would not fold non-ASCII letters.
+    """
+    collection = session.db[cls.table_name()]
+    for field in SEARCH_FIELDS:
+        requests = []
+        async for document in collection.find(
+            {field: {'$type': 'string'}}, {field: 1}
+        ):
+            requests.append(
+                UpdateOne(
+                    {'_id': document['_id']},
+                    {
+                        '$set': {
+                            shadow_field(field): search_key(document[field])
+                        }
+                    },
+                )
+            )
+            if len(requests) == BATCH_SIZE:
+                await collection.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            await collection.bulk_write(requests, ordered=False)
+
+
+async def run():
+    await asyncio.gather(
+        *(backfill_shadow_fields(cls) for cls in (Company, Department, User))
+    )
+    return __name__
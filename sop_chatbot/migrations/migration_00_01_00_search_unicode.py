@@ -0,0 +1,17 @@
+import asyncio
+
+from sop_chatbot.migrations.migration_00_01_00_search import (
+    backfill_shadow_fields,
+)
+from sop_chatbot.models.companies import Company
+from sop_chatbot.models.departments import Department
+from sop_chatbot.models.users import User
+
+
+async def run():
+    # The first backfill folded names with $toLower, which skips
+    # non-ASCII letters, where it already ran.
+    await asyncio.gather(
+        *(backfill_shadow_fields(cls) for cls in (Company, Department, User))
+    )
+    return __name__
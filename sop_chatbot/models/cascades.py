@@ -0,0 +1,106 @@
+from collections.abc import AsyncIterator
+
+from .. import session
+from ..config import settings
+from ..services.auth import Auth
+from ..services.jobs import Job, jobs
+from .companies import Company
+from .departments import Department
+from .users import User
+
+
+async def _batches(table: str, find: dict) -> AsyncIterator[list[dict]]:
+    """
+    Read the documents matching ``find`` in batches of ``JOB_BATCH_SIZE``.
+    Each batch must be changed so it no longer matches before the next one
+    is read.
+    """
+    while True:
+        batch = (
+            await session.db[table]
+            .find(find, {'registration': 1})
+            .limit(settings.JOB_BATCH_SIZE)
+            .to_list(None)
+        )
+        if not batch:
+            return
+        yield batch
+
+
+async def _pull_departments(departments: list[str], owner: str) -> int:
+    updated = 0
+    async for batch in _batches(
+        User.table_name(),
+        {'owner': owner, 'departments': {'$in': departments}},
+    ):
+        await session.db[User.table_name()].update_many(
+            {'_id': {'$in': [user['_id'] for user in batch]}},
+            {'$pull': {'departments': {'$in': departments}}},
+        )
+        User.invalidate_cache(*(user['registration'] for user in batch))
+        updated += len(batch)
+    return updated
+
+
+@jobs.handler('delete_department')
+async def delete_department(payload: dict) -> dict:
+    """
+    Delete a department and remove it from its users.
+    """
+    registration, owner = payload['registration'], payload['owner']
+    updated = await _pull_departments([registration], owner)
+    await session.db[Department.table_name()].delete_one(
+        {'registration': registration, 'owner': owner}
+    )
+    return {'users_updated': updated}
+
+
+@jobs.handler('delete_company')
+async def delete_company(payload: dict) -> dict:
+    """
+    Delete a company with its departments and users.
+    """
+    registration, owner = payload['registration'], payload['owner']
+    deleted = 0
+    async for batch in _batches(
+        User.table_name(), {'company': registration, 'owner': owner}
+    ):
+        await session.db[User.table_name()].delete_many(
+            {'_id': {'$in': [user['_id'] for user in batch]}}
+        )
+        for user in batch:
+            User.invalidate_cache(user['registration'])
+            Auth.revoke_jwts(user['registration'])
+        deleted += len(batch)
+    departments = [
+        department['registration']
+        async for department in session.db[Department.table_name()].find(
+            {'company': registration, 'owner': owner}, {'registration': 1}
+        )
+    ]
+    updated = 0
+    if departments:
+        updated = await _pull_departments(departments, owner)
+        await session.db[Department.table_name()].delete_many(
+            {'registration': {'$in': departments}, 'owner': owner}
+        )
+    await session.db[Company.table_name()].delete_one(
+        {'registration': registration, 'owner': owner}
+    )
+    return {
+        'users_deleted': deleted,
+        'users_updated': updated,
+        'departments_deleted': len(departments),
+    }
+
+
+async def enqueue_deletion(obj: Company | Department, owner: str) -> Job:
+    """
+    Queue the deletion of a company or a department, which cascades to
+    every user related to it.
+    """
+    return await jobs.enqueue(
+        f'delete_{type(obj).__name__.lower()}',
+        {'registration': obj.registration, 'owner': owner},
+        owner,
+    )
@@ -1,6 +1,7 @@
-from typing import Annotated
+from typing import Annotated, ClassVar
 
 from pydantic import Field
+from pymongo import IndexModel
 
 from ..models.mixins import BaseClass, BaseRequest
 
@@ -26,6 +27,12 @@ class Department(BaseClass, CreateDepartmentRequest):
         str, Field(description='The company of the user', min_length=12)
     ]
 
+    indexes: ClassVar[tuple[IndexModel, ...]] = (
+        *BaseClass.indexes,
+        # Company deletions
+        IndexModel([('owner', 1), ('company', 1), ('registration', 1)]),
+    )
+
     @classmethod
     def create(
         cls, create_request: BaseRequest, owner: str, company: str, **kwargrs
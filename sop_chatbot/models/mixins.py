@@ -1,12 +1,38 @@
+import asyncio
+import base64
+import binascii
+import functools
+import re
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
 from datetime import datetime
-from enum import Enum
-from typing import Annotated, Any, Generic, TypeVar
-
-from bson import ObjectId
-from pydantic import BaseModel, Field
+from enum import Enum, StrEnum
+from typing import (
+    Annotated,
+    Any,
+    ClassVar,
+    Generic,
+    TypeVar,
+    get_origin,
+)
+
+import orjson
+from bson import CodecOptions, ObjectId
+from bson.errors import InvalidId
+from pydantic import (
+    BaseModel,
+    Field,
+    create_model,
+    field_validator,
+    model_validator,
+)
+from pymongo import IndexModel
 
 from .. import session
+from ..config import settings
+from ..services.cache import Cache
+from ..services.sequences import sequences
 
 CLASS_MAPPING = {
     'User': '001',
@@ -14,41 +40,368 @@ CLASS_MAPPING = {
     'Department': '003',
 }
 
+# Fields with a text index and a lowercase shadow field for prefix searches.
+SEARCH_FIELDS = ('name',)
+
+count_cache = Cache(
+    'counts',
+    maxsize=settings.COUNT_CACHE_MAXSIZE,
+    ttl=settings.COUNT_CACHE_TTL,
+)
+
 
 class ActionResponse(BaseModel):
     action: str
     message: str
 
 
+class ConflictError(Exception):
+    """
+    Raised when an object changed in Mongo after it was read.
+    """
+
+
+async def insert_together(inserts: list[tuple[str, dict]]) -> None:
+    """
+    Insert documents into several collections as a unit. With
+    ``MONGO_TRANSACTIONS`` they are committed in one transaction. Otherwise
+    they are inserted concurrently, and the inserted ones are deleted again
+    if any insert fails.
+
+    :param inserts: The collection and the document of each insert. Every
+        document must have its ``_id`` set.
+    :type inserts: list[tuple[str, dict]]
+    """
+    if settings.MONGO_TRANSACTIONS:
+        async with session.transaction() as mongo_session:
+            for table, document in inserts:
+                await session.db[table].insert_one(
+                    document, session=mongo_session
+                )
+        return
+    results = await asyncio.gather(
+        *(
+            session.db[table].insert_one(document)
+            for table, document in inserts
+        ),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        await asyncio.gather(
+            *(
+                session.db[table].delete_one({'_id': document['_id']})
+                for (table, document), result in zip(inserts, results)
+                if not isinstance(result, Exception)
+            )
+        )
+        raise errors[0]
+
+
+def encode_cursor(id: str) -> str:
+    """
+    Encode an object id as an opaque, url safe pagination cursor.
+    """
+    return base64.urlsafe_b64encode(bytes.fromhex(id)).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    """
+    Decode a pagination cursor back into the object id it points after.
+
+    :raises ValueError: If the cursor was not produced by ``encode_cursor``.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return ObjectId(raw)
+    except (binascii.Error, InvalidId, TypeError) as e:
+        raise ValueError('Invalid pagination cursor') from e
+
+
+def shadow_field(field: str) -> str:
+    """
+    Name of the normalized, lowercase copy of ``field`` kept for searches.
+    """
+    return f'{field}_lower'
+
+
+def search_key(value: str) -> str:
+    """
+    The normalized value kept in shadow fields and matched by prefix
+    searches. Mongo's ``$toLower`` only folds ASCII, so it is always
+    computed in Python.
+    """
+    return value.lower()
+
+
+def projection(model: type[BaseModel]) -> dict:
+    """
+    Mongo projection reading only the fields ``model`` is built from.
+    """
+    fields = {name: 1 for name in model.model_fields if name != 'id'}
+    # An empty projection would read whole documents.
+    return fields or {'_id': 1}
+
+
+def raw_projection(model: type[BaseModel]) -> dict:
+    """
+    Mongo projection shaping documents like the JSON of ``model``, so raw
+    reads can encode them as they come out of the driver.
+    """
+    exclude = getattr(model, 'json_exclude', frozenset())
+    fields = {
+        name: 1
+        for name in model.model_fields
+        if name != 'id' and name not in exclude
+    }
+    if 'id' in model.model_fields:
+        fields['id'] = {'$toString': '$_id'}
+    return fields
+
+
+class RawDocument(dict):
+    """
+    Document decoded by the BSON C extension and encoded by orjson, with
+    no model built in between. Fields can be read as attributes, like on
+    the model the document stands for.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def dump_json(
+        self, response_model: type[BaseModel] | None = None
+    ) -> bytes:
+        if response_model is None:
+            return orjson.dumps(self)
+        return orjson.dumps(
+            {
+                key: value
+                for key, value in self.items()
+                if key in response_model.model_fields
+            }
+        )
+
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawDocument)
+
+
+def stored_datetime(value: datetime) -> datetime:
+    """
+    ``value`` as Mongo stores it, truncated to milliseconds.
+    """
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def _to_datetime(value: datetime | str) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _runs_python_validators(schema: Any) -> bool:
+    if isinstance(schema, dict):
+        if str(schema.get('type')).startswith('function-'):
+            return True
+        schema = list(schema.values())
+    if isinstance(schema, list | tuple):
+        return any(_runs_python_validators(item) for item in schema)
+    return False
+
+
+@functools.cache
+def _hydration_plan(
+    model: type[BaseModel],
+) -> tuple[tuple[str, ...], tuple[tuple[str, Callable], ...]] | None:
+    """
+    Fields ``hydrate`` reads for ``model`` and the conversions it applies
+    to them. Mutable values are copied, so cached documents are never
+    shared between instances.
+
+    None when validating ``model`` runs no Python validators, as
+    pydantic-core then validates faster than it can be built by hand.
+    """
+    if not _runs_python_validators(model.__pydantic_core_schema__):
+        return None
+    names = tuple(name for name in model.model_fields if name != 'id')
+    coercions = []
+    for name in names:
+        annotation = model.model_fields[name].annotation
+        if get_origin(annotation) in (list, dict):
+            coercions.append((name, get_origin(annotation)))
+        elif not isinstance(annotation, type):
+            continue
+        elif issubclass(annotation, Enum):
+            coercions.append((name, annotation))
+        elif issubclass(annotation, datetime):
+            coercions.append((name, _to_datetime))
+    return names, tuple(coercions)
+
+
+def hydrate(model: type[BaseModel], obj: dict) -> BaseModel:
+    """
+    Build ``model`` from a document of our own collections. Validators
+    written in Python, like ``EmailStr``, are skipped, as the document was
+    validated before being written.
+    """
+    plan = _hydration_plan(model)
+    if plan is None:
+        return model(id=str(obj['_id']), **obj)
+    names, coercions = plan
+    values = {name: obj[name] for name in names if name in obj}
+    for name, coerce in coercions:
+        if name in values:
+            values[name] = coerce(values[name])
+    if 'id' in model.model_fields:
+        values['id'] = str(obj['_id'])
+    if len(values) < len(model.model_fields) or model.__private_attributes__:
+        return model.model_construct(**values)
+    # What model_construct does, without its per field overhead.
+    self = model.__new__(model)
+    object.__setattr__(self, '__dict__', values)
+    object.__setattr__(self, '__pydantic_fields_set__', set(values))
+    object.__setattr__(self, '__pydantic_extra__', None)
+    object.__setattr__(self, '__pydantic_private__', None)
+    return self
+
+
+@functools.cache
+def sparse_model(
+    model: type[BaseModel], fields: frozenset[str]
+) -> type[BaseModel]:
+    """
+    Copy of ``model`` keeping only ``fields``, for sparse fieldsets.
+    """
+    return create_model(
+        f'{model.__name__}Fields',
+        **{
+            name: (field.annotation, field)
+            for name, field in model.model_fields.items()
+            if name in fields
+        },
+    )
+
+
+class SearchMode(StrEnum):
+    REGEX = 'regex'
+    PREFIX = 'prefix'
+    TEXT = 'text'
+
+
 class PaginationRequest(BaseModel):
     skip: int = 0
     limit: int = 10
     query: str | None = None
     value: Any = None
+    after: str | None = None
+    include_total: bool = True
+    # Serve the total from ``count_cache``, up to ``COUNT_CACHE_TTL``
+    # seconds stale, instead of counting it exactly.
+    cached_total: bool = False
+    search: SearchMode = SearchMode.REGEX
+
+    @field_validator('after')
+    @classmethod
+    def validate_after(cls, after: str | None) -> str | None:
+        if after is not None:
+            decode_cursor(after)
+        return after
+
+    @model_validator(mode='after')
+    def validate_search(self) -> 'PaginationRequest':
+        if not self.query:
+            return self
+        if len(self.search_value) > settings.SEARCH_MAX_LENGTH:
+            raise ValueError('Search value is too long')
+        if self.search != SearchMode.REGEX and self.query not in SEARCH_FIELDS:
+            raise ValueError(f'{self.query} does not support {self.search}')
+        if self.search == SearchMode.TEXT and self.after is not None:
+            raise ValueError('Text searches are paginated with skip')
+        return self
+
+    @property
+    def search_value(self) -> str:
+        return '' if self.value is None else str(self.value)
+
+    def search_filter(self) -> dict:
+        """
+        Build the filter for ``query``. Values are always matched literally,
+        so user input never reaches the server as a regular expression.
+        """
+        if not self.query:
+            return {}
+        if self.search == SearchMode.TEXT:
+            return {'$text': {'$search': self.search_value}}
+        value = re.escape(self.search_value)
+        if self.search == SearchMode.PREFIX:
+            value = re.escape(search_key(self.search_value))
+            return {shadow_field(self.query): {'$regex': '^' + value}}
+        return {self.query: {'$regex': value, '$options': 'i'}}
+
+    def sort(self) -> list[tuple[str, Any]]:
+        if self.query and self.search == SearchMode.TEXT:
+            return [('score', {'$meta': 'textScore'}), ('_id', 1)]
+        return [('_id', 1)]
 
 
 class Pagination(BaseModel):
     page: int = 1
     limit: int = 10
-    total: int = 0
+    total: int | None = 0
+    has_more: bool = False
+    next_cursor: str | None = None
+
+
+@functools.cache
+def _enum_fields(
+    model: type[BaseModel],
+) -> tuple[tuple[str, type[BaseModel] | None], ...]:
+    """
+    Fields of ``model`` holding enums, directly or in a nested model.
+    """
+    fields = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if not isinstance(annotation, type):
+            continue
+        if issubclass(annotation, Enum):
+            fields.append((name, None))
+        elif issubclass(annotation, BaseModel) and _enum_fields(annotation):
+            fields.append((name, annotation))
+    return tuple(fields)
+
+
+def _enum_values(model: type[BaseModel], dump: dict) -> dict:
+    for name, nested in _enum_fields(model):
+        value = dump.get(name)
+        if nested is not None and isinstance(value, dict):
+            _enum_values(nested, value)
+        elif isinstance(value, Enum):
+            dump[name] = value.value
+    return dump
 
 
 class BaseRequest(BaseModel, ABC):
-    def mongo(self):
-        dump = self.model_dump()
-        dump.pop('id', None)
-
-        def mongofy(dump: dict):
-            for key, value in dump.items():
-                if isinstance(value, dict):
-                    dump[key] = mongofy(value)
-                elif isinstance(value, Enum):
-                    dump[key] = value.value
-                else:
-                    dump[key] = value
-            return dump
-
-        return mongofy(dump)
+    mongo_exclude: ClassVar[frozenset[str]] = frozenset({'id'})
+
+    def mongo(self, include: Iterable[str] | None = None):
+        """
+        :param include: Only dump these fields.
+        :type include: Iterable[str] | None
+        """
+        if include is not None:
+            include = set(include)
+        dump = _enum_values(
+            type(self),
+            self.model_dump(include=include, exclude=self.mongo_exclude),
+        )
+        for field in SEARCH_FIELDS:
+            if isinstance(dump.get(field), str):
+                dump[shadow_field(field)] = search_key(dump[field])
+        return dump
 
 
 class BaseClass(BaseRequest, ABC):
@@ -75,41 +428,65 @@ class BaseClass(BaseRequest, ABC):
         str, Field(description='The owner of the account', min_length=12)
     ]
 
+    json_exclude: ClassVar[frozenset[str]] = frozenset()
+    # The indexes the queries of the class need, created by
+    # ``migrations.indexes``. Subclasses extend them with their own queries.
+    indexes: ClassVar[tuple[IndexModel, ...]] = (
+        # get, owns_all and delete
+        IndexModel([('registration', 1), ('owner', 1)], unique=True),
+        # get_all, paginated by _id
+        IndexModel([('owner', 1), ('_id', 1)]),
+        # get_all with prefix searches
+        IndexModel([('owner', 1), (shadow_field('name'), 1)]),
+        # get_all with text searches
+        IndexModel([(field, 'text') for field in SEARCH_FIELDS]),
+    )
+
     @classmethod
     def table_name(cls):
         return cls.__name__.lower() + 's'
 
-    @classmethod
-    def __get_json_value(cls, value):
-        if isinstance(value, Enum):
-            return value.value
-        elif isinstance(value, datetime):
-            return value.isoformat()
-        elif isinstance(value, list):
-            return [cls.__get_json_value(i) for i in value]
-        return value
-
     def json(self):
-        dump = self.model_dump()
+        return self.model_dump(mode='json', exclude=self.json_exclude)
 
-        def jsonify(dump: dict):
-            for key, value in dump.items():
-                if isinstance(value, dict):
-                    dump[key] = jsonify(value)
-                else:
-                    dump[key] = self.__get_json_value(value)
-            return dump
+    def dump_json(self, response_model: type[BaseModel] | None = None) -> str:
+        """
+        Encode the object as JSON in a single pass of its serializer.
 
-        return jsonify(dump)
+        :param response_model: Only encode the fields of this model.
+        :type response_model: type[BaseModel] | None
+        """
+        include = None
+        if response_model is not None:
+            include = set(response_model.model_fields)
+        return self.model_dump_json(include=include, exclude=self.json_exclude)
 
     async def update(self, data: dict):
+        """
+        Write the fields of ``data`` that differ from the object's. The
+        write only applies if the object was not updated since it was read.
+
+        :raises ConflictError: If the object was updated since it was read.
+        """
+        changed = [
+            key
+            for key, value in data.items()
+            if value is not None and value != getattr(self, key)
+        ]
+        if not changed:
+            return self
+        read_at = self.updated_at
+        for key in changed:
+            setattr(self, key, data[key])
         self.updated_at = datetime.now()
-        for key, value in data.items():
-            if value is not None:
-                setattr(self, key, value)
-        await session.db[self.table_name()].update_one(
-            {'_id': ObjectId(self.id)}, {'$set': self.mongo()}
+        result = await session.db[self.table_name()].update_one(
+            {'_id': ObjectId(self.id), 'updated_at': stored_datetime(read_at)},
+            {'$set': self.mongo(include=[*changed, 'updated_at'])},
         )
+        if result.matched_count == 0:
+            raise ConflictError(
+                f'{self.__class__.__name__} was updated by another request'
+            )
         return self
 
     @classmethod
@@ -141,37 +518,81 @@ class BaseClass(BaseRequest, ABC):
         return self
 
     @classmethod
-    @abstractmethod
-    async def gen_registration(cls, owner: str, **kwargs):
+    def sequence_key(cls, owner: str) -> str:
+        return f'{cls.table_name()}:{owner}'
+
+    @classmethod
+    def format_registration(cls, owner: str, sequence: int) -> str:
         registration = CLASS_MAPPING[cls.__name__] + '.'
         owner_part = owner.split('.')[1]
         registration += owner_part + '.'
-        all_objects = await session.db[cls.table_name()].count_documents(
-            {'owner': owner}
-        )
-        registration += str(all_objects + 1).zfill(3)
+        registration += str(sequence).zfill(3)
         return registration
 
     @classmethod
-    async def get(cls, registration: str, owner: str | None = None):
+    @abstractmethod
+    async def gen_registration(cls, owner: str, **kwargs):
+        sequence = await sequences.next(cls.sequence_key(owner))
+        return cls.format_registration(owner, sequence)
+
+    @classmethod
+    async def gen_registrations(cls, owner: str, count: int) -> list[str]:
+        """
+        Allocate ``count`` registrations at once, for bulk creations.
+        """
+        reserved = await sequences.reserve(cls.sequence_key(owner), count)
+        return [
+            cls.format_registration(owner, sequence) for sequence in reserved
+        ]
+
+    @classmethod
+    def collection(cls, raw: bool = False):
+        """
+        :param raw: Decode documents into ``RawDocument`` objects.
+        :type raw: bool
+        """
+        collection = session.db[cls.table_name()]
+        if raw:
+            return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+        return collection
+
+    @classmethod
+    async def get(
+        cls, registration: str, owner: str | None = None, raw: bool = False
+    ):
+        """
+        :param raw: Return the document shaped like the object's JSON, as a
+            ``RawDocument``, instead of the object. For read only uses.
+        :type raw: bool
+        """
         find = {'registration': registration}
         if owner is not None:
             find['owner'] = owner
-        obj = await session.db[cls.table_name()].find_one(find)
-        if obj:
-            return cls(
-                id=str(obj['_id']),
-                **obj,
+        if raw:
+            return await cls.collection(raw=True).find_one(
+                find, {**raw_projection(cls), '_id': 0}
             )
+        obj = await cls.collection().find_one(find)
+        if obj:
+            return hydrate(cls, obj)
+
+    @classmethod
+    async def owns_all(cls, registrations: Iterable[str], owner: str) -> bool:
+        """
+        Whether every one of ``registrations`` exists and belongs to
+        ``owner``.
+        """
+        registrations = set(registrations)
+        count = await session.db[cls.table_name()].count_documents(
+            {'registration': {'$in': list(registrations)}, 'owner': owner}
+        )
+        return count == len(registrations)
 
     @classmethod
     async def get_by_field(cls, key: str, value: Any):
         obj = await session.db[cls.table_name()].find_one({key: value})
         if obj:
-            return cls(
-                id=str(obj['_id']),
-                **obj,
-            )
+            return hydrate(cls, obj)
 
     @classmethod
     async def get_all(
@@ -179,13 +600,30 @@ class BaseClass(BaseRequest, ABC):
         pagination_request: PaginationRequest,
         owner: str,
         user_registration: str | None = None,
+        model: type[BaseModel] | None = None,
+        fields: Iterable[str] | None = None,
+        raw: bool = False,
         **kwargs,
-    ) -> 'PaginatedResponse':
+    ) -> 'PaginatedResponse | RawPaginatedResponse':
+        """
+        :param model: The model results are built from, ``cls`` by default.
+            Only its fields are read from Mongo.
+        :type model: type[BaseModel] | None
+        :param fields: Restrict the results to these fields of ``model``.
+        :type fields: Iterable[str] | None
+        :param raw: Return the documents shaped like the JSON of ``model``,
+            as ``RawDocument`` objects, instead of building the models.
+        :type raw: bool
+        """
+        model = model or cls
+        if fields is not None:
+            model = sparse_model(model, frozenset(fields))
         find = {'owner': owner}
         if user_registration is not None:
-            user = await session.db['users'].find_one(
-                {'registration': user_registration}
-            )
+            # Imported here, as the users module builds on this one.
+            from .users import User
+
+            user = await User.get_cached_document(user_registration)
             if user is None:
                 return PaginatedResponse(pagination=Pagination(), results=[])
             find['company'] = user['company']
@@ -193,33 +631,75 @@ class BaseClass(BaseRequest, ABC):
                 field = user[cls.table_name()]
                 if isinstance(field, list):
                     find['registration'] = {'$in': field}
-        if pagination_request.query:
-            regex = {'$regex': pagination_request.value, '$options': 'i'}
-            find.update(
-                {
-                    pagination_request.query: regex,
-                }
+        find.update(pagination_request.search_filter())
+        sort = pagination_request.sort()
+        page = {}
+        skip = pagination_request.skip * pagination_request.limit
+        if pagination_request.after is not None:
+            page['_id'] = {'$gt': decode_cursor(pagination_request.after)}
+            skip = 0
+        # One extra object tells whether there is a next page without
+        # counting the whole result set.
+        limit = pagination_request.limit + 1
+        read = raw_projection(model) if raw else projection(model)
+        total = None
+        total_key = (cls.table_name(), repr(find))
+        if (
+            pagination_request.include_total
+            and pagination_request.cached_total
+        ):
+            total = count_cache.get(total_key)
+        if pagination_request.include_total and total is None:
+            objs, total = await asyncio.gather(
+                cls._find_page(
+                    {**find, **page}, read, sort, skip, limit, raw=raw
+                ),
+                session.db[cls.table_name()].count_documents(find),
             )
-        objs = (
-            session.db[cls.table_name()]
-            .find(find)
-            .skip(pagination_request.skip * pagination_request.limit)
-            .limit(pagination_request.limit)
-        )
-        total = await session.db[cls.table_name()].count_documents(find)
-        results = [
-            cls(
-                id=str(obj['_id']),
-                **obj,
+            count_cache.set(total_key, total)
+        else:
+            objs = await cls._find_page(
+                {**find, **page}, read, sort, skip, limit, raw=raw
             )
-            async for obj in objs
-        ]
+        has_more = len(objs) > pagination_request.limit
+        objs = objs[: pagination_request.limit]
+        next_cursor = None
+        # Only pages sorted by _id can be continued from a cursor; text
+        # searches are sorted by relevance and paginated with skip.
+        if has_more and sort == [('_id', 1)]:
+            next_cursor = encode_cursor(str(objs[-1]['_id']))
         pagination = Pagination(
             page=pagination_request.skip + 1,
             limit=pagination_request.limit,
             total=total,
+            has_more=has_more,
+            next_cursor=next_cursor,
+        )
+        if raw:
+            for obj in objs:
+                del obj['_id']
+            return RawPaginatedResponse(pagination=pagination, results=objs)
+        results = [hydrate(model, obj) for obj in objs]
+        return PaginatedResponse[model](pagination=pagination, results=results)
+
+    @classmethod
+    async def _find_page(
+        cls,
+        find: dict,
+        projection: dict,
+        sort: list,
+        skip: int,
+        limit: int,
+        raw: bool = False,
+    ) -> list:
+        objs = (
+            cls.collection(raw)
+            .find(find, projection)
+            .sort(sort)
+            .skip(skip)
+            .limit(limit)
         )
-        return PaginatedResponse(pagination=pagination, results=results)
+        return [obj async for obj in objs]
 
     async def delete(self) -> ActionResponse:
         await session.db[self.table_name()].delete_one(
@@ -241,5 +721,41 @@ class PaginatedResponse(BaseModel, Generic[T]):
     def json(self):
         return {
             'pagination': self.pagination.model_dump(),
-            'results': [result.json() for result in self.results],
+            'results': [
+                result.json()
+                if isinstance(result, BaseClass)
+                else result.model_dump(mode='json')
+                for result in self.results
+            ],
         }
+
+    def dump_json(self) -> str:
+        """
+        Encode the page as JSON, each result by its own model serializer.
+        """
+        results = ','.join(
+            result.dump_json()
+            if isinstance(result, BaseClass)
+            else result.model_dump_json()
+            for result in self.results
+        )
+        pagination = self.pagination.model_dump_json()
+        return f'{{"pagination":{pagination},"results":[{results}]}}'
+
+
+@dataclass(slots=True)
+class RawPaginatedResponse:
+    """
+    Page of ``RawDocument`` results, encoded by orjson in one call.
+    """
+
+    pagination: Pagination
+    results: list[RawDocument]
+
+    def dump_json(self) -> bytes:
+        return orjson.dumps(
+            {
+                'pagination': self.pagination.model_dump(),
+                'results': self.results,
+            }
+        )
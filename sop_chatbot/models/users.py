@@ -1,15 +1,40 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable
 from datetime import datetime
 from enum import Enum
-from typing import Annotated
+from typing import Annotated, ClassVar
 
-from pydantic import BaseModel, EmailStr, Field
+from bson import ObjectId
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from pymongo import IndexModel, InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from .. import session
+from ..config import settings
 from ..models.companies import Company, CreateCompanyRequest
 from ..models.departments import CreateDepartmentRequest, Department
-from ..models.mixins import CLASS_MAPPING, BaseClass, BaseRequest
+from ..models.mixins import (
+    CLASS_MAPPING,
+    ActionResponse,
+    BaseClass,
+    BaseRequest,
+    hydrate,
+    insert_together,
+)
 from ..services.auth import Auth
+from ..services.cache import Cache
+from ..services.imports import Row
+from ..services.sequences import sequences
+
+user_cache = Cache(
+    'users', maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL
+)
+token_version_cache = Cache(
+    'token_versions',
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL,
+)
 
 
 class UserRoles(str, Enum):
@@ -47,10 +72,71 @@ class CreateCommonUserRequest(CreateUserRequest):
     ] = []
 
 
+class SessionClaims(BaseModel):
+    registration: Annotated[
+        str, Field(description='The registration of the user')
+    ]
+    role: Annotated[UserRoles, Field(description='The role of the user')]
+    company: Annotated[str, Field(description='The company of the user')]
+    owner: Annotated[str, Field(description='The owner of the user')]
+    token_version: Annotated[
+        int, Field(description='The token version the token was issued at')
+    ]
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'SessionClaims | None':
+        """
+        Build the claims of a verified JWT payload, or None when the token
+        was issued without them.
+        """
+        try:
+            return cls(
+                registration=payload['sub'],
+                role=payload['role'],
+                company=payload['company'],
+                owner=payload['owner'],
+                token_version=payload['ver'],
+            )
+        except KeyError:
+            return None
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == UserRoles.ADMIN
+
+    @property
+    def is_manager(self) -> bool:
+        return self.role == UserRoles.MANAGER or self.is_admin
+
+
 class BaseUser(BaseClass, CreateUserRequest, ABC):
     company: Annotated[
         str, Field(description='The company of the user', min_length=12)
     ]
+    token_version: Annotated[
+        int,
+        Field(
+            description='Incremented to invalidate every token issued to'
+            + ' the user'
+        ),
+    ] = 0
+
+    json_exclude: ClassVar[frozenset[str]] = frozenset(
+        {'password', 'token_version'}
+    )
+    mongo_exclude: ClassVar[frozenset[str]] = frozenset(
+        {'id', 'password', 'token_version'}
+    )
+    indexes: ClassVar[tuple[IndexModel, ...]] = (
+        *BaseClass.indexes,
+        # get_all of users, restricted to their company and departments,
+        # and company deletions
+        IndexModel([('owner', 1), ('company', 1), ('registration', 1)]),
+        # Department memberships and deletions
+        IndexModel([('owner', 1), ('departments', 1)]),
+        # Admin logins
+        IndexModel([('email', 1)]),
+    )
 
     @classmethod
     def table_name(cls):
@@ -95,15 +181,181 @@ class BaseUser(BaseClass, CreateUserRequest, ABC):
         )
         return self
 
-    def json(self) -> dict:
-        dump = super().json()
-        dump.pop('password', None)
-        return dump
+    def claims(self) -> dict:
+        return {
+            'role': self.role.value,
+            'company': self.company,
+            'owner': self.owner,
+            'ver': self.token_version,
+        }
+
+    def generate_jwt(self) -> str:
+        # The token version is always carried, so revoking tokens works
+        # for tokens without the other claims too.
+        claims = (
+            self.claims()
+            if settings.TOKEN_CLAIMS
+            else {'ver': self.token_version}
+        )
+        return Auth.generate_jwt(self.registration, claims)
+
+    @classmethod
+    async def get_token_version(cls, registration: str) -> int | None:
+        """
+        Get the current token version of a user, reusing the value read by
+        a previous request for at most ``TOKEN_VERSION_CACHE_TTL`` seconds.
+        """
+        token_version = token_version_cache.get(registration)
+        if token_version is None:
+            obj = await session.db[cls.table_name()].find_one(
+                {'registration': registration}, {'token_version': 1}
+            )
+            if obj is None:
+                return None
+            token_version = obj.get('token_version', 0)
+            token_version_cache.set(registration, token_version)
+        return token_version
+
+    @classmethod
+    async def get_cached_document(cls, registration: str) -> dict | None:
+        """
+        Get the raw document of a user by registration, reusing the one
+        read by a previous request for at most ``USER_CACHE_TTL`` seconds.
+        """
+        obj = user_cache.get(registration)
+        if obj is None:
+            obj = await session.db[cls.table_name()].find_one(
+                {'registration': registration}
+            )
+            if obj is None:
+                return None
+            user_cache.set(registration, obj)
+        return obj
+
+    @classmethod
+    async def get_cached(cls, registration: str):
+        """
+        Get a user by registration, see ``get_cached_document``.
+        """
+        obj = await cls.get_cached_document(registration)
+        if obj is None:
+            return None
+        return hydrate(cls, obj)
+
+    @staticmethod
+    def invalidate_cache(*registrations: str) -> None:
+        for registration in registrations:
+            user_cache.pop(registration)
+            token_version_cache.pop(registration)
+
+    async def revoke_tokens(self, data: dict | None = None):
+        """
+        Invalidate every token issued to the user, optionally setting
+        ``data`` in the same write.
+        """
+        update: dict = {'$inc': {'token_version': 1}}
+        if data:
+            update['$set'] = data
+        try:
+            await session.db[self.table_name()].update_one(
+                {'_id': ObjectId(self.id)}, update
+            )
+        finally:
+            self.invalidate_cache(self.registration)
+        self.token_version += 1
+        Auth.revoke_jwts(self.registration)
+        return self
+
+    async def add_departments(self, *departments: str):
+        """
+        Add ``departments`` to the user's with ``$addToSet``, so concurrent
+        changes to the list never overwrite each other.
+        """
+        return await self._update_departments(
+            {'$addToSet': {'departments': {'$each': list(departments)}}}
+        )
+
+    async def remove_departments(self, *departments: str):
+        """
+        Remove ``departments`` from the user's with ``$pull``.
+        """
+        return await self._update_departments(
+            {'$pull': {'departments': {'$in': list(departments)}}}
+        )
+
+    async def _update_departments(self, update: dict):
+        self.updated_at = datetime.now()
+        try:
+            obj = await session.db[self.table_name()].find_one_and_update(
+                {'_id': ObjectId(self.id)},
+                {**update, '$set': {'updated_at': self.updated_at}},
+                projection={'departments': 1},
+                return_document=ReturnDocument.AFTER,
+            )
+        finally:
+            self.invalidate_cache(self.registration)
+        if obj is not None:
+            self.departments = obj['departments']
+        return self
+
+    @classmethod
+    async def add_department_to_users(
+        cls, department: str, registrations: list[str], owner: str
+    ) -> int:
+        """
+        Add ``department`` to the users of ``owner`` in ``registrations``
+        in a single write.
+
+        :return: The number of users the department was added to.
+        """
+        return await cls._update_users_departments(
+            registrations, owner, {'$addToSet': {'departments': department}}
+        )
+
+    @classmethod
+    async def remove_department_from_users(
+        cls, department: str, registrations: list[str], owner: str
+    ) -> int:
+        """
+        Remove ``department`` from the users of ``owner`` in
+        ``registrations`` in a single write.
+
+        :return: The number of users the department was removed from.
+        """
+        return await cls._update_users_departments(
+            registrations, owner, {'$pull': {'departments': department}}
+        )
 
-    def mongo(self) -> dict:
-        dump = super().mongo()
-        dump.pop('password', None)
-        return dump
+    @classmethod
+    async def _update_users_departments(
+        cls, registrations: list[str], owner: str, update: dict
+    ) -> int:
+        try:
+            result = await session.db[cls.table_name()].update_many(
+                {'registration': {'$in': registrations}, 'owner': owner},
+                {**update, '$set': {'updated_at': datetime.now()}},
+            )
+        finally:
+            cls.invalidate_cache(*registrations)
+        return result.modified_count
+
+    async def update_password(self, password: str):
+        self.password = Auth.encrypt_password(password)
+        return await self.revoke_tokens({'password': self.password})
+
+    async def update(self, data: dict):
+        try:
+            return await super().update(data)
+        finally:
+            self.invalidate_cache(self.registration)
+
+    async def delete(self) -> ActionResponse:
+        try:
+            deleted = await super().delete()
+        finally:
+            self.invalidate_cache(self.registration)
+        Auth.revoke_jwts(self.registration)
+        return deleted
 
     def verify_password(self, password: str) -> bool:
         return self.password == Auth.encrypt_password(password)
@@ -142,61 +394,41 @@ class AdminResponse(UserResponse):
     ]
 
 
+class ImportRowError(BaseModel):
+    line: Annotated[int, Field(description='The line of the row')]
+    error: Annotated[str, Field(description='Why the row was not imported')]
+
+
+class ImportResponse(BaseModel):
+    created: Annotated[int, Field(description='The users created')] = 0
+    failed: Annotated[int, Field(description='The rows not imported')] = 0
+    errors: Annotated[
+        list[ImportRowError],
+        Field(
+            description='The first rows not imported, up to'
+            + ' IMPORT_MAX_ERRORS'
+        ),
+    ] = []
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append(ImportRowError(line=line, error=error))
+
+
+def _encrypt_passwords(passwords: list[str]) -> list[str]:
+    return [Auth.encrypt_password(password) for password in passwords]
+
+
 class User(BaseUser, CreateCommonUserRequest):
+    @classmethod
+    def format_registration(cls, owner: str, sequence: int) -> str:
+        return '.'.join(owner.split('.')[0:2]) + '.' + str(sequence).zfill(3)
+
     @classmethod
     async def gen_registration(cls, owner: str) -> tuple[str, str]:
-        pipeline = [
-            {'$match': {'owner': owner}},
-            {
-                '$project': {
-                    'registration': {
-                        '$toInt': {
-                            '$substr': [
-                                '$registration',
-                                {
-                                    '$add': [
-                                        {
-                                            '$indexOfBytes': [
-                                                '$registration',
-                                                '.',
-                                            ]
-                                        },
-                                        1,
-                                    ]
-                                },
-                                {
-                                    '$subtract': [
-                                        {'$strLenCP': '$registration'},
-                                        {
-                                            '$add': [
-                                                {
-                                                    '$indexOfBytes': [
-                                                        '$registration',
-                                                        '.',
-                                                    ]
-                                                },
-                                                1,
-                                            ]
-                                        },
-                                    ]
-                                },
-                            ]
-                        }
-                    }
-                }
-            },
-            {'$sort': {'registration': -1}},
-            {'$limit': 1},
-        ]
-        result = (
-            await session.db[cls.table_name()]
-            .aggregate(pipeline)
-            .to_list(length=1)
-        )
-        highest_registration = result[0]['registration']
-        return '.'.join(owner.split('.')[0:2]) + '.' + str(
-            highest_registration
-        ).zfill(3), owner
+        sequence = await sequences.next(cls.sequence_key(owner))
+        return cls.format_registration(owner, sequence), owner
 
     @classmethod
     async def create(cls, create_request: CreateCommonUserRequest, owner: str):
@@ -227,6 +459,116 @@ class User(BaseUser, CreateCommonUserRequest):
         )
         return self
 
+    @classmethod
+    async def import_rows(
+        cls, rows: AsyncIterable[Row], owner: str
+    ) -> ImportResponse:
+        """
+        Create a user of ``owner`` for each valid row, in batches of
+        ``IMPORT_BATCH_SIZE``. A batch is written while the next one is
+        validated, so at most two batches are held in memory.
+
+        In CSV rows, departments are separated by semicolons.
+
+        :param rows: The rows to import, see ``services.imports``.
+        :type rows: AsyncIterable[Row]
+        :param owner: The registration of the admin importing the users.
+        :type owner: str
+
+        :return: How many users were created and why rows were not.
+        :rtype: ImportResponse
+        """
+        response = ImportResponse()
+        batch: list[tuple[int, CreateCommonUserRequest]] = []
+        writing = None
+        try:
+            async for row in rows:
+                if row.error is not None:
+                    response.add_error(row.line, row.error)
+                    continue
+                if isinstance(row.data.get('departments'), str):
+                    row.data['departments'] = [
+                        department
+                        for department in row.data['departments'].split(';')
+                        if department
+                    ]
+                try:
+                    batch.append(
+                        (row.line, CreateCommonUserRequest(**row.data))
+                    )
+                except ValidationError as e:
+                    error = e.errors()[0]
+                    location = '.'.join(str(part) for part in error['loc'])
+                    response.add_error(row.line, f'{location}: {error["msg"]}')
+                    continue
+                if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                    if writing is not None:
+                        await writing
+                    writing = asyncio.create_task(
+                        cls._import_batch(batch, owner, response)
+                    )
+                    batch = []
+        finally:
+            # The batch being written is always finished, even when reading
+            # the rows failed, so no write is left behind unreported.
+            if writing is not None:
+                await writing
+        if batch:
+            await cls._import_batch(batch, owner, response)
+        return response
+
+    @classmethod
+    async def _import_batch(
+        cls,
+        batch: list[tuple[int, CreateCommonUserRequest]],
+        owner: str,
+        response: ImportResponse,
+    ) -> None:
+        try:
+            await cls._write_batch(batch, owner, response)
+        except BulkWriteError as e:
+            response.created += e.details['nInserted']
+            for error in e.details['writeErrors']:
+                line, _ = batch[error['index']]
+                response.add_error(line, error['errmsg'])
+        except PyMongoError as e:
+            # Which users of the batch were written is unknown.
+            for line, _ in batch:
+                response.add_error(line, f'Could not be written: {e}')
+
+    @classmethod
+    async def _write_batch(
+        cls,
+        batch: list[tuple[int, CreateCommonUserRequest]],
+        owner: str,
+        response: ImportResponse,
+    ) -> None:
+        registrations = await cls.gen_registrations(owner, len(batch))
+        passwords = await asyncio.to_thread(
+            _encrypt_passwords, [request.password for _, request in batch]
+        )
+        now = datetime.now()
+        inserts = []
+        for (_, request), registration, password in zip(
+            batch, registrations, passwords
+        ):
+            request.password = password
+            inserts.append(
+                InsertOne(
+                    {
+                        **request.mongo(),
+                        'owner': owner,
+                        'registration': registration,
+                        'created_at': now,
+                        'updated_at': now,
+                    }
+                )
+            )
+        result = await session.db[cls.table_name()].bulk_write(
+            inserts, ordered=False
+        )
+        response.created += result.inserted_count
+
 
 class Admin(BaseUser, CreateAdminRequest):
     role: Annotated[UserRoles, Field(description='The role of the user')] = (
@@ -236,28 +578,53 @@ class Admin(BaseUser, CreateAdminRequest):
         list[str], Field(description='The department of the user')
     ]
 
+    @classmethod
+    def sequence_key(cls, owner: None = None) -> str:
+        return 'admins'
+
     @classmethod
     async def gen_registration(cls, owner: None = None) -> tuple[str, str]:
         registration = CLASS_MAPPING['User'] + '.'
-        all_users = await session.db[cls.table_name()].count_documents({})
-        registration += str(all_users + 1).zfill(4)
+        sequence = await sequences.next(cls.sequence_key())
+        registration += str(sequence).zfill(4)
         registration += '.000'
         return registration, registration
 
     @classmethod
     async def create(cls, create_request: CreateAdminRequest, owner: str):
-        created_at = datetime.now()
-        updated_at = datetime.now()
+        """
+        Sign up an admin with their company and its administration
+        department. The registrations of the company and the department are
+        allocated concurrently, and the three documents are inserted
+        together, see ``insert_together``.
+        """
+        now = datetime.now()
         registration, updated_owner = await cls.gen_registration(owner)
-        company = await Company.create(
-            CreateCompanyRequest(
+        company, department = await asyncio.gather(
+            Company.gen_registration(registration),
+            Department.gen_registration(registration),
+        )
+        create_request.password = Auth.encrypt_password(
+            create_request.password
+        )
+        metadata = {
+            'owner': registration,
+            'created_at': now,
+            'updated_at': now,
+        }
+        company_document = {
+            '_id': ObjectId(),
+            **CreateCompanyRequest(
                 name=create_request.company_name,
                 description=create_request.company_description,
-            ),
-            owner=registration,
-        )
-        department = await Department.create(
-            CreateDepartmentRequest(
+            ).mongo(),
+            **metadata,
+            'registration': company,
+            'company': company,
+        }
+        department_document = {
+            '_id': ObjectId(),
+            **CreateDepartmentRequest(
                 name='administration',
                 description=' '.join(
                     (
@@ -265,37 +632,37 @@ class Admin(BaseUser, CreateAdminRequest):
                         'by the administration',
                     )
                 ),
-            ),
-            owner=company.owner,
-            company=company.registration,
-        )
-        create_request.password = Auth.encrypt_password(
-            create_request.password
+            ).mongo(),
+            **metadata,
+            'registration': department,
+            'company': company,
+        }
+        document = {
+            '_id': ObjectId(),
+            **create_request.mongo(),
+            **metadata,
+            'owner': updated_owner,
+            'registration': registration,
+            'company': company,
+            'departments': [department],
+        }
+        await insert_together(
+            [
+                (Company.table_name(), company_document),
+                (Department.table_name(), department_document),
+                (cls.table_name(), document),
+            ]
         )
-        id = (
-            await session.db[cls.table_name()].insert_one(
-                {
-                    **create_request.mongo(),
-                    'owner': updated_owner,
-                    'registration': registration,
-                    'created_at': created_at,
-                    'updated_at': updated_at,
-                    'company': company.registration,
-                    'departments': [department.registration],
-                }
-            )
-        ).inserted_id
-        self = cls(
-            id=str(id),
+        return cls(
+            id=str(document['_id']),
             registration=registration,
             owner=updated_owner,
-            created_at=created_at,
-            updated_at=updated_at,
-            company=company.registration,
-            departments=[department.registration],
+            created_at=now,
+            updated_at=now,
+            company=company,
+            departments=[department],
             **create_request.model_dump(),
         )
-        return self
 
 
 class UpdateUserRequest(BaseRequest):
@@ -303,7 +670,7 @@ class UpdateUserRequest(BaseRequest):
         None
     )
     departments: Annotated[
-        str | None, Field(description='The department of the user')
+        list[str] | None, Field(description='The departments of the user')
     ] = None
     company: Annotated[
         str | None, Field(description='The company of the user')
@@ -311,3 +678,14 @@ class UpdateUserRequest(BaseRequest):
     role: Annotated[
         UserRoles | None, Field(description='The role of the user')
     ] = None
+
+
+class MembershipRequest(BaseRequest):
+    registrations: Annotated[
+        list[str],
+        Field(
+            description='The registrations to add or remove',
+            min_length=1,
+            max_length=settings.MEMBERSHIP_MAX_SIZE,
+        ),
+    ]
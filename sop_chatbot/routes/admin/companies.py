@@ -1,24 +1,28 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import ORJSONResponse
 
+from ...config import settings
+from ...models.cascades import enqueue_deletion
 from ...models.companies import (
     Company,
     CreateCompanyRequest,
     UpdateCompanyRequest,
 )
 from ...models.mixins import PaginatedResponse
+from ...services.jobs import Job
 from ..dependencies import (
+    AdminClaims,
     AdminListDependency,
     AdminObjectDependency,
-    DeleteDependency,
 )
+from ..responses import EncodedJSONResponse
 
 router = APIRouter(prefix='/companies', tags=['Admin: Companies'])
-companies_dependency = AdminListDependency(Company)
+companies_dependency = AdminListDependency(Company, raw=settings.RAW_READS)
 company_dependency = AdminObjectDependency(Company)
-delete_dependency = DeleteDependency(company_dependency)
+company_reader = AdminObjectDependency(Company, raw=settings.RAW_READS)
 
 
 @router.get(
@@ -31,16 +35,16 @@ async def get_companies(
         PaginatedResponse[Company], Depends(companies_dependency)
     ],
 ):
-    return companies.json()
+    return EncodedJSONResponse(companies.dump_json())
 
 
 @router.get(
     '/{registration}', response_model=Company, response_class=ORJSONResponse
 )
 async def get_company(
-    company: Annotated[Company, Depends(company_dependency)],
+    company: Annotated[Company, Depends(company_reader)],
 ):
-    return company.json()
+    return EncodedJSONResponse(company.dump_json())
 
 
 @router.put(
@@ -51,7 +55,7 @@ async def update_company(
     company: Annotated[Company, Depends(company_dependency)],
 ):
     company = await company.update(request.model_dump())
-    return company.json()
+    return EncodedJSONResponse(company.dump_json())
 
 
 @router.patch(
@@ -62,4 +66,25 @@ async def partial_update_company(
     company: Annotated[Company, Depends(company_dependency)],
 ):
     company = await company.update(request.model_dump(exclude_unset=True))
-    return company.json()
+    return EncodedJSONResponse(company.dump_json())
+
+
+@router.delete(
+    '/{registration}',
+    response_class=ORJSONResponse,
+    response_model=Job,
+    status_code=202,
+)
+async def delete_company(
+    company: Annotated[Company, Depends(company_dependency)],
+    session: AdminClaims,
+):
+    """
+    Queue the deletion of the company, with its departments and users.
+    """
+    if company.registration == session.company:
+        raise HTTPException(
+            status_code=403, detail="You can't delete your own company"
+        )
+    job = await enqueue_deletion(company, session.registration)
+    return EncodedJSONResponse(job.model_dump_json(), status_code=202)
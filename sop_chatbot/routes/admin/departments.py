@@ -1,27 +1,33 @@
-import asyncio
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import ORJSONResponse
 
-from ... import session
+from ...config import settings
+from ...models.cascades import enqueue_deletion
 from ...models.departments import (
     CreateDepartmentRequest,
     Department,
     UpdateDepartmentRequest,
 )
 from ...models.mixins import ActionResponse, PaginatedResponse
-from ...models.users import User
+from ...models.users import MembershipRequest, User
+from ...services.jobs import Job
 from ..dependencies import (
+    AdminClaims,
     AdminListDependency,
     AdminObjectDependency,
     DeleteDependency,
     admin_dependency,
 )
+from ..responses import EncodedJSONResponse
 
 router = APIRouter(prefix='/departments', tags=['Admin: Departments'])
-departments_dependency = AdminListDependency(Department)
+departments_dependency = AdminListDependency(
+    Department, raw=settings.RAW_READS
+)
 department_dependency = AdminObjectDependency(Department)
+department_reader = AdminObjectDependency(Department, raw=settings.RAW_READS)
 delete_dependency = DeleteDependency(department_dependency)
 
 
@@ -35,7 +41,7 @@ async def get_departments(
         PaginatedResponse[Department], Depends(departments_dependency)
     ],
 ):
-    return departments.json()
+    return EncodedJSONResponse(departments.dump_json())
 
 
 @router.post('/', response_model=Department, response_class=ORJSONResponse)
@@ -48,18 +54,17 @@ async def create_department(
         owner=session.registration,
         company=session.company,
     )
-    session.departments.append(department.registration)
-    await session.update({'departments': session.departments})
-    return department.json()
+    await session.add_departments(department.registration)
+    return EncodedJSONResponse(department.dump_json())
 
 
 @router.get(
     '/{registration}', response_model=Department, response_class=ORJSONResponse
 )
 async def get_department(
-    department: Annotated[Department, Depends(department_dependency)],
+    department: Annotated[Department, Depends(department_reader)],
 ):
-    return department.json()
+    return EncodedJSONResponse(department.dump_json())
 
 
 @router.put(
@@ -70,7 +75,7 @@ async def update_department(
     department: Annotated[Department, Depends(department_dependency)],
 ):
     department = await department.update(request.model_dump())
-    return department.json()
+    return EncodedJSONResponse(department.dump_json())
 
 
 @router.patch(
@@ -83,22 +88,59 @@ async def partial_update_department(
     department = await department.update(
         request.model_dump(exclude_unset=True)
     )
-    return department.json()
+    return EncodedJSONResponse(department.dump_json())
 
 
 @router.delete(
     '/{registration}',
     response_class=ORJSONResponse,
-    response_model=ActionResponse,
+    response_model=Job,
+    status_code=202,
 )
 async def delete_department(
     department: Annotated[Department, Depends(department_dependency)],
+    session: AdminClaims,
+):
+    """
+    Queue the deletion of the department, which removes it from its users.
+    """
+    job = await enqueue_deletion(department, session.registration)
+    return EncodedJSONResponse(job.model_dump_json(), status_code=202)
+
+
+@router.post(
+    '/{registration}/users',
+    response_class=ORJSONResponse,
+    response_model=ActionResponse,
+)
+async def add_department_users(
+    request: MembershipRequest,
+    department: Annotated[Department, Depends(department_dependency)],
+    session: AdminClaims,
+):
+    if not await User.owns_all(request.registrations, session.registration):
+        raise HTTPException(status_code=404, detail='User does not exist')
+    updated = await User.add_department_to_users(
+        department.registration, request.registrations, session.registration
+    )
+    return ActionResponse(
+        action='update', message=f'Department added to {updated} users'
+    ).model_dump()
+
+
+@router.post(
+    '/{registration}/users/remove',
+    response_class=ORJSONResponse,
+    response_model=ActionResponse,
+)
+async def remove_department_users(
+    request: MembershipRequest,
+    department: Annotated[Department, Depends(department_dependency)],
+    session: AdminClaims,
 ):
-    deleted, _ = await asyncio.gather(
-        department.delete(),
-        session.db.users.update_many(
-            {'departments': {'$in': [department.registration]}},
-            {'$pull': {'departments': department.registration}},
-        ),
+    updated = await User.remove_department_from_users(
+        department.registration, request.registrations, session.registration
     )
-    return deleted.model_dump()
+    return ActionResponse(
+        action='update', message=f'Department removed from {updated} users'
+    ).model_dump()
@@ -0,0 +1,33 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+
+from ...services.jobs import Job, jobs
+from ..dependencies import AdminClaims
+
+router = APIRouter(prefix='/jobs', tags=['Admin: Jobs'])
+
+
+@router.get('/', response_model=list[Job], response_class=ORJSONResponse)
+async def get_jobs(
+    session: AdminClaims,
+    limit: Annotated[
+        int, Query(description='The number of jobs to return.', le=100)
+    ] = 10,
+):
+    """
+    Get the latest jobs of the admin.
+    """
+    return [
+        job.model_dump(mode='json')
+        for job in await jobs.get_all(session.registration, limit)
+    ]
+
+
+@router.get('/{id}', response_model=Job, response_class=ORJSONResponse)
+async def get_job(id: str, session: AdminClaims):
+    job = await jobs.get(id, session.registration)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job does not exist')
+    return job.model_dump(mode='json')
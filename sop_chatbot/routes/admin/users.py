@@ -1,25 +1,34 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import ORJSONResponse
 
+from ...config import settings
+from ...models.departments import Department
 from ...models.mixins import ActionResponse, PaginatedResponse
 from ...models.users import (
     CreateCommonUserRequest,
+    ImportResponse,
+    MembershipRequest,
     UpdateUserRequest,
     User,
     UserResponse,
 )
+from ...services.imports import CONTENT_TYPES, read_rows
 from ..dependencies import (
+    AdminClaims,
     AdminListDependency,
     AdminObjectDependency,
     DeleteDependency,
-    admin_dependency,
 )
+from ..responses import EncodedJSONResponse
 
 router = APIRouter(prefix='/users', tags=['Admin: Users'])
-users_dependency = AdminListDependency(User)
+users_dependency = AdminListDependency(
+    User, UserResponse, raw=settings.RAW_READS
+)
 user_dependency = AdminObjectDependency(User)
+user_reader = AdminObjectDependency(User, raw=settings.RAW_READS)
 delete_dependency = DeleteDependency(user_dependency)
 
 
@@ -29,28 +38,51 @@ delete_dependency = DeleteDependency(user_dependency)
     response_class=ORJSONResponse,
 )
 async def get_users(
-    users: Annotated[PaginatedResponse[User], Depends(users_dependency)],
+    users: Annotated[
+        PaginatedResponse[UserResponse], Depends(users_dependency)
+    ],
 ):
-    return users.json()
+    return EncodedJSONResponse(users.dump_json())
 
 
 @router.post('/', response_model=User, response_class=ORJSONResponse)
 async def create_user(
     request: CreateCommonUserRequest,
-    session: Annotated[User, Depends(admin_dependency)],
+    session: AdminClaims,
 ):
     user = await User.create(
         create_request=request,
         owner=session.registration,
     )
-    return user.json()
+    return EncodedJSONResponse(user.dump_json())
+
+
+@router.post(
+    '/import', response_model=ImportResponse, response_class=ORJSONResponse
+)
+async def import_users(request: Request, session: AdminClaims):
+    """
+    Create users from a CSV or NDJSON body, parsed as it is received.
+    Each row holds the fields of a user creation.
+    """
+    content_type = request.headers.get('content-type', '')
+    content_type = content_type.split(';')[0].strip()
+    if content_type not in CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f'Expected one of {", ".join(CONTENT_TYPES)}',
+        )
+    response = await User.import_rows(
+        read_rows(request.stream(), content_type), session.registration
+    )
+    return EncodedJSONResponse(response.model_dump_json())
 
 
 @router.get(
     '/{registration}', response_model=User, response_class=ORJSONResponse
 )
-async def get_user(user: Annotated[User, Depends(user_dependency)]):
-    return user.json()
+async def get_user(user: Annotated[User, Depends(user_reader)]):
+    return EncodedJSONResponse(user.dump_json())
 
 
 @router.put(
@@ -60,8 +92,11 @@ async def update_user(
     request: UpdateUserRequest,
     user: Annotated[User, Depends(user_dependency)],
 ):
+    role_changed = request.role is not None and request.role != user.role
     user = await user.update(request.model_dump())
-    return user.json()
+    if role_changed:
+        user = await user.revoke_tokens()
+    return EncodedJSONResponse(user.dump_json())
 
 
 @router.delete(
@@ -71,10 +106,43 @@ async def update_user(
 )
 async def delete_user(
     user: Annotated[User, Depends(user_dependency)],
-    session: Annotated[User, Depends(admin_dependency)],
+    session: AdminClaims,
 ):
     if user.registration == session.registration:
         raise HTTPException(
             status_code=403, detail="You can't delete yourself"
         )
     return (await user.delete()).model_dump()
+
+
+@router.post(
+    '/{registration}/departments',
+    response_model=User,
+    response_class=ORJSONResponse,
+)
+async def add_user_departments(
+    request: MembershipRequest,
+    user: Annotated[User, Depends(user_dependency)],
+    session: AdminClaims,
+):
+    if not await Department.owns_all(
+        request.registrations, session.registration
+    ):
+        raise HTTPException(
+            status_code=404, detail='Department does not exist'
+        )
+    user = await user.add_departments(*request.registrations)
+    return EncodedJSONResponse(user.dump_json())
+
+
+@router.post(
+    '/{registration}/departments/remove',
+    response_model=User,
+    response_class=ORJSONResponse,
+)
+async def remove_user_departments(
+    request: MembershipRequest,
+    user: Annotated[User, Depends(user_dependency)],
+):
+    user = await user.remove_departments(*request.registrations)
+    return EncodedJSONResponse(user.dump_json())
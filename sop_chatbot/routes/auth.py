@@ -12,8 +12,9 @@ from ..models.users import (
     User,
     UserRoles,
 )
-from ..services.auth import Auth, Token
+from ..services.auth import Token
 from .dependencies import UserSession
+from .responses import EncodedJSONResponse
 
 router = APIRouter(prefix='/auth', tags=['Auth'])
 
@@ -38,8 +39,7 @@ async def login(login: Annotated[OAuth2PasswordRequestForm, Depends()]):
             detail='Invalid credentials',
             headers={'WWW-Authenticate': 'Bearer'},
         )
-    jwt = Auth.generate_jwt(user.registration)
-    return Token(access_token=jwt)
+    return Token(access_token=user.generate_jwt())
 
 
 @router.post(
@@ -59,7 +59,7 @@ async def signup(
     """
     create_user_request.role = UserRoles.ADMIN
     user = await Admin.create(create_user_request, owner=None)
-    return user.json()
+    return EncodedJSONResponse(user.dump_json(AdminResponse), status_code=201)
 
 
 @router.post('/admin/login')
@@ -84,8 +84,7 @@ async def admin_login(
             detail='Invalid credentials',
             headers={'WWW-Authenticate': 'Bearer'},
         )
-    jwt = Auth.generate_jwt(user.registration)
-    return Token(access_token=jwt)
+    return Token(access_token=user.generate_jwt())
 
 
 @router.post('/refresh')
@@ -93,5 +92,4 @@ async def refresh(user_session: UserSession):
     """
     Refresh the user's token.
     """
-    jwt = Auth.generate_jwt(user_session.registration)
-    return Token(access_token=jwt)
+    return Token(access_token=user_session.generate_jwt())
@@ -1,42 +1,100 @@
 from abc import ABC, abstractmethod
 from typing import Annotated, Any, Generic
 
-from cachetools import TTLCache, cached
 from fastapi import Depends, HTTPException, Path, Query
+from pydantic import BaseModel, ValidationError
 
 from ..models.mixins import (
     ActionResponse,
     PaginatedResponse,
     PaginationRequest,
+    SearchMode,
     T,
 )
-from ..models.users import User
+from ..models.users import SessionClaims, User
 from ..services.auth import Auth, oauth_scheme
+from ..services.metrics import metrics
 
 
-async def session_dependency(
-    token: Annotated[str, Depends(oauth_scheme)],
-) -> User:
-    @cached(TTLCache(maxsize=1024, ttl=1800))
-    def get_payload(token):
-        return Auth.decode_jwt(token)
-
-    payload = get_payload(token)
+def _decode_session_token(token: str) -> dict:
+    payload = Auth.decode_cached_jwt(token)
     if payload is None:
         raise HTTPException(status_code=401, detail='Invalid token')
     if 'sub' not in payload:
         raise HTTPException(status_code=401, detail='Invalid token')
-    user = await User.get(payload['sub'])
+    return payload
+
+
+async def _load_session_user(payload: dict, cached: bool = True) -> User:
+    if cached:
+        user = await User.get_cached(payload['sub'])
+    else:
+        user = await User.get(payload['sub'])
     if user is None:
         raise HTTPException(status_code=401, detail='Invalid token')
+    if payload.get('ver') != user.token_version:
+        raise HTTPException(status_code=401, detail='Invalid token')
     return user
 
 
+@metrics.timed('session')
+async def session_dependency(
+    token: Annotated[str, Depends(oauth_scheme)],
+) -> User:
+    """
+    Resolve the user of the request's bearer token.
+
+    FastAPI resolves a dependency once per request, so every other
+    dependency that needs the session must declare it (e.g. through
+    ``UserSession``) instead of calling it, sharing a single resolution.
+    """
+    return await _load_session_user(_decode_session_token(token))
+
+
 UserSession = Annotated[User, Depends(session_dependency)]
 
 
-async def admin_dependency(token: Annotated[str, Depends(oauth_scheme)]):
-    session = await session_dependency(token)
+@metrics.timed('writable_session')
+async def writable_session_dependency(
+    token: Annotated[str, Depends(oauth_scheme)],
+) -> User:
+    """
+    Resolve the user of the request's bearer token for routes that update
+    it, reading it from Mongo instead of ``user_cache``: the conditional
+    update of a stale cached copy would fail with a conflict.
+    """
+    return await _load_session_user(_decode_session_token(token), cached=False)
+
+
+@metrics.timed('claims')
+async def claims_dependency(
+    token: Annotated[str, Depends(oauth_scheme)],
+) -> SessionClaims:
+    """
+    Resolve the claims of the request's bearer token.
+
+    Tokens carrying the user's claims are only checked against the user's
+    current token version, which is cached for a few seconds, so no user
+    document is read. Tokens issued without claims fall back to loading
+    the user.
+    """
+    payload = _decode_session_token(token)
+    claims = SessionClaims.from_payload(payload)
+    if claims is None:
+        user = await _load_session_user(payload)
+        return SessionClaims.from_payload(
+            {'sub': user.registration, **user.claims()}
+        )
+    token_version = await User.get_token_version(claims.registration)
+    if token_version != claims.token_version:
+        raise HTTPException(status_code=401, detail='Invalid token')
+    return claims
+
+
+UserClaims = Annotated[SessionClaims, Depends(claims_dependency)]
+
+
+async def admin_dependency(session: UserSession) -> User:
     if session.is_admin:
         return session
     raise HTTPException(status_code=403, detail='Unauthorized')
@@ -45,8 +103,16 @@ async def admin_dependency(token: Annotated[str, Depends(oauth_scheme)]):
 AdminSession = Annotated[User, Depends(admin_dependency)]
 
 
-async def manager_dependency(token: Annotated[str, Depends(oauth_scheme)]):
-    session = await session_dependency(token)
+async def admin_claims_dependency(claims: UserClaims) -> SessionClaims:
+    if claims.is_admin:
+        return claims
+    raise HTTPException(status_code=403, detail='Unauthorized')
+
+
+AdminClaims = Annotated[SessionClaims, Depends(admin_claims_dependency)]
+
+
+async def manager_dependency(session: UserSession) -> User:
     if session.is_manager:
         return session
     raise HTTPException(status_code=403, detail='Unauthorized')
@@ -55,6 +121,15 @@ async def manager_dependency(token: Annotated[str, Depends(oauth_scheme)]):
 ManagerSession = Annotated[User, Depends(manager_dependency)]
 
 
+async def manager_claims_dependency(claims: UserClaims) -> SessionClaims:
+    if claims.is_manager:
+        return claims
+    raise HTTPException(status_code=403, detail='Unauthorized')
+
+
+ManagerClaims = Annotated[SessionClaims, Depends(manager_claims_dependency)]
+
+
 class Dependency(ABC):
     @abstractmethod
     def __init__(self) -> None:  # pragma: no cover
@@ -70,12 +145,36 @@ class ListDependency(Dependency, Generic[T]):
     Dependency to get a list of objects.
     """
 
-    def __init__(self, cls: type[T]) -> None:
+    def __init__(
+        self,
+        cls: type[T],
+        response_model: type[BaseModel] | None = None,
+        raw: bool = False,
+    ) -> None:
         self.cls = cls
+        self.response_model = response_model or cls
+        self.raw = raw
+
+    def sparse_fields(self, fields: str | None) -> set[str] | None:
+        if fields is None:
+            return None
+        sparse_fields = set(fields.split(','))
+        if not sparse_fields <= self.response_model.model_fields.keys():
+            raise HTTPException(status_code=400, detail='Unknown fields')
+        return sparse_fields
+
+    @staticmethod
+    def pagination_request(**kwargs) -> PaginationRequest:
+        try:
+            return PaginationRequest(**kwargs)
+        except ValidationError:
+            raise HTTPException(
+                status_code=400, detail='Invalid pagination request'
+            )
 
     async def __call__(
         self,
-        session_dependency: Annotated[User, Depends(session_dependency)],
+        session_dependency: UserClaims,
         skip: Annotated[
             int, Path(description='The number of objects to skip.')
         ] = 0,
@@ -88,13 +187,46 @@ class ListDependency(Dependency, Generic[T]):
         value: Annotated[
             Any, Path(description='The value to filter the objects.')
         ] = None,
+        after: Annotated[
+            str | None,
+            Query(description='The cursor of the last object already seen.'),
+        ] = None,
+        include_total: Annotated[
+            bool,
+            Query(description='Whether to count the total of objects.'),
+        ] = True,
+        cached_total: Annotated[
+            bool,
+            Query(
+                description='Whether the total may be served from a cache '
+                'a few seconds stale.'
+            ),
+        ] = False,
+        search: Annotated[
+            SearchMode,
+            Query(description='How the query value is matched.'),
+        ] = SearchMode.REGEX,
+        fields: Annotated[
+            str | None,
+            Query(description='Comma separated fields to return.'),
+        ] = None,
     ) -> PaginatedResponse[T]:
-        pagination = PaginationRequest(
-            skip=skip, limit=limit, query=query, value=value
+        pagination = self.pagination_request(
+            skip=skip,
+            limit=limit,
+            query=query,
+            value=value,
+            after=after,
+            include_total=include_total,
+            cached_total=cached_total,
+            search=search,
         )
         return await self.cls.get_all(
             pagination,
             owner=session_dependency.owner,
+            model=self.response_model,
+            fields=self.sparse_fields(fields),
+            raw=self.raw,
             sub=session_dependency.registration,
         )
 
@@ -106,7 +238,7 @@ class AdminListDependency(ListDependency[T]):
 
     async def __call__(
         self,
-        session_dependency: Annotated[User, Depends(admin_dependency)],
+        session_dependency: AdminClaims,
         skip: Annotated[
             int, Query(description='The number of objects to skip.')
         ] = 0,
@@ -119,12 +251,46 @@ class AdminListDependency(ListDependency[T]):
         value: Annotated[
             Any, Query(description='The value to filter the objects.')
         ] = None,
+        after: Annotated[
+            str | None,
+            Query(description='The cursor of the last object already seen.'),
+        ] = None,
+        include_total: Annotated[
+            bool,
+            Query(description='Whether to count the total of objects.'),
+        ] = True,
+        cached_total: Annotated[
+            bool,
+            Query(
+                description='Whether the total may be served from a cache '
+                'a few seconds stale.'
+            ),
+        ] = False,
+        search: Annotated[
+            SearchMode,
+            Query(description='How the query value is matched.'),
+        ] = SearchMode.REGEX,
+        fields: Annotated[
+            str | None,
+            Query(description='Comma separated fields to return.'),
+        ] = None,
     ) -> PaginatedResponse[T]:
-        pagination = PaginationRequest(
-            skip=skip, limit=limit, query=query, value=value
+        pagination = self.pagination_request(
+            skip=skip,
+            limit=limit,
+            query=query,
+            value=value,
+            after=after,
+            include_total=include_total,
+            cached_total=cached_total,
+            search=search,
         )
         return await self.cls.get_all(
-            pagination, owner=session_dependency.registration
+            pagination,
+            owner=session_dependency.registration,
+            model=self.response_model,
+            fields=self.sparse_fields(fields),
+            raw=self.raw,
         )
 
 
@@ -138,14 +304,16 @@ class ObjectDependency(Dependency, Generic[T]):
         cls: type[T],
         foreign_key: str | None = None,
         relational_list: str | None = None,
+        raw: bool = False,
     ) -> None:
         self.cls = cls
         self.foreign_key = foreign_key
         self.relational_list = relational_list
+        self.raw = raw
 
     async def __call__(
         self,
-        session: Annotated[User, Depends(session_dependency)],
+        session: UserClaims,
         registration: Annotated[
             str,
             Path(
@@ -153,7 +321,7 @@ class ObjectDependency(Dependency, Generic[T]):
             ),
         ],
     ) -> T:
-        obj = await self.cls.get(registration)
+        obj = await self.cls.get(registration, raw=self.raw)
 
         if obj is None:
             raise HTTPException(
@@ -169,7 +337,11 @@ class ObjectDependency(Dependency, Generic[T]):
                 authorized = True
 
         if self.relational_list:
-            if obj.registration in getattr(session, self.relational_list, []):
+            relations = getattr(session, self.relational_list, None)
+            if relations is None:
+                user = await User.get_cached(session.registration)
+                relations = getattr(user, self.relational_list, [])
+            if obj.registration in relations:
                 authorized = True
 
         if not authorized:
@@ -185,7 +357,7 @@ class AdminObjectDependency(ObjectDependency[T]):
 
     async def __call__(
         self,
-        session: Annotated[User, Depends(admin_dependency)],
+        session: AdminClaims,
         registration: Annotated[
             str,
             Path(
@@ -193,7 +365,9 @@ class AdminObjectDependency(ObjectDependency[T]):
             ),
         ],
     ) -> T:
-        obj = await self.cls.get(registration, owner=session.registration)
+        obj = await self.cls.get(
+            registration, owner=session.registration, raw=self.raw
+        )
 
         if obj is None:
             raise HTTPException(
@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..services.metrics import metrics
+from ..services.monitoring import PoolStats, pool_monitor
+from ..services.watchdog import LoopLagStats, watchdog
+
+router = APIRouter(prefix='/metrics', tags=['Metrics'])
+
+
+@router.get('', response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Get the metrics of every worker in the Prometheus text format.
+    """
+    return PlainTextResponse(
+        await metrics.render(), media_type='text/plain; version=0.0.4'
+    )
+
+
+@router.get('/pool', response_model=PoolStats)
+def get_pool_stats():
+    """
+    Get the Mongo connection pool stats of the worker serving the request.
+    """
+    return pool_monitor.stats()
+
+
+@router.get('/loop', response_model=LoopLagStats)
+def get_loop_lag_stats():
+    """
+    Get the event loop lag percentiles and latest stalls of the worker
+    serving the request, recorded with ``WATCHDOG`` set.
+    """
+    return watchdog.stats()
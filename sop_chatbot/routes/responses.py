@@ -0,0 +1,10 @@
+from fastapi import Response
+
+
+class EncodedJSONResponse(Response):
+    """
+    Response for JSON the models already encoded, which FastAPI sends
+    without validating or serializing it again.
+    """
+
+    media_type = 'application/json'
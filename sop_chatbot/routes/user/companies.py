@@ -1,19 +1,17 @@
-from typing import Annotated
-
-from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from fastapi.routing import APIRouter
 
+from ...config import settings
 from ...models.companies import Company
-from ...models.users import User
-from ..dependencies import session_dependency
+from ..dependencies import UserClaims
+from ..responses import EncodedJSONResponse
 
 router = APIRouter(prefix='/companies', tags=['Companies'])
 
 
 @router.get('/', response_class=ORJSONResponse, response_model=Company)
 async def get_my_company(
-    session: Annotated[User, Depends(session_dependency)],
+    session: UserClaims,
 ):
-    company = await Company.get(session.company)
-    return company.json()
+    company = await Company.get(session.company, raw=settings.RAW_READS)
+    return EncodedJSONResponse(company.dump_json())
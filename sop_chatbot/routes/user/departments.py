@@ -4,15 +4,17 @@ from fastapi import Depends
 from fastapi.responses import ORJSONResponse
 from fastapi.routing import APIRouter
 
+from ...config import settings
 from ...models.departments import Department
 from ...models.mixins import PaginatedResponse
 from ..dependencies import ListDependency, ObjectDependency
+from ..responses import EncodedJSONResponse
 
 router = APIRouter(prefix='/departments', tags=['Departments'])
 department_dependency = ObjectDependency(
-    Department, relational_list='departments'
+    Department, relational_list='departments', raw=settings.RAW_READS
 )
-departments_dependency = ListDependency(Department)
+departments_dependency = ListDependency(Department, raw=settings.RAW_READS)
 
 
 @router.get(
@@ -25,7 +27,7 @@ async def get_my_departments(
         PaginatedResponse[Department], Depends(departments_dependency)
     ],
 ):
-    return departments.json()
+    return EncodedJSONResponse(departments.dump_json())
 
 
 @router.get(
@@ -34,4 +36,4 @@ async def get_my_departments(
 async def get_department(
     department: Annotated[Department, Depends(department_dependency)],
 ):
-    return department.json()
+    return EncodedJSONResponse(department.dump_json())
@@ -1,3 +1,4 @@
+import math
 from datetime import UTC, datetime, timedelta
 from hashlib import sha256
 
@@ -6,10 +7,23 @@ from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 
 from ..config import settings
+from .cache import Cache
 
 oauth_scheme = OAuth2PasswordBearer(tokenUrl='/api/auth/login')
 
 
+def _token_expiration(token: str, payload: dict, now: float) -> float:
+    return payload.get('exp', math.inf)
+
+
+token_cache = Cache(
+    'tokens',
+    maxsize=settings.TOKEN_CACHE_MAXSIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+    ttu=_token_expiration,
+)
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = 'bearer'
@@ -17,18 +31,23 @@ class Token(BaseModel):
 
 class Auth:
     @staticmethod
-    def generate_jwt(user_registration: str) -> str:
+    def generate_jwt(
+        user_registration: str, claims: dict | None = None
+    ) -> str:
         """
         Generate a JSON Web Token (JWT) for the user.
 
         :param user_registration: The user's registration.
         :type user_registration: str
+        :param claims: Extra claims to carry in the token.
+        :type claims: dict | None
 
         :return: The JWT.
         :rtype: str
         """
         payload = {
             'sub': user_registration,
+            **(claims or {}),
             'exp': datetime.now(UTC) + timedelta(days=7),
         }
         return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
@@ -51,6 +70,44 @@ class Auth:
         except jwt.InvalidTokenError:
             return None
 
+    @staticmethod
+    def decode_cached_jwt(token: str) -> dict | None:
+        """
+        Decode a JSON Web Token (JWT), reusing the payload of tokens that
+        were already verified by this process.
+
+        Cached payloads expire no later than the token's ``exp`` claim.
+        Invalid tokens are never cached.
+
+        :param token: The JWT.
+        :type token: str
+
+        :return: The decoded JWT.
+        :rtype: dict | None
+        """
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = Auth.decode_jwt(token)
+            if payload is not None:
+                token_cache.set(token, payload)
+        return payload
+
+    @staticmethod
+    def revoke_jwts(user_registration: str) -> int:
+        """
+        Evict every cached token issued to the user, so the next request
+        carrying one of them is verified again.
+
+        :param user_registration: The user's registration.
+        :type user_registration: str
+
+        :return: The number of evicted tokens.
+        :rtype: int
+        """
+        return token_cache.evict(
+            lambda token, payload: payload.get('sub') == user_registration
+        )
+
     @staticmethod
     def encrypt_password(password: str) -> str:
         """
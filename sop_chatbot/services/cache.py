@@ -0,0 +1,94 @@
+import time
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from cachetools import TLRUCache
+
+CACHES: dict[str, 'Cache'] = {}
+
+
+class Cache:
+    """
+    Bounded, time-aware LRU cache that counts its hits and misses.
+
+    Every cache is registered in ``CACHES`` by name, so its statistics can
+    be inspected or the whole set can be cleared at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        ttu: Callable[[Hashable, Any, float], float] | None = None,
+    ) -> None:
+        """
+        :param name: The name the cache is registered with.
+        :type name: str
+        :param maxsize: The maximum number of entries kept.
+        :type maxsize: int
+        :param ttl: The maximum number of seconds an entry is kept.
+        :type ttl: float
+        :param ttu: Optional function returning the absolute timestamp an
+            entry must expire at. The earliest of it and ``ttl`` wins.
+        :type ttu: Callable[[Hashable, Any, float], float] | None
+        """
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._ttu = ttu
+        self._cache: TLRUCache = TLRUCache(
+            maxsize=maxsize, ttu=self._expires_at, timer=time.time
+        )
+        CACHES[name] = self
+
+    def _expires_at(self, key: Hashable, value: Any, now: float) -> float:
+        expires_at = now + self.ttl
+        if self._ttu is not None:
+            expires_at = min(expires_at, self._ttu(key, value, now))
+        return expires_at
+
+    def get(self, key: Hashable) -> Any:
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._cache[key] = value
+
+    def pop(self, key: Hashable) -> Any:
+        return self._cache.pop(key, None)
+
+    def evict(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Evict every entry for which ``predicate(key, value)`` is true.
+
+        :return: The number of evicted entries.
+        :rtype: int
+        """
+        evicted = 0
+        for key in list(self._cache):
+            value = self._cache.get(key)
+            if value is not None and predicate(key, value):
+                self._cache.pop(key, None)
+                evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'size': len(self._cache),
+            'maxsize': self._cache.maxsize,
+        }
@@ -0,0 +1,104 @@
+import csv
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import NamedTuple
+
+import orjson
+
+from ..config import settings
+
+CSV = 'text/csv'
+NDJSON = 'application/x-ndjson'
+CONTENT_TYPES = (CSV, NDJSON)
+
+
+class Row(NamedTuple):
+    line: int
+    data: dict | None = None
+    error: str | None = None
+
+
+async def read_lines(
+    chunks: AsyncIterable[bytes],
+) -> AsyncIterator[tuple[int, str | None]]:
+    """
+    Split a streamed body into its non blank lines, keeping only the line
+    being read in memory, up to ``IMPORT_MAX_LINE_LENGTH`` bytes. The rest
+    of longer lines is skipped.
+
+    :param chunks: The body, as it is received.
+    :type chunks: AsyncIterable[bytes]
+
+    :return: The number and the decoded text of each line, or ``None`` as
+        the text of lines that are too long.
+    :rtype: AsyncIterator[tuple[int, str | None]]
+    """
+    number = 0
+    line = bytearray()
+    too_long = False
+    async for chunk in chunks:
+        view = memoryview(chunk)
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if not too_long:
+                line += view[start:] if end == -1 else view[start:end]
+                if len(line) > settings.IMPORT_MAX_LINE_LENGTH:
+                    too_long = True
+                    line.clear()
+            if end == -1:
+                break
+            number += 1
+            if too_long:
+                yield number, None
+            elif line.strip():
+                yield number, line.decode('utf-8', errors='replace')
+            line.clear()
+            too_long = False
+            start = end + 1
+    if too_long:
+        yield number + 1, None
+    elif line.strip():
+        yield number + 1, line.decode('utf-8', errors='replace')
+
+
+async def read_rows(
+    chunks: AsyncIterable[bytes], content_type: str
+) -> AsyncIterator[Row]:
+    """
+    Parse a streamed CSV or NDJSON body one row at a time. Rows that can't
+    be parsed are yielded with an error instead of stopping the parsing.
+
+    CSV bodies start with a header line naming the fields, and can't have
+    line breaks inside quoted values.
+
+    :param chunks: The body, as it is received.
+    :type chunks: AsyncIterable[bytes]
+    :param content_type: Either ``CSV`` or ``NDJSON``.
+    :type content_type: str
+
+    :return: The rows of the body.
+    :rtype: AsyncIterator[Row]
+    """
+    header = None
+    async for number, line in read_lines(chunks):
+        if line is None:
+            yield Row(number, error='Line too long')
+            continue
+        if content_type == NDJSON:
+            try:
+                data = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                yield Row(number, error='Invalid JSON')
+                continue
+            if isinstance(data, dict):
+                yield Row(number, data)
+            else:
+                yield Row(number, error='Expected a JSON object')
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = values
+        elif len(values) != len(header):
+            yield Row(number, error=f'Expected {len(header)} columns')
+        else:
+            yield Row(number, dict(zip(header, values)))
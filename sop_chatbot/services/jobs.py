@@ -0,0 +1,296 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from enum import StrEnum
+from typing import Annotated
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ReturnDocument
+
+from .. import session
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[dict | None]]
+
+
+class JobStatus(StrEnum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class Job(BaseModel):
+    id: Annotated[str, Field(description='The id of the job')]
+    kind: Annotated[str, Field(description='What the job does')]
+    owner: Annotated[str, Field(description='Who enqueued the job')]
+    payload: Annotated[dict, Field(description='The arguments of the job')]
+    status: Annotated[JobStatus, Field(description='The status of the job')]
+    attempts: Annotated[int, Field(description='How many times it ran')]
+    max_attempts: Annotated[
+        int, Field(description='How many times it runs before failing')
+    ]
+    result: Annotated[
+        dict | None, Field(description='What the job returned')
+    ] = None
+    error: Annotated[
+        str | None, Field(description='Why the last attempt failed')
+    ] = None
+    created_at: Annotated[
+        datetime, Field(description='When the job was enqueued')
+    ]
+    updated_at: Annotated[
+        datetime, Field(description='When the job last changed')
+    ]
+    run_at: Annotated[
+        datetime, Field(description='When the job runs next, if queued')
+    ]
+
+
+class Jobs:
+    """
+    Queue of jobs persisted in the ``jobs`` collection, run in the
+    background by workers started with the application.
+
+    Workers claim a job by atomically marking it as running for
+    ``JOB_LOCK_TIMEOUT`` seconds. Jobs whose worker stopped are claimed
+    again once the lock expires, so handlers must be idempotent. Failed
+    jobs are retried with an exponential backoff, up to their
+    ``max_attempts``.
+    """
+
+    indexes = (
+        # claim
+        IndexModel([('status', 1), ('run_at', 1)]),
+        # get_all
+        IndexModel([('owner', 1), ('_id', -1)]),
+    )
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, Handler] = {}
+        self._stopping = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+    @staticmethod
+    def table_name() -> str:
+        return 'jobs'
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        """
+        Register the function running the jobs of ``kind``. It receives the
+        job's payload, and what it returns is stored as the job's result.
+        """
+
+        def register(function: Handler) -> Handler:
+            self.handlers[kind] = function
+            return function
+
+        return register
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        owner: str,
+        max_attempts: int | None = None,
+    ) -> Job:
+        """
+        :param kind: What the job does, a kind registered with ``handler``.
+        :type kind: str
+        :param payload: The arguments of the job.
+        :type payload: dict
+        :param owner: The registration of who enqueued the job.
+        :type owner: str
+        :param max_attempts: How many times the job runs before failing,
+            ``JOB_MAX_ATTEMPTS`` by default.
+        :type max_attempts: int | None
+
+        :return: The queued job.
+        :rtype: Job
+        """
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind {kind}')
+        now = datetime.now()
+        document = {
+            'kind': kind,
+            'owner': owner,
+            'payload': payload,
+            'status': JobStatus.QUEUED.value,
+            'attempts': 0,
+            'max_attempts': max_attempts or settings.JOB_MAX_ATTEMPTS,
+            'created_at': now,
+            'updated_at': now,
+            'run_at': now,
+            'locked_until': None,
+        }
+        id = (
+            await session.db[self.table_name()].insert_one(document)
+        ).inserted_id
+        return Job(id=str(id), **document)
+
+    async def get(self, id: str, owner: str) -> Job | None:
+        try:
+            find = {'_id': ObjectId(id), 'owner': owner}
+        except InvalidId:
+            return None
+        obj = await session.db[self.table_name()].find_one(find)
+        if obj:
+            return Job(id=str(obj['_id']), **obj)
+
+    async def get_all(self, owner: str, limit: int = 10) -> list[Job]:
+        """
+        Get the latest jobs enqueued by ``owner``.
+        """
+        objs = (
+            session.db[self.table_name()]
+            .find({'owner': owner})
+            .sort('_id', -1)
+            .limit(limit)
+        )
+        return [Job(id=str(obj['_id']), **obj) async for obj in objs]
+
+    async def claim(self) -> Job | None:
+        """
+        Mark the next due job as running, if there is one.
+        """
+        now = datetime.now()
+        obj = await session.db[self.table_name()].find_one_and_update(
+            {
+                'kind': {'$in': list(self.handlers)},
+                '$or': [
+                    {
+                        'status': JobStatus.QUEUED.value,
+                        'run_at': {'$lte': now},
+                    },
+                    {
+                        'status': JobStatus.RUNNING.value,
+                        'locked_until': {'$lt': now},
+                    },
+                ],
+            },
+            {
+                '$set': {
+                    'status': JobStatus.RUNNING.value,
+                    'locked_until': now
+                    + timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+                    'updated_at': now,
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('run_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if obj:
+            return Job(id=str(obj['_id']), **obj)
+
+    async def run(self, job: Job) -> None:
+        """
+        Run a claimed job and record how it ended.
+        """
+        if job.attempts > job.max_attempts:
+            # Its worker stopped while running the last attempt.
+            await self._finish(job, JobStatus.FAILED, error=job.error)
+            return
+        try:
+            result = await self.handlers[job.kind](job.payload)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            if job.attempts < job.max_attempts:
+                delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                await self._finish(
+                    job,
+                    JobStatus.QUEUED,
+                    error=error,
+                    run_at=datetime.now() + timedelta(seconds=delay),
+                )
+            else:
+                await self._finish(job, JobStatus.FAILED, error=error)
+        else:
+            await self._finish(job, JobStatus.DONE, result=result)
+
+    async def _finish(self, job: Job, status: JobStatus, **fields) -> None:
+        # Matching the attempt leaves jobs claimed again by another worker,
+        # after their lock expired, to that worker.
+        await session.db[self.table_name()].update_one(
+            {'_id': ObjectId(job.id), 'attempts': job.attempts},
+            {
+                '$set': {
+                    'status': status.value,
+                    'locked_until': None,
+                    'updated_at': datetime.now(),
+                    **fields,
+                }
+            },
+        )
+
+    async def run_next(self) -> Job | None:
+        """
+        Claim and run the next due job, if there is one.
+
+        :return: The job that ran.
+        :rtype: Job | None
+        """
+        job = await self.claim()
+        if job is not None:
+            await self.run(job)
+        return job
+
+    async def work(self) -> None:
+        """
+        Run jobs as they are due, at most ``JOB_CONCURRENCY`` at once, until
+        ``stop`` is called. Jobs already running are then awaited.
+        """
+        semaphore = asyncio.Semaphore(settings.JOB_CONCURRENCY)
+        running: set[asyncio.Task] = set()
+
+        def done(task: asyncio.Task) -> None:
+            running.discard(task)
+            semaphore.release()
+            # ``run`` records the errors of the handlers, so these are the
+            # ones of recording them, such as a lost connection.
+            if not task.cancelled() and task.exception() is not None:
+                logger.error('Could not run a job', exc_info=task.exception())
+
+        while not self._stopping.is_set():
+            await semaphore.acquire()
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception('Could not claim a job')
+                job = None
+            if job is None:
+                semaphore.release()
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), settings.JOB_POLL_INTERVAL
+                    )
+                except TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self.run(job))
+            running.add(task)
+            task.add_done_callback(done)
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def start(self) -> None:
+        """
+        Start ``JOB_WORKERS`` workers in the running event loop.
+        """
+        self._stopping.clear()
+        self._workers = [
+            asyncio.create_task(self.work())
+            for _ in range(settings.JOB_WORKERS)
+        ]
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        await asyncio.gather(*self._workers)
+        self._workers = []
+
+
+jobs = Jobs()
@@ -0,0 +1,451 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import orjson
+from pymongo import monitoring
+
+from ..config import settings
+from .cache import CACHES
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in seconds.
+BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = tuple[str, ...]
+
+
+class Metric:
+    """
+    Values of a metric by label values. Metrics are only changed and
+    snapshotted on the event loop, so they need no locks; threads only
+    get their serialized snapshots.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[Labels, Any] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            'type': self.type,
+            'help': self.help,
+            'labels': self.labels,
+            'values': [
+                [labels, value] for labels, value in self.values.items()
+            ],
+        }
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Gauges of several workers are added up, so they must be totals, like
+    the requests in flight.
+    """
+
+    type = 'gauge'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """
+    The value of each label set is the count of observations in every
+    bucket, the last one unbounded, followed by their sum.
+    """
+
+    type = 'histogram'
+
+    def observe(self, *labels: str, value: float) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(BUCKETS) + 1) + [0.0]
+        counts[bisect_left(BUCKETS, value)] += 1
+        counts[-1] += value
+
+
+class CommandCollector(monitoring.CommandListener):
+    """
+    Queues the collection, name and duration of every Mongo command. The
+    listener runs in the threads of the driver, so it only appends to a
+    deque, which is thread safe without locks, and the metrics are updated
+    from the event loop when collected.
+    """
+
+    def __init__(self, maxlen: int = 100_000) -> None:
+        self.commands: deque[tuple[str, str, float, bool]] = deque(
+            maxlen=maxlen
+        )
+        self._collections: dict[tuple, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get('collection')
+        if isinstance(collection, str):
+            self._collections[event.connection_id, event.request_id] = (
+                collection
+            )
+
+    def _finished(self, event, failed: bool) -> None:
+        collection = self._collections.pop(
+            (event.connection_id, event.request_id), None
+        )
+        if collection is not None:
+            self.commands.append(
+                (
+                    collection,
+                    event.command_name,
+                    event.duration_micros / 1_000_000,
+                    failed,
+                )
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, failed=True)
+
+
+class Metrics:
+    """
+    Registry of the metrics of the worker, exposed in the Prometheus text
+    format.
+
+    With ``METRICS_DIR``, every worker writes a snapshot of its metrics
+    there each ``METRICS_FLUSH_INTERVAL`` seconds, and ``render`` adds up
+    the snapshots of all of them, so any worker can serve the metrics of
+    the whole server. Snapshots not written for three intervals, of
+    stopped workers, are removed.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.command_collector = CommandCollector()
+        self._tasks: list[asyncio.Task] = []
+        self.requests = self.counter(
+            'http_requests_total',
+            'Requests handled',
+            ('method', 'route', 'status'),
+        )
+        self.request_duration = self.histogram(
+            'http_request_duration_seconds',
+            'Time taken to handle requests',
+            ('method', 'route'),
+        )
+        self.in_flight = self.gauge(
+            'http_requests_in_flight', 'Requests being handled', ('method',)
+        )
+        self.dependency_duration = self.histogram(
+            'dependency_duration_seconds',
+            'Time taken to resolve route dependencies',
+            ('dependency',),
+        )
+        self.command_duration = self.histogram(
+            'mongo_command_duration_seconds',
+            'Time taken by Mongo commands',
+            ('collection', 'command'),
+        )
+        self.command_failures = self.counter(
+            'mongo_command_failures_total',
+            'Mongo commands that failed',
+            ('collection', 'command'),
+        )
+        self.cache_hits = self.counter(
+            'cache_hits_total', 'Cache lookups that hit', ('cache',)
+        )
+        self.cache_misses = self.counter(
+            'cache_misses_total', 'Cache lookups that missed', ('cache',)
+        )
+        self.loop_lag = self.histogram(
+            'event_loop_lag_seconds',
+            'Delay of callbacks scheduled on the event loop',
+        )
+
+    def _register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Labels = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Labels = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Labels = ()
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels))
+
+    def timed(self, dependency: str) -> Callable:
+        """
+        Record the time taken by an async dependency in
+        ``dependency_duration_seconds``.
+        """
+
+        def decorator(function: Callable[..., Awaitable]) -> Callable:
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self.dependency_duration.observe(
+                        dependency, value=time.perf_counter() - start
+                    )
+
+            return wrapper
+
+        return decorator
+
+    def collect(self) -> dict:
+        """
+        Update the metrics read from elsewhere and snapshot them all.
+        """
+        commands = self.command_collector.commands
+        while commands:
+            collection, command, duration, failed = commands.popleft()
+            self.command_duration.observe(collection, command, value=duration)
+            if failed:
+                self.command_failures.inc(collection, command)
+        for name, cache in CACHES.items():
+            self.cache_hits.values[name,] = cache.hits
+            self.cache_misses.values[name,] = cache.misses
+        return {
+            name: metric.snapshot() for name, metric in self.metrics.items()
+        }
+
+    def _snapshot_path(self) -> Path:
+        return Path(settings.METRICS_DIR) / f'{os.getpid()}.json'
+
+    def write_snapshot(self, snapshot: bytes) -> None:
+        """
+        Write the serialized ``snapshot`` of the worker, in a thread.
+        """
+        path = self._snapshot_path()
+        temporary = path.with_suffix('.tmp')
+        temporary.write_bytes(snapshot)
+        temporary.replace(path)
+
+    def read_snapshots(self, snapshot: bytes) -> list[dict]:
+        """
+        Write the serialized ``snapshot`` of the worker and read the ones
+        of every worker, in a thread.
+        """
+        self.write_snapshot(snapshot)
+        stale = time.time() - 3 * settings.METRICS_FLUSH_INTERVAL
+        snapshots = []
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+                    continue
+                snapshots.append(orjson.loads(path.read_bytes()))
+            except (FileNotFoundError, orjson.JSONDecodeError):
+                # Removed or being replaced by its worker.
+                continue
+        return snapshots
+
+    async def render(self) -> str:
+        """
+        The metrics of every worker in the Prometheus text format.
+        """
+        snapshot = self.collect()
+        if settings.METRICS_DIR is None:
+            snapshots = [snapshot]
+        else:
+            snapshots = await asyncio.to_thread(
+                self.read_snapshots, orjson.dumps(snapshot)
+            )
+        return exposition(merge(snapshots))
+
+    async def _flush(self) -> None:
+        while True:
+            await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL)
+            snapshot = orjson.dumps(self.collect())
+            try:
+                await asyncio.to_thread(self.write_snapshot, snapshot)
+            except OSError:
+                logger.exception('Could not write the metrics snapshot')
+
+    async def _sample_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = settings.LOOP_LAG_INTERVAL
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lag = loop.time() - start - interval
+            self.loop_lag.observe(value=max(lag, 0))
+
+    def start(self) -> None:
+        """
+        Start sampling the event loop lag and, with ``METRICS_DIR``,
+        writing the snapshots of the worker.
+        """
+        self._tasks = [asyncio.create_task(self._sample_loop_lag())]
+        if settings.METRICS_DIR is not None:
+            Path(settings.METRICS_DIR).mkdir(parents=True, exist_ok=True)
+            self._tasks.append(asyncio.create_task(self._flush()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if settings.METRICS_DIR is not None:
+            self._snapshot_path().unlink(missing_ok=True)
+
+
+def merge(snapshots: list[dict]) -> dict:
+    """
+    Add up the values of the same metric and labels across snapshots.
+    """
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            values = merged.setdefault(name, {**metric, 'values': {}})[
+                'values'
+            ]
+            for labels, value in metric['values']:
+                labels = tuple(labels)
+                if labels not in values:
+                    values[labels] = value
+                elif isinstance(value, list):
+                    values[labels] = [
+                        a + b for a, b in zip(values[labels], value)
+                    ]
+                else:
+                    values[labels] += value
+    return merged
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _labels(names, values, **extra) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ''
+    return (
+        '{'
+        + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        + '}'
+    )
+
+
+def exposition(merged: dict) -> str:
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        for labels, value in metric['values'].items():
+            if metric['type'] != 'histogram':
+                lines.append(
+                    f'{name}{_labels(metric["labels"], labels)} {value}'
+                )
+                continue
+            *counts, total = value
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, '+Inf'), counts):
+                cumulative += count
+                bucket = _labels(metric['labels'], labels, le=bound)
+                lines.append(f'{name}_bucket{bucket} {cumulative}')
+            lines.append(
+                f'{name}_sum{_labels(metric["labels"], labels)} {total}'
+            )
+            lines.append(
+                f'{name}_count{_labels(metric["labels"], labels)} {cumulative}'
+            )
+    hits = merged.get('cache_hits_total', {'values': {}})['values']
+    misses = merged.get('cache_misses_total', {'values': {}})['values']
+    lines.append('# HELP cache_hit_ratio Share of cache lookups that hit')
+    lines.append('# TYPE cache_hit_ratio gauge')
+    for labels, hit in hits.items():
+        lookups = hit + misses.get(labels, 0)
+        ratio = hit / lookups if lookups else 0
+        lines.append(f'cache_hit_ratio{_labels(("cache",), labels)} {ratio}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Records the requests in flight, and the status and duration of every
+    request by route template.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        method = scope['method']
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        metrics.in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight.dec(method)
+            # Routing leaves the matched route in the scope.
+            route = scope.get('route')
+            path = route.path if route is not None else 'unmatched'
+            metrics.requests.inc(method, path, str(status))
+            metrics.request_duration.observe(
+                method, path, value=time.perf_counter() - start
+            )
+
+
+metrics = Metrics()
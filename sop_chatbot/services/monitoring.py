@@ -0,0 +1,301 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+from pymongo import monitoring
+
+from ..config import settings
+
+access_logger = logging.getLogger('sop_chatbot.access')
+
+
+class PoolStats(BaseModel):
+    pid: Annotated[int, Field(description='The worker the stats are from')]
+    connections_created: Annotated[
+        int, Field(description='Connections opened since the start')
+    ]
+    connections_closed: Annotated[
+        int, Field(description='Connections closed since the start')
+    ]
+    connections_open: Annotated[int, Field(description='Connections open')]
+    connections_in_use: Annotated[
+        int, Field(description='Connections checked out of the pool')
+    ]
+    checkouts: Annotated[int, Field(description='Connections checked out')]
+    checkout_failures: Annotated[
+        int, Field(description='Checkouts that failed, as on a timeout')
+    ]
+    checkout_wait_mean_ms: Annotated[
+        float, Field(description='Mean time waited for a connection')
+    ]
+    checkout_wait_max_ms: Annotated[
+        float, Field(description='Longest time waited for a connection')
+    ]
+    waiters: Annotated[
+        int, Field(description='Operations waiting for a connection')
+    ]
+    max_waiters: Annotated[
+        int, Field(description='Most operations waiting at once')
+    ]
+    pools_cleared: Annotated[
+        int, Field(description='Times a pool was cleared, as on errors')
+    ]
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Records the connection pool events of the Mongo client. Events come
+    from the threads of the driver, so every change holds a lock.
+
+    The stats are those of the current process; every uvicorn worker has
+    its own client and monitor.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.connections_in_use = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_wait_total = 0.0
+            self.checkout_wait_max = 0.0
+            self.waiters = 0
+            self.max_waiters = 0
+            self.pools_cleared = 0
+
+    def _waited(self, duration: float | None) -> None:
+        self.waiters -= 1
+        if duration is not None:
+            self.checkout_wait_total += duration
+            self.checkout_wait_max = max(self.checkout_wait_max, duration)
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(
+        self, event: monitoring.ConnectionCreatedEvent
+    ) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(
+        self, event: monitoring.ConnectionClosedEvent
+    ) -> None:
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        with self._lock:
+            self.waiters += 1
+            self.max_waiters = max(self.max_waiters, self.waiters)
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+            self._waited(event.duration)
+
+    def connection_checked_out(
+        self, event: monitoring.ConnectionCheckedOutEvent
+    ) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.connections_in_use += 1
+            self._waited(event.duration)
+
+    def connection_checked_in(
+        self, event: monitoring.ConnectionCheckedInEvent
+    ) -> None:
+        with self._lock:
+            self.connections_in_use -= 1
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            waited = self.checkouts + self.checkout_failures
+            return PoolStats(
+                pid=os.getpid(),
+                connections_created=self.connections_created,
+                connections_closed=self.connections_closed,
+                connections_open=self.connections_created
+                - self.connections_closed,
+                connections_in_use=self.connections_in_use,
+                checkouts=self.checkouts,
+                checkout_failures=self.checkout_failures,
+                checkout_wait_mean_ms=(
+                    self.checkout_wait_total / waited * 1000 if waited else 0
+                ),
+                checkout_wait_max_ms=self.checkout_wait_max * 1000,
+                waiters=self.waiters,
+                max_waiters=self.max_waiters,
+                pools_cleared=self.pools_cleared,
+            )
+
+
+pool_monitor = PoolMonitor()
+
+
+@dataclass
+class RequestTimings:
+    """
+    The Mongo commands a request issued, their total duration in seconds
+    and the documents they returned.
+    """
+
+    commands: int = 0
+    db_time: float = 0.0
+    db_documents: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, duration_micros: int, documents: int) -> None:
+        with self._lock:
+            self.commands += 1
+            self.db_time += duration_micros / 1_000_000
+            self.db_documents += documents
+
+
+# The timings of the request being handled. Motor copies the context into
+# the thread running each operation, so commands see it with both drivers.
+current_request: ContextVar[RequestTimings | None] = ContextVar(
+    'current_request', default=None
+)
+
+
+def returned_documents(reply: dict) -> int:
+    """
+    The documents in the cursor batch of a command's reply, counted
+    without encoding the reply again.
+    """
+    cursor = reply.get('cursor')
+    if not cursor:
+        return 0
+    return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Adds the duration and returned documents of every Mongo command to the
+    timings of the request that issued it, if any.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        timings = current_request.get()
+        if timings is not None:
+            timings.record(
+                event.duration_micros, returned_documents(event.reply)
+            )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        timings = current_request.get()
+        if timings is not None:
+            timings.record(event.duration_micros, 0)
+
+
+command_timer = CommandTimer()
+
+
+class RequestTimingMiddleware:
+    """
+    Times the database commands of each request. The totals reach the
+    client as a ``Server-Timing`` header and are written to the access log,
+    where requests issuing more than ``REQUEST_QUERY_LIMIT`` commands are
+    flagged as warnings.
+
+    The header is sent with the response start, so it leaves out commands
+    issued while a response streams. The access log has them all.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = current_request.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                elapsed = time.perf_counter() - start
+                message['headers'] = [
+                    *message.get('headers', []),
+                    (b'server-timing', server_timing(timings, elapsed)),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            log_request(scope, status, timings, time.perf_counter() - start)
+
+
+def server_timing(timings: RequestTimings, elapsed: float) -> bytes:
+    db = timings.db_time * 1000
+    app = max(elapsed * 1000 - db, 0)
+    return (
+        f'db;dur={db:.2f};desc="{timings.commands} commands", '
+        f'app;dur={app:.2f}'
+    ).encode()
+
+
+def log_request(
+    scope: dict, status: int, timings: RequestTimings, elapsed: float
+) -> None:
+    flagged = timings.commands > settings.REQUEST_QUERY_LIMIT
+    access_logger.log(
+        logging.WARNING if flagged else logging.INFO,
+        '%s %s %s %.2fms db=%.2fms commands=%d%s',
+        scope['method'],
+        scope['path'],
+        status,
+        elapsed * 1000,
+        timings.db_time * 1000,
+        timings.commands,
+        ' too many queries' if flagged else '',
+        extra={
+            'method': scope['method'],
+            'path': scope['path'],
+            'status': status,
+            'duration_ms': elapsed * 1000,
+            'db_ms': timings.db_time * 1000,
+            'db_commands': timings.commands,
+            'db_documents': timings.db_documents,
+            'too_many_queries': flagged,
+        },
+    )
@@ -0,0 +1,93 @@
+from collections.abc import Iterator
+
+from pymongo import ReturnDocument, UpdateOne
+
+from .. import session
+from ..config import settings
+
+
+class Sequences:
+    """
+    Allocate increasing integers from the ``counters`` collection.
+
+    Each counter is a document ``{'_id': key, 'seq': last_allocated}``
+    incremented atomically, so concurrent workers never receive the same
+    value.
+    """
+
+    def __init__(self, block_size: int = 1) -> None:
+        """
+        :param block_size: How many values a worker reserves at once for
+            ``next``. Values left in a block when the worker stops are
+            never handed out.
+        :type block_size: int
+        """
+        self.block_size = block_size
+        self._blocks: dict[str, Iterator[int]] = {}
+
+    @staticmethod
+    def table_name() -> str:
+        return 'counters'
+
+    async def reserve(self, key: str, count: int = 1) -> range:
+        """
+        Reserve ``count`` consecutive values of a counter in a single
+        round-trip.
+
+        :param key: The counter key.
+        :type key: str
+        :param count: The number of values to reserve.
+        :type count: int
+
+        :return: The reserved values.
+        :rtype: range
+        """
+        counter = await session.db[self.table_name()].find_one_and_update(
+            {'_id': key},
+            {'$inc': {'seq': count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return range(counter['seq'] - count + 1, counter['seq'] + 1)
+
+    async def next(self, key: str) -> int:
+        """
+        Get the next value of a counter, reserving a new block of values
+        only when the worker's current one is exhausted.
+
+        :param key: The counter key.
+        :type key: str
+
+        :return: The allocated value.
+        :rtype: int
+        """
+        value = next(self._blocks.get(key, iter(())), None)
+        if value is None:
+            block = iter(await self.reserve(key, self.block_size))
+            value = next(block)
+            self._blocks[key] = block
+        return value
+
+    async def seed(self, counters: dict[str, int]) -> None:
+        """
+        Make sure each counter never hands out the given value or anything
+        below it.
+
+        :param counters: The highest value already in use by counter key.
+        :type counters: dict[str, int]
+        """
+        if not counters:
+            return
+        await session.db[self.table_name()].bulk_write(
+            [
+                UpdateOne({'_id': key}, {'$max': {'seq': value}}, upsert=True)
+                for key, value in counters.items()
+            ],
+            ordered=False,
+        )
+
+    def clear(self) -> None:
+        self._blocks.clear()
+
+
+sequences = Sequences(settings.REGISTRATION_BLOCK_SIZE)
@@ -0,0 +1,211 @@
+import asyncio
+import asyncio.base_events
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import Context, ContextVar
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# The ASGI scope of the request being handled, whose route is only known
+# once it was routed.
+current_scope: ContextVar[dict | None] = ContextVar(
+    'current_scope', default=None
+)
+
+
+def route_of(context: Context) -> str | None:
+    """
+    The route of the request handled in ``context``, if any.
+    """
+    scope = context.get(current_scope)
+    if scope is None:
+        return None
+    route = scope.get('route')
+    path = route.path if route is not None else scope['path']
+    return f'{scope["method"]} {path}'
+
+
+class Stall(BaseModel):
+    at: Annotated[datetime, Field(description='When the stall was detected')]
+    blocked_ms: Annotated[
+        float, Field(description='How long the loop was blocked, at least')
+    ]
+    task: Annotated[
+        str | None, Field(description='The task blocking the loop')
+    ] = None
+    route: Annotated[
+        str | None, Field(description='The route of the blocking task')
+    ] = None
+    stack: Annotated[str, Field(description='The stack of the blocking code')]
+
+
+class LoopLagStats(BaseModel):
+    pid: Annotated[int, Field(description='The worker the stats are from')]
+    samples: Annotated[int, Field(description='Lag samples in the window')]
+    p50_ms: Annotated[float, Field(description='Median loop lag')]
+    p90_ms: Annotated[float, Field(description='90th percentile loop lag')]
+    p99_ms: Annotated[float, Field(description='99th percentile loop lag')]
+    max_ms: Annotated[float, Field(description='Highest loop lag')]
+    stalls: Annotated[
+        list[Stall], Field(description='The latest stalls, oldest first')
+    ]
+
+
+class Watchdog:
+    """
+    Measures the lag of the event loop with a heartbeat task scheduled
+    every ``WATCHDOG_INTERVAL`` seconds.
+
+    A thread checks the heartbeat. When the loop goes without a beat for
+    longer than ``WATCHDOG_THRESHOLD`` seconds, the thread captures the
+    stack of the loop's thread, which is the code blocking it, with the
+    task and route it belongs to.
+
+    With ``WATCHDOG_DEBUG``, the loop also runs in asyncio's debug mode,
+    whose warnings about slow callbacks name the route of their task.
+    That only applies to asyncio's own loop, not to uvloop.
+    """
+
+    def __init__(self, max_stalls: int = 20) -> None:
+        self.lags: deque[float] = deque(maxlen=settings.WATCHDOG_SAMPLES)
+        self.stalls: deque[Stall] = deque(maxlen=max_stalls)
+        self._beat = time.monotonic()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._task: asyncio.Task | None = None
+        self._format_handle = None
+
+    async def _heartbeat(self) -> None:
+        interval = settings.WATCHDOG_INTERVAL
+        while True:
+            start = self._beat = time.monotonic()
+            await asyncio.sleep(interval)
+            self.lags.append(max(time.monotonic() - start - interval, 0))
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, thread_id: int) -> None:
+        reported = None
+        while not self._stopping.wait(settings.WATCHDOG_INTERVAL):
+            beat = self._beat
+            blocked = time.monotonic() - beat - settings.WATCHDOG_INTERVAL
+            if blocked >= settings.WATCHDOG_THRESHOLD and beat != reported:
+                reported = beat
+                self._report(loop, thread_id, blocked)
+
+    def _report(
+        self, loop: asyncio.AbstractEventLoop, thread_id: int, blocked: float
+    ) -> None:
+        frame = sys._current_frames().get(thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame else ''
+        task = asyncio.tasks._current_tasks.get(loop)
+        stall = Stall(
+            at=datetime.now(),
+            blocked_ms=blocked * 1000,
+            task=task.get_name() if task is not None else None,
+            route=route_of(task.get_context()) if task is not None else None,
+            stack=stack,
+        )
+        self.stalls.append(stall)
+        logger.warning(
+            'Event loop blocked for at least %.3fs by task %s of route %s\n%s',
+            blocked,
+            stall.task,
+            stall.route,
+            stack,
+        )
+
+    def stats(self) -> LoopLagStats:
+        lags = sorted(self.lags)
+        percentiles = [0.0] * 99
+        if len(lags) > 1:
+            percentiles = statistics.quantiles(lags, n=100)
+        elif lags:
+            percentiles = lags * 99
+        return LoopLagStats(
+            pid=os.getpid(),
+            samples=len(lags),
+            p50_ms=percentiles[49] * 1000,
+            p90_ms=percentiles[89] * 1000,
+            p99_ms=percentiles[98] * 1000,
+            max_ms=lags[-1] * 1000 if lags else 0,
+            stalls=list(self.stalls),
+        )
+
+    def _start_debug(self, loop: asyncio.AbstractEventLoop) -> None:
+        loop.set_debug(True)
+        loop.slow_callback_duration = settings.WATCHDOG_THRESHOLD
+        self._format_handle = format_handle = (
+            asyncio.base_events._format_handle
+        )
+
+        def format_handle_with_route(handle) -> str:
+            text = format_handle(handle)
+            route = route_of(handle._context)
+            return text if route is None else f'{text} in route {route}'
+
+        asyncio.base_events._format_handle = format_handle_with_route
+
+    def start(self) -> None:
+        """
+        Start watching the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if settings.WATCHDOG_DEBUG:
+            self._start_debug(loop)
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(loop, threading.get_ident()),
+            name='watchdog',
+            daemon=True,
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.to_thread(self._thread.join)
+        self._task = self._thread = None
+        if self._format_handle is not None:
+            asyncio.base_events._format_handle = self._format_handle
+            asyncio.get_running_loop().set_debug(False)
+            self._format_handle = None
+
+
+class WatchdogMiddleware:
+    """
+    Keeps the scope of each request in ``current_scope``, so stalls are
+    attributed to its route.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+
+watchdog = Watchdog()
@@ -1,6 +1,86 @@
+import inspect
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
 
 from .config import settings
+from .services.metrics import metrics
+from .services.monitoring import command_timer, pool_monitor
+
+DRIVERS = {
+    'motor': AsyncIOMotorClient,
+    'pymongo': AsyncMongoClient,
+}
+
+
+def connect(uri: str):
+    """
+    Create a client of the ``MONGO_DRIVER`` backend. Motor runs each
+    operation of PyMongo in a thread pool, while the PyMongo one is native
+    to asyncio. The ``MONGO_*`` pool settings that are set override the
+    options of ``uri``, and the pool is recorded by ``pool_monitor``. With
+    ``REQUEST_TIMING``, its commands are timed by ``command_timer``, and
+    with ``METRICS`` they are recorded by collection.
+    """
+    pool = {
+        'maxPoolSize': settings.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': settings.MONGO_MIN_POOL_SIZE,
+        'maxIdleTimeMS': settings.MONGO_MAX_IDLE_TIME_MS,
+        'waitQueueTimeoutMS': settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+    options = {
+        **{key: value for key, value in pool.items() if value is not None},
+        'event_listeners': [pool_monitor],
+    }
+    if settings.REQUEST_TIMING:
+        options['event_listeners'].append(command_timer)
+    if settings.METRICS:
+        options['event_listeners'].append(metrics.command_collector)
+    if settings.MONGO_COMPRESSORS:
+        options['compressors'] = settings.MONGO_COMPRESSORS
+    return DRIVERS[settings.MONGO_DRIVER](uri, **options)
+
+
+async def aggregate(collection, pipeline: list[dict]) -> AsyncIterator[dict]:
+    """
+    Run ``pipeline`` on ``collection`` with either backend, as only the
+    PyMongo one has to be awaited for the cursor.
+    """
+    cursor = collection.aggregate(pipeline)
+    if inspect.isawaitable(cursor):
+        cursor = await cursor
+    async for document in cursor:
+        yield document
+
+
+@asynccontextmanager
+async def transaction():
+    """
+    Start a transaction with either backend, yielding the session its
+    operations must be sent with.
+    """
+    mongo_session = db.client.start_session()
+    if inspect.isawaitable(mongo_session):
+        mongo_session = await mongo_session
+    async with mongo_session:
+        started = mongo_session.start_transaction()
+        if inspect.isawaitable(started):
+            started = await started
+        async with started:
+            yield mongo_session
+
+
+async def close():
+    """
+    Close the client with either backend, as only the PyMongo one has to
+    be awaited.
+    """
+    closed = client.close()
+    if inspect.isawaitable(closed):
+        await closed
+
 
-client = AsyncIOMotorClient(settings.MONGO_URI)
+client = connect(settings.MONGO_URI)
 db = client.get_database()
@@ -27,20 +27,28 @@ def async_loop():
 
 @pytest.fixture(autouse=True)
 def setup():
-    from motor.motor_asyncio import AsyncIOMotorClient
     from pymongo import MongoClient
 
     import sop_chatbot.session as session
     from sop_chatbot.config import settings
+    from sop_chatbot.services.cache import CACHES
+    from sop_chatbot.services.sequences import sequences
 
     def clear_db():
         db = settings.TEST_MONGO_URI.split('/')[-1]
         MongoClient(settings.TEST_MONGO_URI).drop_database(db)
 
-    session.db = AsyncIOMotorClient(settings.TEST_MONGO_URI).get_database()
+    def clear_caches():
+        for cache in CACHES.values():
+            cache.clear()
+        sequences.clear()
+
+    session.db = session.connect(settings.TEST_MONGO_URI).get_database()
     clear_db()
+    clear_caches()
     yield
     clear_db()
+    clear_caches()
 
 
 @pytest.fixture
@@ -119,3 +127,16 @@ def time_now():
 
 
 MockInsertOne = collections.namedtuple('MockInsertOne', ('inserted_id',))
+
+
+def mock_counters(value: int = 0):
+    MockCountersTable = collections.namedtuple(
+        'MockCountersTable', ('find_one_and_update',)
+    )
+    counters = collections.defaultdict(lambda: value)
+
+    async def find_one_and_update(find, update, *args, **kwargs):
+        counters[find['_id']] += update['$inc']['seq']
+        return {'_id': find['_id'], 'seq': counters[find['_id']]}
+
+    return MockCountersTable(find_one_and_update=find_one_and_update)
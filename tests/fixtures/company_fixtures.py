@@ -2,18 +2,11 @@ import collections
 
 import pytest
 
-from tests.conftest import MockInsertOne
+from tests.conftest import MockInsertOne, mock_counters
 
 
 def mock_company_count(value: int = 0):
-    MockCompanyTable = collections.namedtuple(
-        'MockCompanyTable', ('count_documents',)
-    )
-
-    async def count_documents(*args, **kwargs):
-        return value
-
-    return {'companies': MockCompanyTable(count_documents=count_documents)}
+    return {'counters': mock_counters(value)}
 
 
 @pytest.fixture
@@ -78,12 +71,11 @@ def stub_company_creation(stub_companies_count_0):
     from sop_chatbot import session
 
     MockCompanyTable = collections.namedtuple(
-        'MockCompanyTable', ('insert_one', 'count_documents')
+        'MockCompanyTable', ('insert_one',)
     )
     original_db = session.db
     session.db['companies'] = MockCompanyTable(
         insert_one=mock_company_creation('676ef484daff5f784260b96f'),
-        count_documents=session.db['companies'].count_documents,
     )
     yield
     session.db = original_db
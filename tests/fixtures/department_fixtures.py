@@ -2,20 +2,11 @@ import collections
 
 import pytest
 
-from tests.conftest import MockInsertOne
+from tests.conftest import MockInsertOne, mock_counters
 
 
 def mock_department_count(value: int = 0):
-    MockDepartmentTable = collections.namedtuple(
-        'MockDepartmentTable', ('count_documents',)
-    )
-
-    async def count_documents(*args, **kwargs):
-        return value
-
-    return {
-        'departments': MockDepartmentTable(count_documents=count_documents)
-    }
+    return {'counters': mock_counters(value)}
 
 
 @pytest.fixture
@@ -81,12 +72,11 @@ def stub_department_creation(stub_departments_count_0):
     from sop_chatbot import session
 
     MockDepartmentTable = collections.namedtuple(
-        'MockDepartmentTable', ('insert_one', 'count_documents')
+        'MockDepartmentTable', ('insert_one',)
     )
     original_db = session.db
     session.db['departments'] = MockDepartmentTable(
         insert_one=mock_department_creation('676ef484daff5f784260b96f'),
-        count_documents=session.db['departments'].count_documents,
     )
     yield
     session.db = original_db
@@ -4,10 +4,11 @@ from enum import Enum
 
 import pytest
 from bson import ObjectId
+from pymongo.results import UpdateResult
 
 from sop_chatbot.models import mixins
 from sop_chatbot.models.mixins import BaseClass, BaseRequest
-from tests.conftest import MockInsertOne
+from tests.conftest import MockInsertOne, mock_counters
 
 
 @pytest.fixture
@@ -69,30 +70,39 @@ def complex_mock_object(mock_object, ComplexMockClass):
     return ComplexMockClass(**mock_object.model_dump())
 
 
+def mock_update_table(calls: list, matched: int):
+    async def _stub_update_mock_object(find, update, *args, **kwargs):
+        calls.append((find, update))
+        return UpdateResult({'n': matched}, acknowledged=True)
+
+    MockUpdateTable = collections.namedtuple('MockUpdateTable', ['update_one'])
+    return {'mocks': MockUpdateTable(_stub_update_mock_object)}
+
+
 @pytest.fixture
 def stub_update_mock_object():
     from sop_chatbot import session
 
-    async def _stub_update_mock_object(*args, **kwargs):
-        return None
+    calls = []
+    original_db = session.db
+    session.db = mock_update_table(calls, matched=1)
+    yield calls
+    session.db = original_db
 
-    MockUpdateTable = collections.namedtuple('MockUpdateTable', ['update_one'])
 
+@pytest.fixture
+def stub_update_mock_conflict():
+    from sop_chatbot import session
+
+    calls = []
     original_db = session.db
-    session.db = {'mocks': MockUpdateTable(_stub_update_mock_object)}
-    yield
+    session.db = mock_update_table(calls, matched=0)
+    yield calls
     session.db = original_db
 
 
 def mock_mock_count(value: int = 0):
-    MockMockTable = collections.namedtuple(
-        'MockMockTable', ('count_documents',)
-    )
-
-    async def count_documents(*args, **kwargs):
-        return value
-
-    return {'mocks': MockMockTable(count_documents=count_documents)}
+    return {'counters': mock_counters(value)}
 
 
 @pytest.fixture
@@ -169,22 +179,120 @@ def stub_find_all_mocks(stub_find_user_user, mock_dict):
     def skip(*args, **kwargs):
         return Limit(limit=limit)
 
-    def find(*args, **kwargs):
+    Sort = collections.namedtuple('Sort', ('sort',))
+
+    def sort(*args, **kwargs):
         return Skip(skip=skip)
 
-    async def _count_documents(*args, **kwargs):
+    def find(*args, **kwargs):
+        return Sort(sort=sort)
+
+    async def count_documents(*args, **kwargs):
         return 1
 
     MockTable = collections.namedtuple(
         'MockTable', ('find', 'count_documents')
     )
-    stub = MockTable(find=find, count_documents=_count_documents)
+    stub = MockTable(find=find, count_documents=count_documents)
     original_db = session.db
     session.db = {'mocks': stub, 'users': session.db['users']}
     yield
     session.db = original_db
 
 
+@pytest.fixture
+def stub_find_mocks_recording(mock_dict):
+    from sop_chatbot import session
+
+    calls = []
+
+    class Cursor:
+        def __init__(self, find, projection):
+            calls.append({'find': find, 'projection': projection})
+
+        def sort(self, *args):
+            calls[-1]['sort'] = args
+            return self
+
+        def skip(self, skip):
+            calls[-1]['skip'] = skip
+            return self
+
+        async def limit(self, limit):
+            calls[-1]['limit'] = limit
+            for _ in range(limit):
+                yield mock_dict
+
+    async def count_documents(find):
+        calls.append({'count': find})
+        return 100
+
+    MockTable = collections.namedtuple(
+        'MockTable', ('find', 'count_documents')
+    )
+    original_db = session.db
+    session.db = {'mocks': MockTable(Cursor, count_documents)}
+    yield calls
+    session.db = original_db
+
+
+@pytest.fixture
+def stub_find_raw_mocks(mock_dict):
+    """
+    Collection applying projections like Mongo does and decoding documents
+    with the codec options it was given.
+    """
+    from sop_chatbot import session
+
+    calls = []
+
+    def project(projection, document_class):
+        document = document_class()
+        if projection.get('_id', 1):
+            document['_id'] = mock_dict['_id']
+        for key, value in projection.items():
+            if value == {'$toString': '$_id'}:
+                document[key] = str(mock_dict['_id'])
+            elif value == 1 and key in mock_dict:
+                document[key] = mock_dict[key]
+        return document
+
+    class Cursor:
+        def __init__(self, document_class, find, projection):
+            self.document_class = document_class
+            self.projection = projection
+            calls.append({'find': find, 'projection': projection})
+
+        def sort(self, *args):
+            return self
+
+        def skip(self, skip):
+            return self
+
+        async def limit(self, limit):
+            for _ in range(limit):
+                yield project(self.projection, self.document_class)
+
+    class MockTable:
+        def __init__(self, document_class=dict):
+            self.document_class = document_class
+
+        def with_options(self, codec_options):
+            return MockTable(codec_options.document_class)
+
+        def find(self, find, projection):
+            return Cursor(self.document_class, find, projection)
+
+        async def find_one(self, find, projection):
+            calls.append({'find': find, 'projection': projection})
+            return project(projection, self.document_class)
+
+    original_db = session.db
+    session.db = {'mocks': MockTable()}
+    yield calls
+    session.db = original_db
+
+
 @pytest.fixture
 def stub_delete_mock_object():
     from sop_chatbot import session
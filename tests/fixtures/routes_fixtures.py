@@ -84,6 +84,15 @@ class DepartmentFactory(factory.Factory):
     owner = '001.0001.000'
 
 
+async def insert(table: str, obj) -> None:
+    """
+    Store ``obj``, built by one of the factories, in ``table``.
+    """
+    document = obj.model_dump()
+    document['_id'] = ObjectId(document.pop('id'))
+    await session.db[table].insert_one(document)
+
+
 @pytest.fixture
 async def fill_20_users():
     users = UserFactory.create_batch(20)
@@ -120,7 +129,7 @@ async def fill_admin():
 @pytest.fixture
 async def user_access_token(fill_user):
     user = await fill_user
-    return Auth.generate_jwt(user.registration)
+    return Auth.generate_jwt(user.registration, {'ver': 0})
 
 
 @pytest.fixture
@@ -131,7 +140,7 @@ async def user_headers(user_access_token):
 @pytest.fixture
 async def admin_access_token(fill_admin):
     admin = await fill_admin
-    return Auth.generate_jwt(admin.registration)
+    return Auth.generate_jwt(admin.registration, {'ver': 0})
 
 
 @pytest.fixture
@@ -146,7 +155,8 @@ async def other_admin_headers():
     db_admin['_id'] = ObjectId(db_admin.pop('id'))
     db_admin['password'] = Auth.encrypt_password(db_admin['password'])
     await session.db.users.insert_one(db_admin)
-    return {'Authorization': f'Bearer {Auth.generate_jwt(admin.registration)}'}
+    token = Auth.generate_jwt(admin.registration, {'ver': 0})
+    return {'Authorization': f'Bearer {token}'}
 
 
 @pytest.fixture
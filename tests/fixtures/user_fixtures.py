@@ -1,9 +1,10 @@
 import collections
+from datetime import datetime
 
 import pytest
+from pymongo.results import UpdateResult
 
-from sop_chatbot.models.mixins import CLASS_MAPPING
-from tests.conftest import MockInsertOne
+from tests.conftest import MockInsertOne, mock_counters
 
 
 @pytest.fixture
@@ -85,59 +86,63 @@ def mock_user_creation(
 def stub_user_creation(user, stub_users_count_0):
     from sop_chatbot import session
 
-    MockUserTable = collections.namedtuple(
-        'MockUserTable', ('insert_one', 'aggregate')
-    )
+    MockUserTable = collections.namedtuple('MockUserTable', ('insert_one',))
     original_db = session.db
     session.db['users'] = MockUserTable(
         insert_one=mock_user_creation(user['_id']),
-        aggregate=session.db['users'].aggregate,
     )
     yield
     session.db = original_db
 
 
-@pytest.fixture
-def stub_admin_creation(admin, stub_admin_count_0, monkeypatch):
-    from sop_chatbot import session
-
-    MockUserTable = collections.namedtuple(
-        'MockUserTable', ('insert_one', 'count_documents')
-    )
-    original_db = session.db
-    session.db['users'] = MockUserTable(
-        insert_one=mock_user_creation(admin['_id']),
-        count_documents=session.db['users'].count_documents,
+def mock_signup(failing: str | None = None):
+    """
+    Collections of a signup, recording their documents. Inserts into the
+    ``failing`` collection raise.
+    """
+    MockSignupTable = collections.namedtuple(
+        'MockSignupTable', ('insert_one', 'delete_one')
     )
+    documents = {}
 
-    Company = collections.namedtuple('Company', ('registration', 'owner'))
-    company_registration = '.'.join(
-        (CLASS_MAPPING['Company'], admin['registration'].split('.')[1], '001')
-    )
+    def table(name: str):
+        async def insert_one(document, *args, **kwargs):
+            if name == failing:
+                raise RuntimeError(f'{name} insert failed')
+            documents.setdefault(name, []).append(document)
+            return MockInsertOne(document['_id'])
 
-    async def _company(*args, **kwargs):
-        return Company(company_registration, admin['registration'])
+        async def delete_one(find, *args, **kwargs):
+            documents[name] = [
+                document
+                for document in documents[name]
+                if document['_id'] != find['_id']
+            ]
 
-    monkeypatch.setattr(
-        'sop_chatbot.models.companies.Company.create', _company
-    )
+        return MockSignupTable(insert_one, delete_one)
 
-    Department = collections.namedtuple('Department', ('registration'))
-    department_registration = '.'.join(
-        (
-            CLASS_MAPPING['Department'],
-            admin['registration'].split('.')[1],
-            '001',
-        )
-    )
+    db = {name: table(name) for name in ('users', 'companies', 'departments')}
+    db.update(mock_admin_count(0))
+    return db, documents
 
-    async def _department(*args, **kwargs):
-        return Department(department_registration)
 
-    monkeypatch.setattr(
-        'sop_chatbot.models.departments.Department.create', _department
-    )
-    yield
+@pytest.fixture
+def stub_admin_creation(admin):
+    from sop_chatbot import session
+
+    original_db = session.db
+    session.db, documents = mock_signup()
+    yield documents
+    session.db = original_db
+
+
+@pytest.fixture
+def stub_failing_admin_creation():
+    from sop_chatbot import session
+
+    original_db = session.db
+    session.db, documents = mock_signup(failing='departments')
+    yield documents
     session.db = original_db
 
 
@@ -182,14 +187,7 @@ def stub_find_user_admin(admin):
 
 
 def mock_admin_count(value: int = 0):
-    MockUserTable = collections.namedtuple(
-        'MockUserTable', ('count_documents',)
-    )
-
-    async def count_documents(*args, **kwargs):
-        return value
-
-    return {'users': MockUserTable(count_documents=count_documents)}
+    return {'counters': mock_counters(value)}
 
 
 @pytest.fixture
@@ -213,18 +211,7 @@ def stub_admin_count_10000():
 
 
 def mock_users_count(value: int = 0):
-    MockUserTable = collections.namedtuple('MockUserTable', ('aggregate',))
-    MockAggregate = collections.namedtuple('MockAggregate', ('to_list',))
-
-    async def to_list(*args, **kwargs):
-        unique = str(value + 1).zfill(3)
-        return [{'registration': unique}]
-
-    return {
-        'users': MockUserTable(
-            aggregate=lambda *args, **kwargs: MockAggregate(to_list=to_list)
-        )
-    }
+    return {'counters': mock_counters(value)}
 
 
 @pytest.fixture
@@ -261,10 +248,15 @@ def stub_find_all_users(user):
     def skip(*args, **kwargs):
         return Limit(limit=limit)
 
-    def find(*args, **kwargs):
+    Sort = collections.namedtuple('Sort', ('sort',))
+
+    def sort(*args, **kwargs):
         return Skip(skip=skip)
 
-    async def _count_documents(*args, **kwargs):
+    def find(*args, **kwargs):
+        return Sort(sort=sort)
+
+    async def count_documents(*args, **kwargs):
         return 1
 
     MockUserTable = collections.namedtuple(
@@ -272,10 +264,176 @@ def stub_find_all_users(user):
     )
     stub = MockUserTable(
         find=find,
-        count_documents=_count_documents,
+        count_documents=count_documents,
         find_one=session.db['users'].find_one,
     )
     original_db = session.db
     session.db = {'users': stub}
     yield
     session.db = original_db
+
+
+def mock_counting_users(*users: dict):
+    MockUserTable = collections.namedtuple(
+        'MockUserTable',
+        (
+            'find_one',
+            'update_one',
+            'find_one_and_update',
+            'update_many',
+            'delete_one',
+            'calls',
+        ),
+    )
+    calls = collections.Counter()
+
+    def stored(value):
+        # Mongo keeps datetimes with millisecond precision.
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return value
+        if isinstance(value, datetime):
+            return value.replace(microsecond=value.microsecond // 1000 * 1000)
+        return value
+
+    def matches(user: dict, key: str, value) -> bool:
+        if isinstance(value, dict) and '$in' in value:
+            return str(user.get(key)) in map(str, value['$in'])
+        return str(stored(user.get(key))) == str(stored(value))
+
+    def match_all(find: dict) -> list[dict]:
+        return [
+            user
+            for user in users
+            if all(matches(user, key, value) for key, value in find.items())
+        ]
+
+    def match(find: dict):
+        for user in match_all(find):
+            return user
+
+    def apply(user: dict, update: dict):
+        user.update(update.get('$set', {}))
+        for key, value in update.get('$inc', {}).items():
+            user[key] = user.get(key, 0) + value
+        for key, value in update.get('$addToSet', {}).items():
+            values = value['$each'] if isinstance(value, dict) else [value]
+            user[key] = list(user.get(key, []))
+            user[key] += [item for item in values if item not in user[key]]
+        for key, value in update.get('$pull', {}).items():
+            values = value['$in'] if isinstance(value, dict) else [value]
+            user[key] = [
+                item for item in user.get(key, []) if item not in values
+            ]
+
+    async def find_one(find, *args, **kwargs):
+        calls['find_one'] += 1
+        user = match(find)
+        if user is not None:
+            return dict(user)
+
+    async def update_one(find, update, *args, **kwargs):
+        calls['update_one'] += 1
+        user = match(find)
+        if user is None:
+            return UpdateResult({'n': 0}, acknowledged=True)
+        apply(user, update)
+        return UpdateResult({'n': 1}, acknowledged=True)
+
+    async def find_one_and_update(find, update, projection, *args, **kwargs):
+        calls['find_one_and_update'] += 1
+        user = match(find)
+        if user is not None:
+            apply(user, update)
+            return {key: user[key] for key in projection if key in user}
+
+    async def update_many(find, update, *args, **kwargs):
+        calls['update_many'] += 1
+        updated = match_all(find)
+        for user in updated:
+            apply(user, update)
+        return UpdateResult(
+            {'n': len(updated), 'nModified': len(updated)}, acknowledged=True
+        )
+
+    async def delete_one(*args, **kwargs):
+        calls['delete_one'] += 1
+
+    return {
+        'users': MockUserTable(
+            find_one=find_one,
+            update_one=update_one,
+            find_one_and_update=find_one_and_update,
+            update_many=update_many,
+            delete_one=delete_one,
+            calls=calls,
+        )
+    }
+
+
+@pytest.fixture
+def stub_counting_users(user):
+    from sop_chatbot import session
+
+    original_db = session.db
+    session.db = mock_counting_users(user)
+    yield session.db['users'].calls
+    session.db = original_db
+
+
+@pytest.fixture
+def stub_counting_users_and_admin(user, admin):
+    from sop_chatbot import session
+
+    original_db = session.db
+    session.db = mock_counting_users(user, admin)
+    yield session.db['users'].calls
+    session.db = original_db
+
+
+@pytest.fixture
+def stub_import_users(monkeypatch):
+    """
+    Users collection failing the inserts of users named ``Duplicate``, like
+    a unique index would, and the whole batches with users named
+    ``Unreachable``, like a lost connection would.
+    """
+    from pymongo.errors import AutoReconnect, BulkWriteError
+    from pymongo.results import BulkWriteResult
+
+    from sop_chatbot import session
+    from sop_chatbot.config import settings
+
+    monkeypatch.setattr(settings, 'IMPORT_BATCH_SIZE', 2)
+    batches = []
+
+    async def bulk_write(requests, ordered=True):
+        assert not ordered
+        documents = [request._doc for request in requests]
+        batches.append(documents)
+        if any(document['name'] == 'Unreachable' for document in documents):
+            raise AutoReconnect('connection closed')
+        errors = [
+            {'index': index, 'errmsg': 'E11000 duplicate key error'}
+            for index, document in enumerate(documents)
+            if document['name'] == 'Duplicate'
+        ]
+        inserted = len(documents) - len(errors)
+        if errors:
+            raise BulkWriteError(
+                {'nInserted': inserted, 'writeErrors': errors}
+            )
+        return BulkWriteResult({'nInserted': inserted}, acknowledged=True)
+
+    MockImportTable = collections.namedtuple(
+        'MockImportTable', ('bulk_write',)
+    )
+    original_db = session.db
+    session.db = {
+        'users': MockImportTable(bulk_write=bulk_write),
+        'counters': mock_counters(0),
+    }
+    yield batches
+    session.db = original_db
@@ -0,0 +1,38 @@
+import re
+
+import pytest
+
+from sop_chatbot import session
+from sop_chatbot.migrations import migration_00_01_00_search
+from sop_chatbot.models.mixins import PaginationRequest
+
+
+@pytest.mark.asyncio
+async def test_backfill_folds_non_ascii_names():
+    await session.db.departments.insert_many(
+        [{'name': 'ÁREA'}, {'name': 'Édson'}, {'name': None}]
+    )
+
+    await migration_00_01_00_search.run()
+
+    documents = await session.db.departments.find(
+        {}, {'_id': 0, 'name': 1, 'name_lower': 1}
+    ).to_list(None)
+    assert documents == [
+        {'name': 'ÁREA', 'name_lower': 'área'},
+        {'name': 'Édson', 'name_lower': 'édson'},
+        {'name': None},
+    ]
+    request = PaginationRequest(query='name', value='éd', search='prefix')
+    assert (
+        await session.db.departments.count_documents(request.search_filter())
+        == 1
+    )
+
+
+def test_prefix_search_matches_backfilled_names():
+    request = PaginationRequest(query='name', value='ÉD', search='prefix')
+
+    pattern = request.search_filter()['name_lower']['$regex']
+
+    assert re.match(pattern, 'édson')
@@ -18,6 +18,15 @@ async def test_company_gen_registration_10000(stub_companies_count_10000):
     assert await Company.gen_registration('001.10001.000') == '002.10001.10001'
 
 
+@pytest.mark.asyncio(loop_scope='session')
+async def test_company_gen_registrations(stub_companies_count_0):
+    assert await Company.gen_registrations('001.0001.000', 3) == [
+        '002.0001.001',
+        '002.0001.002',
+        '002.0001.003',
+    ]
+
+
 @pytest.mark.asyncio(loop_scope='session')
 async def test_create_company(company_request, stub_company_creation):
     result = Company(
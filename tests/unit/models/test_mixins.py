@@ -1,14 +1,33 @@
 from datetime import datetime
 
+import orjson
 import pytest
 import time_machine
+from bson import ObjectId
+from pydantic import ValidationError
 
 from sop_chatbot.models.mixins import (
     ActionResponse,
+    ConflictError,
     PaginatedResponse,
     Pagination,
     PaginationRequest,
+    RawDocument,
+    RawPaginatedResponse,
+    decode_cursor,
+    encode_cursor,
+    projection,
+    raw_projection,
+    sparse_model,
 )
+from sop_chatbot.models.users import User, UserResponse, user_cache
+
+MOCK_PROJECTION = {
+    'registration': 1,
+    'created_at': 1,
+    'updated_at': 1,
+    'owner': 1,
+}
 
 
 def test_mock_table_name(MockClass):
@@ -96,6 +115,49 @@ async def test_update_mock_object(mock_object, stub_update_mock_object):
     assert updated.model_dump() == result
 
 
+@pytest.mark.asyncio
+async def test_update_mock_object_sets_changed_fields(
+    mock_object, stub_update_mock_object
+):
+    with time_machine.travel(datetime(2024, 12, 27, 18, 45, 10), tick=False):
+        await mock_object.update(
+            {'owner': '002.0000.000', 'registration': '000.0000.000'}
+        )
+
+    assert stub_update_mock_object == [
+        (
+            {
+                '_id': ObjectId('676ff4ea01892d16d07c41b4'),
+                'updated_at': datetime(2024, 12, 27, 18, 43, 19, 339000),
+            },
+            {
+                '$set': {
+                    'owner': '002.0000.000',
+                    'updated_at': datetime(2024, 12, 27, 18, 45, 10),
+                }
+            },
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_update_mock_object_without_changes(
+    mock_object, stub_update_mock_object
+):
+    updated = await mock_object.update({'owner': mock_object.owner})
+
+    assert updated.updated_at == datetime(2024, 12, 27, 18, 43, 19, 339384)
+    assert stub_update_mock_object == []
+
+
+@pytest.mark.asyncio
+async def test_update_mock_object_conflict(
+    mock_object, stub_update_mock_conflict
+):
+    with pytest.raises(ConflictError):
+        await mock_object.update({'owner': '002.0000.000'})
+
+
 @pytest.mark.asyncio
 async def test_create_mock_object(
     mock_object, MockRequest, stub_create_mock_object
@@ -191,6 +253,309 @@ async def test_get_all_mocks_when_user_registration_exists_using_queries(
     )
 
 
+def test_cursor_round_trip():
+    cursor = encode_cursor('676ff4ea01892d16d07c41b4')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ObjectId('676ff4ea01892d16d07c41b4')
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'Z2FyYmFnZQ'])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pagination_request_rejects_invalid_cursor():
+    with pytest.raises(ValidationError):
+        PaginationRequest(after='garbage')
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_with_cursor(MockClass, stub_find_mocks_recording):
+    cursor = encode_cursor('676ff4ea01892d16d07c41b4')
+
+    response = await MockClass.get_all(
+        PaginationRequest(skip=3, limit=2, after=cursor, include_total=False),
+        '001.0000.000',
+    )
+
+    assert stub_find_mocks_recording == [
+        {
+            'find': {
+                'owner': '001.0000.000',
+                '_id': {'$gt': ObjectId('676ff4ea01892d16d07c41b4')},
+            },
+            'projection': MOCK_PROJECTION,
+            'sort': ([('_id', 1)],),
+            'skip': 0,
+            'limit': 3,
+        }
+    ]
+    assert response.pagination.total is None
+    assert response.pagination.has_more is True
+    assert response.pagination.next_cursor == cursor
+    assert len(response.results) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_counts_alongside_the_page(
+    MockClass, stub_find_mocks_recording
+):
+    cursor = encode_cursor('676ff4ea01892d16d07c41b4')
+
+    response = await MockClass.get_all(
+        PaginationRequest(limit=2, after=cursor), '001.0000.000'
+    )
+
+    assert stub_find_mocks_recording == [
+        {
+            'find': {
+                'owner': '001.0000.000',
+                '_id': {'$gt': ObjectId('676ff4ea01892d16d07c41b4')},
+            },
+            'projection': MOCK_PROJECTION,
+            'sort': ([('_id', 1)],),
+            'skip': 0,
+            'limit': 3,
+        },
+        {'count': {'owner': '001.0000.000'}},
+    ]
+    assert response.pagination.total == 100
+    assert response.pagination.has_more is True
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_text_search_has_no_cursor(
+    MockClass, stub_find_mocks_recording
+):
+    response = await MockClass.get_all(
+        PaginationRequest(
+            limit=2,
+            query='name',
+            value='a',
+            search='text',
+            include_total=False,
+        ),
+        '001.0000.000',
+    )
+
+    assert response.pagination.has_more is True
+    assert response.pagination.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_counts_exact_total_every_time(
+    MockClass, stub_find_mocks_recording
+):
+    request = PaginationRequest(limit=2)
+    await MockClass.get_all(request, '001.0000.000')
+    await MockClass.get_all(request, '001.0000.000')
+
+    counts = [call for call in stub_find_mocks_recording if 'count' in call]
+    assert len(counts) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_serves_cached_total(
+    MockClass, stub_find_mocks_recording
+):
+    request = PaginationRequest(skip=3, limit=2, cached_total=True)
+    await MockClass.get_all(request, '001.0000.000')
+    response = await MockClass.get_all(request, '001.0000.000')
+
+    _, count, second = stub_find_mocks_recording
+    assert count == {'count': {'owner': '001.0000.000'}}
+    assert second['skip'] == 6
+    assert second['sort'] == ([('_id', 1)],)
+    assert response.pagination.page == 4
+    assert response.pagination.total == 100
+    assert response.pagination.next_cursor == encode_cursor(
+        '676ff4ea01892d16d07c41b4'
+    )
+
+
+@pytest.mark.parametrize(
+    ('search', 'result'),
+    [
+        ('regex', {'name': {'$regex': r'A\.b', '$options': 'i'}}),
+        ('prefix', {'name_lower': {'$regex': r'^a\.b'}}),
+        ('text', {'$text': {'$search': 'A.b'}}),
+    ],
+)
+def test_search_filter(search, result):
+    request = PaginationRequest(query='name', value='A.b', search=search)
+    assert request.search_filter() == result
+
+
+def test_text_search_sorts_by_relevance():
+    request = PaginationRequest(query='name', value='ab', search='text')
+    assert request.sort() == [
+        ('score', {'$meta': 'textScore'}),
+        ('_id', 1),
+    ]
+
+
+@pytest.mark.parametrize(
+    'params',
+    [
+        {'query': 'name', 'value': 'a' * 65},
+        {'query': 'email', 'value': 'a', 'search': 'prefix'},
+        {'query': 'email', 'value': 'a', 'search': 'text'},
+        {
+            'query': 'name',
+            'value': 'a',
+            'search': 'text',
+            'after': encode_cursor('676ff4ea01892d16d07c41b4'),
+        },
+    ],
+)
+def test_pagination_request_rejects_invalid_search(params):
+    with pytest.raises(ValidationError):
+        PaginationRequest(**params)
+
+
+def test_mongo_keeps_lowercase_shadow_field(MockClass, mock_dict):
+    class Named(MockClass):
+        name: str
+
+    named = Named(id=str(mock_dict['_id']), name='Planetae', **mock_dict)
+    assert named.mongo()['name_lower'] == 'planetae'
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_reuses_cached_user(
+    MockClass, stub_find_all_mocks
+):
+    for _ in range(2):
+        response = await MockClass.get_all(
+            PaginationRequest(), '001.0000.000', '001.0001.001'
+        )
+
+    assert user_cache.stats()['misses'] == 1
+    assert user_cache.stats()['hits'] == 1
+    assert response.pagination.total == 1
+
+
+def test_projection_reads_response_fields_only():
+    assert projection(UserResponse) == {
+        'registration': 1,
+        'owner': 1,
+        'name': 1,
+        'departments': 1,
+        'company': 1,
+        'role': 1,
+    }
+
+
+def test_sparse_model_is_cached():
+    model = sparse_model(UserResponse, frozenset({'name', 'role'}))
+    assert set(model.model_fields) == {'name', 'role'}
+    assert model is sparse_model(UserResponse, frozenset({'role', 'name'}))
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_sparse_fields(
+    MockClass, stub_find_mocks_recording
+):
+    response = await MockClass.get_all(
+        PaginationRequest(limit=1, include_total=False),
+        '001.0000.000',
+        fields=['registration'],
+    )
+
+    assert stub_find_mocks_recording[0]['projection'] == {'registration': 1}
+    assert response.json() == {
+        'pagination': {
+            'page': 1,
+            'limit': 1,
+            'total': None,
+            'has_more': True,
+            'next_cursor': encode_cursor('676ff4ea01892d16d07c41b4'),
+        },
+        'results': [{'registration': '000.0000.000'}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_sparse_id_only(
+    MockClass, stub_find_mocks_recording
+):
+    response = await MockClass.get_all(
+        PaginationRequest(limit=1, include_total=False),
+        '001.0000.000',
+        fields=['id'],
+    )
+
+    assert stub_find_mocks_recording[0]['projection'] == {'_id': 1}
+    assert response.json()['results'] == [{'id': '676ff4ea01892d16d07c41b4'}]
+
+
+def test_raw_projection_shapes_json():
+    assert raw_projection(UserResponse) == {
+        'registration': 1,
+        'owner': 1,
+        'name': 1,
+        'departments': 1,
+        'company': 1,
+        'role': 1,
+    }
+    assert raw_projection(User)['id'] == {'$toString': '$_id'}
+    assert 'password' not in raw_projection(User)
+    assert 'token_version' not in raw_projection(User)
+
+
+def test_raw_document_attributes():
+    document = RawDocument(registration='000.0000.000')
+    assert document.registration == '000.0000.000'
+    assert getattr(document, 'owner', None) is None
+
+
+@pytest.mark.asyncio
+async def test_get_mock_raw(MockClass, mock_object, stub_find_raw_mocks):
+    document = await MockClass.get('000.0000.000', raw=True)
+
+    assert isinstance(document, RawDocument)
+    assert '_id' not in document
+    assert document.registration == '000.0000.000'
+    assert orjson.loads(document.dump_json()) == mock_object.json()
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_raw(MockClass, mock_object, stub_find_raw_mocks):
+    response = await MockClass.get_all(
+        PaginationRequest(limit=2, include_total=False),
+        '001.0000.000',
+        raw=True,
+    )
+
+    assert stub_find_raw_mocks[0]['projection'] == {
+        **MOCK_PROJECTION,
+        'id': {'$toString': '$_id'},
+    }
+    assert isinstance(response, RawPaginatedResponse)
+    assert orjson.loads(response.dump_json()) == {
+        'pagination': {
+            'page': 1,
+            'limit': 2,
+            'total': None,
+            'has_more': True,
+            'next_cursor': encode_cursor('676ff4ea01892d16d07c41b4'),
+        },
+        'results': [mock_object.json()] * 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_all_mocks_last_page(MockClass, stub_find_all_mocks):
+    response = await MockClass.get_all(
+        PaginationRequest(limit=1), '001.0000.000'
+    )
+
+    assert response.pagination.total == 1
+    assert response.pagination.has_more is False
+    assert response.pagination.next_cursor is None
+
+
 @pytest.mark.asyncio
 async def test_delete_mock_object(mock_object, stub_delete_mock_object):
     result = ActionResponse(
@@ -202,12 +567,32 @@ async def test_delete_mock_object(mock_object, stub_delete_mock_object):
     assert await mock_object.delete() == result
 
 
+def test_mock_object_dump_json_matches_json(mock_object, complex_mock_object):
+    assert orjson.loads(mock_object.dump_json()) == mock_object.json()
+    assert (
+        orjson.loads(complex_mock_object.dump_json())
+        == complex_mock_object.json()
+    )
+
+
+def test_paginated_response_dump_json_matches_json(
+    mock_object, complex_mock_object
+):
+    page = PaginatedResponse(
+        pagination=Pagination(total=2),
+        results=[mock_object.model_copy(), complex_mock_object],
+    )
+    assert orjson.loads(page.dump_json()) == page.json()
+
+
 def test_paginated_response_to_json():
     result = {
         'pagination': {
             'page': 1,
             'limit': 10,
             'total': 100,
+            'has_more': False,
+            'next_cursor': None,
         },
         'results': [],
     }
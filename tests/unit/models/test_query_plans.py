@@ -0,0 +1,203 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from sop_chatbot import session
+from sop_chatbot.migrations import migration_00_01_00_indexes
+from sop_chatbot.migrations.indexes import create_indexes
+from sop_chatbot.models.companies import Company
+from sop_chatbot.models.departments import Department
+from sop_chatbot.models.mixins import (
+    PaginationRequest,
+    SearchMode,
+    decode_cursor,
+    encode_cursor,
+)
+from sop_chatbot.models.users import User
+from sop_chatbot.services.jobs import JobStatus, jobs
+
+OWNER = '001.0001.000'
+COMPANY = '002.0001.001'
+DEPARTMENTS = ['003.0001.001', '003.0001.002']
+
+
+def searches() -> list[PaginationRequest]:
+    return [
+        PaginationRequest(),
+        PaginationRequest(after=encode_cursor(str(ObjectId()))),
+        PaginationRequest(query='name', value='a'),
+        PaginationRequest(query='name', value='a', search=SearchMode.PREFIX),
+        PaginationRequest(query='name', value='a', search=SearchMode.TEXT),
+    ]
+
+
+def base_shapes(cls) -> list[tuple[str, dict, list | None]]:
+    """
+    The filters and sorts ``BaseClass`` sends for ``cls``.
+    """
+    table = cls.table_name()
+    shapes = [
+        # get, get_cached_document and delete
+        (table, {'registration': COMPANY}, None),
+        (table, {'registration': COMPANY, 'owner': OWNER}, None),
+        # owns_all
+        (table, {'registration': {'$in': DEPARTMENTS}, 'owner': OWNER}, None),
+        # update
+        (table, {'_id': ObjectId(), 'updated_at': datetime.now()}, None),
+    ]
+    for restrict in ({}, {'company': COMPANY}):
+        for request in searches():
+            find = {'owner': OWNER, **restrict, **request.search_filter()}
+            if request.after is not None:
+                find['_id'] = {'$gt': decode_cursor(request.after)}
+            shapes.append((table, find, request.sort()))
+    return shapes
+
+
+def user_shapes() -> list[tuple[str, dict, list | None]]:
+    table = User.table_name()
+    return [
+        # Admin logins
+        (table, {'email': 'admin@example.com'}, None),
+        # get_all of users, restricted to their departments
+        (
+            table,
+            {
+                'owner': OWNER,
+                'company': COMPANY,
+                'registration': {'$in': DEPARTMENTS},
+            },
+            [('_id', 1)],
+        ),
+        # Department deletions
+        (table, {'owner': OWNER, 'departments': {'$in': DEPARTMENTS}}, None),
+    ]
+
+
+def job_shapes() -> list[tuple[str, dict, list | None]]:
+    table = jobs.table_name()
+    now = datetime.now()
+    return [
+        (table, {'_id': ObjectId(), 'owner': OWNER}, None),
+        (table, {'owner': OWNER}, [('_id', -1)]),
+        (
+            table,
+            {
+                'kind': {'$in': ['delete_company', 'delete_department']},
+                '$or': [
+                    {
+                        'status': JobStatus.QUEUED.value,
+                        'run_at': {'$lte': now},
+                    },
+                    {
+                        'status': JobStatus.RUNNING.value,
+                        'locked_until': {'$lt': now},
+                    },
+                ],
+            },
+            [('run_at', 1)],
+        ),
+    ]
+
+
+SHAPES = [
+    *(
+        shape
+        for cls in (Company, Department, User)
+        for shape in base_shapes(cls)
+    ),
+    *user_shapes(),
+    *job_shapes(),
+]
+
+
+def stages(plan) -> list[str]:
+    """
+    Every stage of ``plan``, without the ones of its rejected plans.
+    """
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    found = [plan['stage']] if isinstance(plan.get('stage'), str) else []
+    for key, value in plan.items():
+        if key != 'rejectedPlans':
+            found += stages(value)
+    return found
+
+
+async def explain(table: str, find: dict, sort: list | None) -> dict:
+    command = {'find': table, 'filter': find}
+    if sort is not None:
+        command['sort'] = dict(sort)
+    return await session.db.command(
+        {'explain': command, 'verbosity': 'queryPlanner'}
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ('table', 'find', 'sort'),
+    SHAPES,
+    ids=[f'{table}:{",".join(find)}' for table, find, _ in SHAPES],
+)
+async def test_query_uses_an_index(table, find, sort):
+    await create_indexes()
+    await session.db[table].insert_one({'owner': OWNER, 'name': 'a'})
+
+    plan = await explain(table, find, sort)
+
+    assert 'COLLSCAN' not in stages(plan['queryPlanner']), plan
+
+
+@pytest.mark.asyncio
+async def test_total_uses_an_index():
+    await create_indexes()
+    # The pipeline count_documents sends.
+    pipeline = [
+        {'$match': {'owner': OWNER, 'company': COMPANY}},
+        {'$group': {'_id': 1, 'n': {'$sum': 1}}},
+    ]
+
+    plan = await session.db.command(
+        {
+            'explain': {
+                'aggregate': User.table_name(),
+                'pipeline': pipeline,
+                'cursor': {},
+            },
+            'verbosity': 'queryPlanner',
+        }
+    )
+
+    assert 'COLLSCAN' not in stages(plan), plan
+
+
+@pytest.mark.asyncio
+async def test_migration_drops_legacy_indexes_only():
+    await session.db.users.create_index([('registration', 1)])
+    await session.db.users.create_index([('name', 1)])
+
+    await migration_00_01_00_indexes.run()
+    # Other workers run it too.
+    await migration_00_01_00_indexes.run()
+    await create_indexes()
+
+    names = set(await session.db.users.index_information())
+    assert 'registration_1' not in names
+    assert 'name_1' in names
+    assert 'registration_1_owner_1' in names
+
+
+@pytest.mark.asyncio
+async def test_migration_fails_on_duplicate_registrations():
+    await session.db.users.insert_many(
+        [
+            {'registration': COMPANY, 'owner': OWNER},
+            {'registration': COMPANY, 'owner': OWNER},
+        ]
+    )
+
+    with pytest.raises(RuntimeError, match='duplicate registrations'):
+        await migration_00_01_00_indexes.run()
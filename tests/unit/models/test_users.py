@@ -1,15 +1,26 @@
 from datetime import datetime
 
+import orjson
 import pytest
 import time_machine
 
+from sop_chatbot.models.mixins import (
+    ConflictError,
+    PaginatedResponse,
+    Pagination,
+    hydrate,
+)
 from sop_chatbot.models.users import (
     Admin,
     CreateAdminRequest,
     CreateCommonUserRequest,
     User,
+    UserResponse,
+    UserRoles,
+    user_cache,
 )
 from sop_chatbot.services.auth import Auth
+from sop_chatbot.services.imports import Row
 
 
 def test_admin_table_name():
@@ -76,6 +87,232 @@ async def test_get_user_user(stub_find_user_user, user):
     assert await User.get('001.0001.000') == result
 
 
+@pytest.mark.asyncio(loop_scope='session')
+async def test_get_cached_user_reads_database_once(stub_counting_users):
+    first = await User.get_cached('001.0001.001')
+    second = await User.get_cached('001.0001.001')
+
+    assert first == second
+    assert first is not second
+    assert stub_counting_users['find_one'] == 1
+    assert user_cache.stats()['hits'] == 1
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_get_cached_user_does_not_share_lists(stub_counting_users):
+    first = await User.get_cached('001.0001.001')
+    first.departments.append('003.0001.002')
+
+    second = await User.get_cached('001.0001.001')
+    assert second.departments == ['003.0001.001']
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_get_cached_user_none(stub_find_user_none):
+    assert await User.get_cached('001.0001.001') is None
+    assert user_cache.stats()['size'] == 0
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_get_cached_user_expires(stub_counting_users, time_now):
+    with time_machine.travel(time_now, tick=False) as traveller:
+        await User.get_cached('001.0001.001')
+        traveller.shift(user_cache.ttl + 1)
+        await User.get_cached('001.0001.001')
+
+    assert stub_counting_users['find_one'] == 2
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_update_user_invalidates_cache(stub_counting_users):
+    user = await User.get_cached('001.0001.001')
+    await user.update({'name': 'New name'})
+    await User.get_cached('001.0001.001')
+
+    assert stub_counting_users['find_one'] == 2
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_update_user_keeps_password(stub_counting_users, user):
+    user_object = await User.get_cached('001.0001.001')
+    await user_object.update({'name': 'New name', 'role': user_object.role})
+
+    assert user['name'] == 'New name'
+    assert user['name_lower'] == 'new name'
+    assert 'password' in user
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_concurrent_user_updates_conflict(stub_counting_users):
+    first = await User.get_cached('001.0001.001')
+    second = first.model_copy()
+    await first.update({'name': 'First'})
+
+    with pytest.raises(ConflictError):
+        await second.update({'name': 'Second'})
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_add_departments(stub_counting_users, user):
+    user_object = await User.get_cached('001.0001.001')
+    await user_object.add_departments('003.0001.002', '003.0001.001')
+
+    assert user['departments'] == ['003.0001.001', '003.0001.002']
+    assert user_object.departments == ['003.0001.001', '003.0001.002']
+    assert stub_counting_users['find_one_and_update'] == 1
+    assert user_cache.stats()['size'] == 0
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_remove_departments(stub_counting_users, user):
+    user_object = await User.get_cached('001.0001.001')
+    await user_object.remove_departments('003.0001.001')
+
+    assert user['departments'] == []
+    assert user_object.departments == []
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_department_membership_of_many_users(
+    stub_counting_users_and_admin, user, admin
+):
+    added = await User.add_department_to_users(
+        '003.0001.002', ['001.0001.001', '001.0001.000'], '001.0001.000'
+    )
+
+    assert added == 2
+    assert user['departments'] == ['003.0001.001', '003.0001.002']
+    assert admin['departments'] == ['003.0001.001', '003.0001.002']
+
+    removed = await User.remove_department_from_users(
+        '003.0001.002', ['001.0001.001'], '001.0001.000'
+    )
+
+    assert removed == 1
+    assert user['departments'] == ['003.0001.001']
+    assert stub_counting_users_and_admin['update_many'] == 2
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_department_membership_of_other_owners_users(
+    stub_counting_users, user
+):
+    added = await User.add_department_to_users(
+        '003.0002.001', ['001.0001.001'], '001.0002.000'
+    )
+
+    assert added == 0
+    assert user['departments'] == ['003.0001.001']
+
+
+async def import_stream(*rows: Row):
+    for row in rows:
+        yield row
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_import_users(stub_import_users):
+    user = {'password': 'password', 'company': '002.0001.001'}
+    rows = import_stream(
+        Row(1, {**user, 'name': 'Ana', 'departments': '003.0001.001;'}),
+        Row(2, error='Invalid JSON'),
+        Row(3, {**user, 'name': 'Duplicate'}),
+        Row(4, {'name': 'No password'}),
+        Row(5, {**user, 'name': 'Jo'}),
+    )
+
+    response = await User.import_rows(rows, '001.0001.000')
+
+    assert response.created == 2
+    assert response.failed == 3
+    assert [(error.line, error.error) for error in response.errors] == [
+        (2, 'Invalid JSON'),
+        (4, 'password: Field required'),
+        (3, 'E11000 duplicate key error'),
+    ]
+    first, second = stub_import_users
+    assert [user['registration'] for user in first + second] == [
+        '001.0001.001',
+        '001.0001.002',
+        '001.0001.003',
+    ]
+    assert first[0]['departments'] == ['003.0001.001']
+    assert first[0]['password'] == Auth.encrypt_password('password')
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_import_users_reports_failed_batches(stub_import_users):
+    user = {'password': 'password', 'company': '002.0001.001'}
+    rows = import_stream(
+        Row(1, {**user, 'name': 'Ana'}),
+        Row(2, {**user, 'name': 'Unreachable'}),
+        Row(3, {**user, 'name': 'Jo'}),
+    )
+
+    response = await User.import_rows(rows, '001.0001.000')
+
+    assert response.created == 1
+    assert response.failed == 2
+    assert [(error.line, error.error) for error in response.errors] == [
+        (1, 'Could not be written: connection closed'),
+        (2, 'Could not be written: connection closed'),
+    ]
+    assert len(stub_import_users) == 2
+
+
+async def failing_stream(*rows: Row):
+    for row in rows:
+        yield row
+    raise OSError('connection reset')
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_import_users_finishes_batch_when_stream_fails(
+    stub_import_users,
+):
+    user = {'password': 'password', 'company': '002.0001.001'}
+    rows = failing_stream(
+        Row(1, {**user, 'name': 'Ana'}),
+        Row(2, {**user, 'name': 'Jo'}),
+    )
+
+    with pytest.raises(OSError):
+        await User.import_rows(rows, '001.0001.000')
+
+    [batch] = stub_import_users
+    assert [user['name'] for user in batch] == ['Ana', 'Jo']
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_delete_user_invalidates_cache(stub_counting_users):
+    user = await User.get_cached('001.0001.001')
+    await user.delete()
+
+    assert user_cache.stats()['size'] == 0
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_update_password_revokes_tokens(stub_counting_users):
+    user = await User.get_cached('001.0001.001')
+    await User.get_token_version('001.0001.001')
+
+    await user.update_password('new password')
+
+    assert user.token_version == 1
+    assert user.verify_password('new password')
+    assert stub_counting_users['update_one'] == 1
+    assert user_cache.stats()['size'] == 0
+
+
+def test_user_claims(user_object):
+    assert user_object.claims() == {
+        'role': 'user',
+        'company': '002.0001.001',
+        'owner': '001.0001.000',
+        'ver': 0,
+    }
+
+
 def test_admin_json(admin_object):
     result = {
         'id': '676ef484daff5f784260b96e',
@@ -114,9 +351,32 @@ def test_user_json(user_object):
     assert user_object.json() == result
 
 
+def test_user_dump_json(user_object):
+    assert orjson.loads(user_object.dump_json()) == user_object.json()
+
+
+def test_user_dump_json_with_response_model(user_object):
+    assert orjson.loads(user_object.dump_json(UserResponse)) == {
+        'registration': '001.0001.001',
+        'owner': '001.0001.000',
+        'name': 'Edmilson Monteiro Rodrigues Neto',
+        'departments': ['003.0001.001'],
+        'company': '002.0001.001',
+        'role': 'user',
+    }
+
+
+def test_users_page_dump_json_excludes_password(user_object):
+    page = PaginatedResponse[User](
+        pagination=Pagination(total=1), results=[user_object]
+    )
+    assert 'password' not in orjson.loads(page.dump_json())['results'][0]
+
+
 def test_user_mongo(user_object):
     result = {
         'name': 'Edmilson Monteiro Rodrigues Neto',
+        'name_lower': 'edmilson monteiro rodrigues neto',
         'role': 'user',
         'company': '002.0001.001',
         'departments': ['003.0001.001'],
@@ -139,6 +399,7 @@ def test_admin_mongo(admin_object):
             )
         ),
         'name': 'Edmilson Monteiro Rodrigues Neto',
+        'name_lower': 'edmilson monteiro rodrigues neto',
         'role': 'admin',
         'departments': ['003.0001.001'],
         'registration': '001.0001.000',
@@ -150,6 +411,27 @@ def test_admin_mongo(admin_object):
     assert admin_object.mongo() == result
 
 
+def test_hydrate_user_matches_validation(user, user_object):
+    hydrated = hydrate(User, user)
+
+    assert hydrated == user_object
+    assert hydrated.role is UserRoles.USER
+    assert hydrated.created_at == datetime(2024, 12, 27, 18, 43, 19, 339384)
+
+
+def test_hydrate_admin_matches_validation(admin, admin_object):
+    assert hydrate(Admin, admin) == admin_object
+
+
+def test_hydrate_admin_skips_python_validators(admin):
+    admin['email'] = 'not validated again'
+
+    hydrated = hydrate(Admin, admin)
+
+    assert hydrated.email == 'not validated again'
+    assert hydrated.token_version == 0
+
+
 def test_verify_password(user_object):
     user_object.password = Auth.encrypt_password(
         'This is not my real password'
@@ -201,6 +483,14 @@ async def test_gen_user_registration_10000(stub_users_count_10000):
     assert await User.gen_registration('001.10001.000') == result
 
 
+@pytest.mark.asyncio(loop_scope='session')
+async def test_gen_user_registrations(stub_users_count_0):
+    assert await User.gen_registrations('001.0001.000', 2) == [
+        '001.0001.001',
+        '001.0001.002',
+    ]
+
+
 @pytest.mark.asyncio(loop_scope='session')
 async def test_create_user(user_request, stub_user_creation, time_now):
     result = User(
@@ -266,4 +556,24 @@ async def test_create_admin(admin_request, stub_admin_creation, time_now):
             CreateAdminRequest(**admin_request), '001.0001.000'
         )
 
-    assert admin == result
+    assert admin.model_dump(exclude={'id'}) == result.model_dump(
+        exclude={'id'}
+    )
+    (user,) = stub_admin_creation['users']
+    (company,) = stub_admin_creation['companies']
+    (department,) = stub_admin_creation['departments']
+    assert str(user['_id']) == admin.id
+    assert company['registration'] == '002.0001.001'
+    assert company['owner'] == '001.0001.000'
+    assert department['registration'] == '003.0001.001'
+    assert department['company'] == '002.0001.001'
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_create_admin_compensates_failed_insert(
+    admin_request, stub_failing_admin_creation
+):
+    with pytest.raises(RuntimeError):
+        await Admin.create(CreateAdminRequest(**admin_request), None)
+
+    assert stub_failing_admin_creation == {'users': [], 'companies': []}
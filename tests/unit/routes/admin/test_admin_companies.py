@@ -1,13 +1,29 @@
 import pytest
 
-from sop_chatbot.models.mixins import PaginatedResponse, Pagination
+from sop_chatbot import session
+from sop_chatbot.models.mixins import (
+    PaginatedResponse,
+    Pagination,
+    encode_cursor,
+)
+from sop_chatbot.services.auth import Auth, token_cache
+from sop_chatbot.services.jobs import jobs
+from tests.fixtures.routes_fixtures import (
+    CompanyFactory,
+    DepartmentFactory,
+    UserFactory,
+    insert,
+)
 
 
 @pytest.mark.asyncio(loop_scope='session')
 async def test_get_companies(async_client, admin_headers, fill_20_companies):
     companies = await fill_20_companies
     result = PaginatedResponse(
-        pagination=Pagination(total=20), results=companies[:10]
+        pagination=Pagination(
+            total=20, has_more=True, next_cursor=encode_cursor(companies[9].id)
+        ),
+        results=companies[:10],
     )
     del companies
     headers = await admin_headers
@@ -194,3 +210,124 @@ async def test_fail_update_company_from_other_admin(
     )
     assert response.status_code == 404
     assert response.json() == {'detail': 'Company does not exist'}
+
+
+@pytest.mark.asyncio
+async def test_delete_company(async_client, admin_headers):
+    headers = await admin_headers
+    company = CompanyFactory(registration='002.0001.002')
+    kept_department = DepartmentFactory(registration='003.0001.001')
+    deleted_department = DepartmentFactory(
+        registration='003.0001.002', company=company.registration
+    )
+    deleted_user = UserFactory(
+        registration='001.0001.001',
+        company=company.registration,
+        departments=[deleted_department.registration],
+    )
+    updated_user = UserFactory(
+        registration='001.0001.002',
+        departments=[
+            kept_department.registration,
+            deleted_department.registration,
+        ],
+    )
+    other_owner_user = UserFactory(
+        registration='001.0002.001',
+        company=company.registration,
+        owner='001.0002.000',
+    )
+    await insert('companies', company)
+    for department in (kept_department, deleted_department):
+        await insert('departments', department)
+    for user in (deleted_user, updated_user, other_owner_user):
+        await insert('users', user)
+    token = Auth.generate_jwt(deleted_user.registration, {'ver': 0})
+    response = await async_client.get(
+        '/me/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 200
+
+    response = await async_client.delete(
+        f'/admin/companies/{company.registration}', headers=headers
+    )
+    assert response.status_code == 202
+    assert response.json()['kind'] == 'delete_company'
+    assert response.json()['status'] == 'queued'
+
+    job = await jobs.run_next()
+
+    assert job.id == response.json()['id']
+    job = await jobs.get(job.id, job.owner)
+    assert job.status == 'done'
+    assert job.result == {
+        'users_deleted': 1,
+        'users_updated': 1,
+        'departments_deleted': 1,
+    }
+    assert (
+        await session.db.companies.find_one(
+            {'registration': company.registration}
+        )
+        is None
+    )
+    assert (
+        await session.db.departments.find_one(
+            {'registration': deleted_department.registration}
+        )
+        is None
+    )
+    assert await session.db.departments.find_one(
+        {'registration': kept_department.registration}
+    )
+    assert (
+        await session.db.users.find_one(
+            {'registration': deleted_user.registration}
+        )
+        is None
+    )
+    assert (
+        await session.db.users.find_one(
+            {'registration': updated_user.registration}
+        )
+    )['departments'] == [kept_department.registration]
+    assert await session.db.users.find_one(
+        {'registration': other_owner_user.registration}
+    )
+    assert token_cache.get(token) is None
+    response = await async_client.get(
+        '/me/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_fail_delete_own_company(async_client, admin_headers):
+    headers = await admin_headers
+    await insert('companies', CompanyFactory(registration='002.0001.001'))
+
+    response = await async_client.delete(
+        '/admin/companies/002.0001.001', headers=headers
+    )
+
+    assert response.status_code == 403
+    assert response.json() == {'detail': "You can't delete your own company"}
+    assert await jobs.claim() is None
+    assert await session.db.companies.find_one(
+        {'registration': '002.0001.001'}
+    )
+
+
+@pytest.mark.asyncio
+async def test_fail_delete_company_from_other_admin(
+    async_client, other_admin_headers, fill_company
+):
+    company = await fill_company
+    headers = await other_admin_headers
+
+    response = await async_client.delete(
+        f'/admin/companies/{company.registration}', headers=headers
+    )
+
+    assert response.status_code == 404
+    assert await jobs.claim() is None
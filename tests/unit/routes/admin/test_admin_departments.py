@@ -1,7 +1,20 @@
 import pytest
 
 from sop_chatbot import session
-from sop_chatbot.models.mixins import PaginatedResponse, Pagination
+from sop_chatbot.config import settings
+from sop_chatbot.models.mixins import (
+    PaginatedResponse,
+    Pagination,
+    encode_cursor,
+)
+from sop_chatbot.services.jobs import jobs
+from tests.fixtures.routes_fixtures import (
+    DepartmentFactory,
+    UserFactory,
+    insert,
+)
+
+MEMBERS_DEPARTMENT = '003.0001.002'
 
 
 @pytest.mark.asyncio(loop_scope='session')
@@ -10,7 +23,12 @@ async def test_get_departments(
 ):
     departments = await fill_20_departments
     result = PaginatedResponse(
-        pagination=Pagination(total=20), results=departments[:10]
+        pagination=Pagination(
+            total=20,
+            has_more=True,
+            next_cursor=encode_cursor(departments[9].id),
+        ),
+        results=departments[:10],
     )
     del departments
     headers = await admin_headers
@@ -178,11 +196,20 @@ async def test_delete_department(async_client, admin_headers, fill_department):
     response = await async_client.delete(
         f'/admin/departments/{department.registration}', headers=headers
     )
-    assert response.status_code == 200
-    assert response.json() == {
-        'action': 'delete',
-        'message': 'Department deleted successfully',
-    }
+    assert response.status_code == 202
+    assert response.json()['kind'] == 'delete_department'
+    assert response.json()['status'] == 'queued'
+
+    job = await jobs.run_next()
+
+    assert job.id == response.json()['id']
+    assert (await jobs.get(job.id, job.owner)).status == 'done'
+    assert (
+        await session.db.departments.find_one(
+            {'registration': department.registration}
+        )
+        is None
+    )
     assert (
         await session.db.users.find_one(
             {'departments': [department.registration]}
@@ -230,3 +257,172 @@ async def test_fail_update_department_from_other_admin(
     )
     assert response.status_code == 404
     assert response.json() == {'detail': 'Department does not exist'}
+
+
+async def fill_members() -> str:
+    """
+    Store a department and two users of the admin, one of them in the
+    department, and a user of another admin.
+    """
+    department = MEMBERS_DEPARTMENT
+    await insert('departments', DepartmentFactory(registration=department))
+    await insert('users', UserFactory(registration='001.0001.001'))
+    await insert(
+        'users',
+        UserFactory(registration='001.0001.002', departments=[department]),
+    )
+    await insert(
+        'users',
+        UserFactory(registration='001.0002.001', owner='001.0002.000'),
+    )
+    return department
+
+
+async def departments_of(registration: str) -> list[str]:
+    user = await session.db.users.find_one({'registration': registration})
+    return user['departments']
+
+
+@pytest.mark.asyncio
+async def test_add_department_users(async_client, admin_headers):
+    headers = await admin_headers
+    department = await fill_members()
+
+    response = await async_client.post(
+        f'/admin/departments/{department}/users',
+        headers=headers,
+        json={'registrations': ['001.0001.001', '001.0001.002']},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        'action': 'update',
+        'message': 'Department added to 1 users',
+    }
+    assert await departments_of('001.0001.001') == [
+        '003.0001.001',
+        department,
+    ]
+    assert await departments_of('001.0001.002') == [department]
+
+
+@pytest.mark.asyncio
+async def test_remove_department_users(async_client, admin_headers):
+    headers = await admin_headers
+    department = await fill_members()
+
+    response = await async_client.post(
+        f'/admin/departments/{department}/users/remove',
+        headers=headers,
+        json={'registrations': ['001.0001.001', '001.0001.002']},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        'action': 'update',
+        'message': 'Department removed from 1 users',
+    }
+    assert await departments_of('001.0001.001') == ['003.0001.001']
+    assert await departments_of('001.0001.002') == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('registration', ['001.0001.009', '001.0002.001'])
+async def test_fail_add_department_unknown_or_foreign_users(
+    async_client, admin_headers, registration
+):
+    headers = await admin_headers
+    department = await fill_members()
+
+    response = await async_client.post(
+        f'/admin/departments/{department}/users',
+        headers=headers,
+        json={'registrations': ['001.0001.001', registration]},
+    )
+
+    assert response.status_code == 404
+    assert response.json() == {'detail': 'User does not exist'}
+    assert await departments_of('001.0001.001') == ['003.0001.001']
+    assert await departments_of('001.0002.001') == ['003.0001.001']
+
+
+@pytest.mark.asyncio
+async def test_remove_department_leaves_foreign_users(
+    async_client, admin_headers
+):
+    department = MEMBERS_DEPARTMENT
+    headers = await admin_headers
+    await insert('departments', DepartmentFactory(registration=department))
+    await insert(
+        'users',
+        UserFactory(
+            registration='001.0002.001',
+            owner='001.0002.000',
+            departments=[department],
+        ),
+    )
+
+    response = await async_client.post(
+        f'/admin/departments/{department}/users/remove',
+        headers=headers,
+        json={'registrations': ['001.0002.001']},
+    )
+
+    assert response.status_code == 200
+    assert response.json()['message'] == 'Department removed from 0 users'
+    assert await departments_of('001.0002.001') == [department]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('path', ['users', 'users/remove'])
+async def test_fail_change_department_users_from_other_admin(
+    async_client, other_admin_headers, fill_department, path
+):
+    department = await fill_department
+    headers = await other_admin_headers
+
+    response = await async_client.post(
+        f'/admin/departments/{department.registration}/{path}',
+        headers=headers,
+        json={'registrations': ['001.0002.001']},
+    )
+
+    assert response.status_code == 404
+    assert response.json() == {'detail': 'Department does not exist'}
+
+
+@pytest.mark.asyncio
+async def test_fail_change_department_users_as_user(
+    async_client, user_headers, fill_department
+):
+    department = await fill_department
+    headers = await user_headers
+
+    response = await async_client.post(
+        f'/admin/departments/{department.registration}/users',
+        headers=headers,
+        json={'registrations': ['001.0001.001']},
+    )
+
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('size', [0, settings.MEMBERSHIP_MAX_SIZE + 1])
+async def test_fail_change_department_users_over_the_limit(
+    async_client, admin_headers, fill_department, size
+):
+    department = await fill_department
+    headers = await admin_headers
+
+    response = await async_client.post(
+        f'/admin/departments/{department.registration}/users',
+        headers=headers,
+        json={
+            'registrations': [
+                f'001.0001.{number:03}' for number in range(size)
+            ]
+        },
+    )
+
+    assert response.status_code == 422
@@ -0,0 +1,99 @@
+import pytest
+from bson import ObjectId
+
+from sop_chatbot.services.jobs import jobs
+
+
+async def enqueue(owner: str, count: int = 1) -> list[str]:
+    return [
+        (
+            await jobs.enqueue(
+                'delete_department',
+                {'registration': f'003.0001.{number:03}', 'owner': owner},
+                owner,
+            )
+        ).id
+        for number in range(1, count + 1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_jobs(async_client, admin_headers):
+    headers = await admin_headers
+    ids = await enqueue('001.0001.000', 3)
+    await enqueue('001.0002.000')
+
+    response = await async_client.get('/admin/jobs/', headers=headers)
+
+    assert response.status_code == 200
+    assert [job['id'] for job in response.json()] == ids[::-1]
+    assert {job['status'] for job in response.json()} == {'queued'}
+
+
+@pytest.mark.asyncio
+async def test_get_jobs_limit(async_client, admin_headers):
+    headers = await admin_headers
+    ids = await enqueue('001.0001.000', 3)
+
+    response = await async_client.get('/admin/jobs/?limit=2', headers=headers)
+
+    assert response.status_code == 200
+    assert [job['id'] for job in response.json()] == ids[:0:-1]
+
+
+@pytest.mark.asyncio
+async def test_fail_get_jobs_over_the_limit(async_client, admin_headers):
+    headers = await admin_headers
+
+    response = await async_client.get(
+        '/admin/jobs/?limit=101', headers=headers
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_job(async_client, admin_headers):
+    headers = await admin_headers
+    [id] = await enqueue('001.0001.000')
+    await jobs.run_next()
+
+    response = await async_client.get(f'/admin/jobs/{id}', headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()['id'] == id
+    assert response.json()['kind'] == 'delete_department'
+    assert response.json()['status'] == 'done'
+    assert response.json()['result'] == {'users_updated': 0}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('id', [str(ObjectId()), 'not an id'])
+async def test_fail_get_missing_job(async_client, admin_headers, id):
+    headers = await admin_headers
+
+    response = await async_client.get(f'/admin/jobs/{id}', headers=headers)
+
+    assert response.status_code == 404
+    assert response.json() == {'detail': 'Job does not exist'}
+
+
+@pytest.mark.asyncio
+async def test_fail_get_job_from_other_admin(
+    async_client, other_admin_headers
+):
+    headers = await other_admin_headers
+    [id] = await enqueue('001.0001.000')
+
+    response = await async_client.get(f'/admin/jobs/{id}', headers=headers)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_fail_get_jobs_as_user(async_client, user_headers):
+    headers = await user_headers
+
+    response = await async_client.get('/admin/jobs/', headers=headers)
+
+    assert response.status_code == 403
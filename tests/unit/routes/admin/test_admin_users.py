@@ -1,14 +1,21 @@
 import pytest
 
 from sop_chatbot import session
-from sop_chatbot.models.mixins import PaginatedResponse, Pagination
+from sop_chatbot.models.mixins import (
+    PaginatedResponse,
+    Pagination,
+    encode_cursor,
+)
 
 
 @pytest.mark.asyncio(loop_scope='session')
 async def test_get_users(async_client, admin_headers, fill_20_users):
     users = await fill_20_users
     result = PaginatedResponse(
-        pagination=Pagination(total=20), results=users[:10]
+        pagination=Pagination(
+            total=20, has_more=True, next_cursor=encode_cursor(users[9].id)
+        ),
+        results=users[:10],
     )
     del users
     headers = await admin_headers
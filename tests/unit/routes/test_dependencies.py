@@ -16,17 +16,25 @@ from sop_chatbot.models.mixins import (
     PaginatedResponse,
     Pagination,
 )
-from sop_chatbot.models.users import User
+from sop_chatbot.models.users import (
+    SessionClaims,
+    User,
+    UserResponse,
+    user_cache,
+)
 from sop_chatbot.routes.dependencies import (
     AdminListDependency,
     AdminObjectDependency,
     DeleteDependency,
     ListDependency,
     ObjectDependency,
+    admin_claims_dependency,
     admin_dependency,
+    claims_dependency,
     manager_dependency,
     session_dependency,
 )
+from sop_chatbot.services.auth import Auth, token_cache
 
 
 @pytest.mark.asyncio(loop_scope='session')
@@ -77,6 +85,31 @@ async def test_session_dependency_fail_user_not_found(
         assert e.status_code == 401
 
 
+@pytest.mark.asyncio(loop_scope='session')
+async def test_session_dependency_fails_without_token_version(
+    stub_find_user_user,
+):
+    with pytest.raises(HTTPException) as e:
+        await session_dependency(Auth.generate_jwt('001.0001.001'))
+    assert e.value.status_code == 401
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_session_dependency_fails_after_revoking_tokens_without_claims(
+    user_object, stub_counting_users, monkeypatch
+):
+    monkeypatch.setattr(settings, 'TOKEN_CLAIMS', False)
+    token = user_object.generate_jwt()
+    assert Auth.decode_jwt(token).keys() == {'sub', 'ver', 'exp'}
+    assert (await session_dependency(token)).registration == '001.0001.001'
+
+    await user_object.revoke_tokens()
+
+    with pytest.raises(HTTPException) as e:
+        await session_dependency(token)
+    assert e.value.status_code == 401
+
+
 @pytest.mark.asyncio(loop_scope='session')
 async def test_admin_dependency(token, stub_find_user_admin):
     result = User(
@@ -102,7 +135,7 @@ async def test_admin_dependency(token, stub_find_user_admin):
         }
     )
 
-    assert await admin_dependency(token) == result
+    assert await admin_dependency(await session_dependency(token)) == result
 
 
 @pytest.mark.asyncio(loop_scope='session')
@@ -110,7 +143,7 @@ async def test_admin_dependency_fail_lack_privileges(
     token, stub_find_user_user
 ):
     with pytest.raises(HTTPException) as e:
-        await admin_dependency(token)
+        await admin_dependency(await session_dependency(token))
         assert e.status_code == 403
 
 
@@ -141,13 +174,13 @@ async def test_manager_dependency_passes_with_admin(
         }
     )
 
-    assert await manager_dependency(token) == result
+    assert await manager_dependency(await session_dependency(token)) == result
 
 
 @pytest.mark.asyncio(loop_scope='session')
 async def test_manager_dependency_fails_with_user(token, stub_find_user_user):
     with pytest.raises(HTTPException) as e:
-        await manager_dependency(token)
+        await manager_dependency(await session_dependency(token))
         assert e.status_code == 403
 
 
@@ -180,6 +213,51 @@ async def test_call_list_dependency(
     )
 
 
+@pytest.mark.asyncio
+async def test_call_list_dependency_with_invalid_cursor(stub_find_all_users):
+    claims = SessionClaims(
+        registration='001.0001.001',
+        role='user',
+        company='002.0001.001',
+        owner='001.0001.000',
+        token_version=0,
+    )
+    with pytest.raises(HTTPException) as e:
+        await ListDependency(User)(claims, after='garbage')
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_call_list_dependency_with_unknown_fields(stub_find_all_users):
+    claims = SessionClaims(
+        registration='001.0001.001',
+        role='user',
+        company='002.0001.001',
+        owner='001.0001.000',
+        token_version=0,
+    )
+    with pytest.raises(HTTPException) as e:
+        await ListDependency(User, UserResponse)(claims, fields='password')
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_call_list_dependency_with_fields(stub_find_all_users):
+    claims = SessionClaims(
+        registration='001.0001.001',
+        role='user',
+        company='002.0001.001',
+        owner='001.0001.000',
+        token_version=0,
+    )
+    response = await ListDependency(User, UserResponse)(
+        claims, fields='name,role'
+    )
+    assert response.json()['results'] == [
+        {'name': 'Edmilson Monteiro Rodrigues Neto', 'role': 'user'}
+    ]
+
+
 @pytest.mark.asyncio
 async def test_call_admin_list_dependency(
     token, stub_find_user_admin, stub_find_all_users
@@ -205,7 +283,9 @@ async def test_call_admin_list_dependency(
     )
 
     assert (
-        await AdminListDependency(User)(await admin_dependency(token))
+        await AdminListDependency(User)(
+            await admin_dependency(await session_dependency(token))
+        )
         == result
     )
 
@@ -325,7 +405,8 @@ async def test_call_admin_object_dependency(token, stub_find_user_admin):
 
     assert (
         await AdminObjectDependency(User, foreign_key='registration')(
-            await admin_dependency(token), '001.0001.001'
+            await admin_dependency(await session_dependency(token)),
+            '001.0001.001',
         )
         == result
     )
@@ -337,7 +418,8 @@ async def test_fail_call_admin_object_dependency_object_not_found(
 ):
     with pytest.raises(HTTPException) as e:
         await AdminObjectDependency(Company, foreign_key='registration')(
-            await admin_dependency(token), '001.0001.001'
+            await admin_dependency(await session_dependency(token)),
+            '001.0001.001',
         )
         assert e.status_code == 404
 
@@ -369,7 +451,8 @@ async def test_fail_call_admin_object_dependency_unauthorized(
     with pytest.raises(HTTPException) as e:
         with monkey_patch_admin_registration():
             await AdminObjectDependency(Company)(
-                await admin_dependency(token), '002.0001.001'
+                await admin_dependency(await session_dependency(token)),
+                '002.0001.001',
             )
             assert e.status_code == 404
 
@@ -395,3 +478,115 @@ async def test_call_delete_dependency(
             )
         )
     ) == result
+
+
+@pytest.mark.parametrize(
+    ('method', 'url', 'sub', 'status_code', 'expected_calls'),
+    [
+        ('get', '/api/me/', '001.0001.001', 200, {'find_one': 1}),
+        ('post', '/api/auth/refresh', '001.0001.001', 200, {'find_one': 1}),
+        (
+            'delete',
+            '/api/admin/users/001.0001.001',
+            '001.0001.000',
+            200,
+            {'find_one': 2, 'delete_one': 1},
+        ),
+        (
+            'get',
+            '/api/admin/users/001.0001.001',
+            '001.0001.001',
+            403,
+            {'find_one': 1},
+        ),
+    ],
+)
+def test_session_is_resolved_once_per_request(
+    client,
+    stub_counting_users_and_admin,
+    method,
+    url,
+    sub,
+    status_code,
+    expected_calls,
+):
+    token = Auth.generate_jwt(sub, {'ver': 0})
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = getattr(client, method)(url, headers=headers)
+
+    assert response.status_code == status_code
+    assert stub_counting_users_and_admin == expected_calls
+    assert token_cache.stats()['misses'] == 1
+    assert token_cache.stats()['hits'] == 0
+
+
+def test_user_updates_itself_over_a_stale_cached_copy(
+    client, user, stub_counting_users
+):
+    user_cache.set(
+        user['registration'], {**user, 'updated_at': datetime(2024, 1, 1)}
+    )
+    token = Auth.generate_jwt(user['registration'], {'ver': 0})
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.put('/api/me/', json={'name': 'Other'}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Other'
+    assert stub_counting_users['update_one'] == 1
+
+
+@pytest.fixture
+def user_claims_token(user_object):
+    return Auth.generate_jwt(user_object.registration, user_object.claims())
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_claims_dependency_reads_only_token_version(
+    user_claims_token, stub_counting_users
+):
+    first = await claims_dependency(user_claims_token)
+    second = await claims_dependency(user_claims_token)
+
+    assert first == second
+    assert first.registration == '001.0001.001'
+    assert first.role == 'user'
+    assert first.company == '002.0001.001'
+    assert stub_counting_users['find_one'] == 1
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_claims_dependency_falls_back_to_user_without_claims(
+    stub_counting_users,
+):
+    claims = await claims_dependency(
+        Auth.generate_jwt('001.0001.001', {'ver': 0})
+    )
+
+    assert claims.owner == '001.0001.000'
+    assert claims.token_version == 0
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_claims_dependency_fails_with_old_token_version(
+    user_object, stub_counting_users
+):
+    user_object.token_version = 0
+    token = Auth.generate_jwt(user_object.registration, user_object.claims())
+    await user_object.revoke_tokens()
+
+    with pytest.raises(HTTPException) as e:
+        await claims_dependency(token)
+    assert e.value.status_code == 401
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_admin_claims_dependency_fails_with_user(
+    user_claims_token, stub_counting_users
+):
+    with pytest.raises(HTTPException) as e:
+        await admin_claims_dependency(
+            await claims_dependency(user_claims_token)
+        )
+    assert e.value.status_code == 403
@@ -0,0 +1,24 @@
+def test_get_pool_stats(client):
+    response = client.get('/metrics/pool')
+
+    assert response.status_code == 200
+    assert response.json()['checkouts'] >= 0
+
+
+def test_get_metrics(client):
+    client.get('/')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in (
+        response.text
+    )
+
+
+def test_get_loop_lag_stats(client):
+    response = client.get('/metrics/loop')
+
+    assert response.status_code == 200
+    assert response.json()['samples'] >= 0
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 
 import time_machine
 
-from sop_chatbot.services.auth import Auth
+from sop_chatbot.services.auth import Auth, token_cache
 
 
 def test_generate_jwt():
@@ -12,6 +12,7 @@ def test_generate_jwt():
 def test_decode_jwt(token, time_now):
     result = {
         'sub': '001.0001.000',
+        'ver': 0,
         'exp': round(
             (datetime.fromisoformat(time_now) + timedelta(days=7)).timestamp(),
             0,
@@ -24,6 +25,16 @@ def test_decode_jwt(token, time_now):
     assert payload == result
 
 
+def test_decode_jwt_with_claims(time_now):
+    with time_machine.travel(time_now, tick=False):
+        token = Auth.generate_jwt('001.0001.000', {'role': 'admin', 'ver': 1})
+        payload = Auth.decode_jwt(token)
+
+    assert payload['sub'] == '001.0001.000'
+    assert payload['role'] == 'admin'
+    assert payload['ver'] == 1
+
+
 def test_decode_jwt_expired(token, time_now):
     with time_machine.travel('2025-12-28T18:43:19.339384', tick=False):
         assert Auth.decode_jwt(token) is None
@@ -41,3 +52,33 @@ def test_verify_password():
     hashed_password = Auth.encrypt_password('password')
 
     assert Auth.verify_password('password', hashed_password)
+
+
+def test_decode_cached_jwt(token, time_now):
+    with time_machine.travel(time_now, tick=False):
+        first = Auth.decode_cached_jwt(token)
+        second = Auth.decode_cached_jwt(token)
+
+    assert first == second
+    assert token_cache.stats()['hits'] == 1
+    assert token_cache.stats()['misses'] == 1
+
+
+def test_decode_cached_jwt_expires_with_token(token, time_now):
+    with time_machine.travel(time_now, tick=False) as traveller:
+        assert Auth.decode_cached_jwt(token)
+        traveller.shift(timedelta(days=7, seconds=1))
+        assert Auth.decode_cached_jwt(token) is None
+
+
+def test_decode_cached_jwt_does_not_cache_invalid_tokens():
+    assert Auth.decode_cached_jwt('invalid_token') is None
+    assert token_cache.stats()['size'] == 0
+
+
+def test_revoke_jwts(token, time_now):
+    with time_machine.travel(time_now, tick=False):
+        Auth.decode_cached_jwt(token)
+
+        assert Auth.revoke_jwts('001.0001.000') == 1
+        assert Auth.revoke_jwts('001.0001.000') == 0
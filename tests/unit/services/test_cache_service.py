@@ -0,0 +1,86 @@
+import time_machine
+
+from sop_chatbot.services.cache import CACHES, Cache
+
+
+def test_cache_registers_itself():
+    cache = Cache('test_registers', maxsize=2, ttl=60)
+
+    assert CACHES['test_registers'] is cache
+
+
+def test_cache_counts_hits_and_misses():
+    cache = Cache('test_counts', maxsize=2, ttl=60)
+
+    assert cache.get('key') is None
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+
+    assert cache.stats() == {
+        'hits': 1,
+        'misses': 1,
+        'hit_ratio': 0.5,
+        'size': 1,
+        'maxsize': 2,
+    }
+
+
+def test_cache_expires_after_ttl(time_now):
+    cache = Cache('test_ttl', maxsize=2, ttl=60)
+
+    with time_machine.travel(time_now, tick=False) as traveller:
+        cache.set('key', 'value')
+        traveller.shift(61)
+        assert cache.get('key') is None
+
+
+def test_cache_expires_at_ttu(time_now):
+    def ttu(key, value, now):
+        return now + value
+
+    cache = Cache('test_ttu', maxsize=2, ttl=60, ttu=ttu)
+
+    with time_machine.travel(time_now, tick=False) as traveller:
+        cache.set('short', 10)
+        cache.set('long', 120)
+        traveller.shift(11)
+        assert cache.get('short') is None
+        assert cache.get('long') == 120
+        traveller.shift(50)
+        assert cache.get('long') is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = Cache('test_lru', maxsize=2, ttl=60)
+
+    cache.set('first', 1)
+    cache.set('second', 2)
+    cache.get('first')
+    cache.set('third', 3)
+
+    assert cache.get('second') is None
+    assert cache.get('first') == 1
+
+
+def test_cache_evict_by_predicate():
+    cache = Cache('test_evict', maxsize=4, ttl=60)
+    cache.set('a', {'sub': '001.0001.001'})
+    cache.set('b', {'sub': '001.0001.002'})
+    cache.set('c', {'sub': '001.0001.001'})
+
+    evicted = cache.evict(lambda key, value: value['sub'] == '001.0001.001')
+
+    assert evicted == 2
+    assert cache.get('b') == {'sub': '001.0001.002'}
+    assert cache.get('a') is None
+
+
+def test_cache_clear_resets_counters():
+    cache = Cache('test_clear', maxsize=2, ttl=60)
+    cache.set('key', 'value')
+    cache.get('key')
+
+    cache.clear()
+
+    assert cache.stats()['hits'] == 0
+    assert cache.stats()['size'] == 0
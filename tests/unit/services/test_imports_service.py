@@ -0,0 +1,58 @@
+import pytest
+
+from sop_chatbot.config import settings
+from sop_chatbot.services.imports import CSV, NDJSON, Row, read_rows
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_rows_across_chunks():
+    chunks = stream(
+        b'name,company\r\nJo',
+        'ão,002.0001.001\n\nAna,00'.encode()[:-1],
+        b'02.0001.001\nBad\n',
+    )
+
+    assert await collect(read_rows(chunks, CSV)) == [
+        Row(2, {'name': 'João', 'company': '002.0001.001'}),
+        Row(4, {'name': 'Ana', 'company': '002.0001.001'}),
+        Row(5, error='Expected 2 columns'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_read_ndjson_rows():
+    chunks = stream(b'{"name": "Ana"}\n[1]\n{"name":', b' "Jo"}\nnope')
+
+    assert await collect(read_rows(chunks, NDJSON)) == [
+        Row(1, {'name': 'Ana'}),
+        Row(2, error='Expected a JSON object'),
+        Row(3, {'name': 'Jo'}),
+        Row(4, error='Invalid JSON'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_read_rows_skips_lines_too_long(monkeypatch):
+    monkeypatch.setattr(settings, 'IMPORT_MAX_LINE_LENGTH', 16)
+    chunks = stream(
+        b'{"name": "Ana"}\n{"name": "',
+        b'x' * 100,
+        b'x' * 100 + b'"}\n{"name": "Jo"}\n',
+        b'y' * 20,
+    )
+
+    assert await collect(read_rows(chunks, NDJSON)) == [
+        Row(1, {'name': 'Ana'}),
+        Row(2, error='Line too long'),
+        Row(3, {'name': 'Jo'}),
+        Row(4, error='Line too long'),
+    ]
@@ -0,0 +1,199 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import time_machine
+from bson import ObjectId
+
+from sop_chatbot import session
+from sop_chatbot.config import settings
+from sop_chatbot.services.jobs import Jobs, JobStatus
+from tests.conftest import MockInsertOne
+
+
+def matches(document: dict, find: dict) -> bool:
+    for key, value in find.items():
+        if key == '$or':
+            if not any(matches(document, option) for option in value):
+                return False
+            continue
+        field = document.get(key)
+        if not isinstance(value, dict):
+            if field != value:
+                return False
+        elif '$in' in value and field not in value['$in']:
+            return False
+        elif '$lte' in value and (field is None or field > value['$lte']):
+            return False
+        elif '$lt' in value and (field is None or field >= value['$lt']):
+            return False
+    return True
+
+
+class MockJobsTable:
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document):
+        document['_id'] = ObjectId()
+        self.documents.append(document)
+        return MockInsertOne(document['_id'])
+
+    async def find_one(self, find):
+        for document in self.documents:
+            if matches(document, find):
+                return dict(document)
+
+    async def find_one_and_update(self, find, update, sort, **kwargs):
+        (key, _), *_ = sort
+        for document in sorted(self.documents, key=lambda d: d[key]):
+            if matches(document, find):
+                document.update(update['$set'])
+                for field, value in update['$inc'].items():
+                    document[field] += value
+                return dict(document)
+
+    async def update_one(self, find, update):
+        for document in self.documents:
+            if matches(document, find):
+                document.update(update['$set'])
+                return
+
+
+@pytest.fixture
+def stub_jobs():
+    original_db = session.db
+    session.db = {'jobs': MockJobsTable()}
+    yield session.db['jobs'].documents
+    session.db = original_db
+
+
+@pytest.fixture
+def queue():
+    queue = Jobs()
+    runs = []
+
+    @queue.handler('echo')
+    async def echo(payload):
+        runs.append(payload)
+        if payload.get('fail'):
+            raise RuntimeError('failed')
+        return payload
+
+    queue.runs = runs
+    return queue
+
+
+@pytest.mark.asyncio
+async def test_run_job(stub_jobs, queue):
+    job = await queue.enqueue('echo', {'value': 1}, '001.0001.000')
+
+    assert (await queue.run_next()).id == job.id
+    assert await queue.run_next() is None
+
+    done = await queue.get(job.id, '001.0001.000')
+    assert done.status == JobStatus.DONE
+    assert done.attempts == 1
+    assert done.result == {'value': 1}
+
+
+@pytest.mark.asyncio
+async def test_get_job_of_other_owner(stub_jobs, queue):
+    job = await queue.enqueue('echo', {}, '001.0001.000')
+
+    assert await queue.get(job.id, '001.0002.000') is None
+    assert await queue.get('not an id', '001.0001.000') is None
+
+
+@pytest.mark.asyncio
+async def test_enqueue_unknown_kind(stub_jobs, queue):
+    with pytest.raises(ValueError):
+        await queue.enqueue('unknown', {}, '001.0001.000')
+
+
+@pytest.mark.asyncio
+async def test_retry_failed_job(stub_jobs, queue):
+    job = await queue.enqueue(
+        'echo', {'fail': True}, '001.0001.000', max_attempts=2
+    )
+    start = datetime.now()
+
+    with time_machine.travel(start, tick=False):
+        await queue.run_next()
+        assert await queue.run_next() is None
+    retried = await queue.get(job.id, '001.0001.000')
+    assert retried.status == JobStatus.QUEUED
+    assert retried.error == 'RuntimeError: failed'
+
+    delay = timedelta(seconds=settings.JOB_RETRY_DELAY + 1)
+    with time_machine.travel(start + delay, tick=False):
+        await queue.run_next()
+    failed = await queue.get(job.id, '001.0001.000')
+    assert failed.status == JobStatus.FAILED
+    assert failed.attempts == 2
+    assert len(queue.runs) == 2
+
+
+@pytest.mark.asyncio
+async def test_reclaim_job_of_stopped_worker(stub_jobs, queue):
+    job = await queue.enqueue('echo', {}, '001.0001.000')
+    start = datetime.now()
+
+    with time_machine.travel(start, tick=False):
+        await queue.claim()
+        assert await queue.claim() is None
+
+    timeout = timedelta(seconds=settings.JOB_LOCK_TIMEOUT + 1)
+    with time_machine.travel(start + timeout, tick=False):
+        reclaimed = await queue.run_next()
+
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+    assert (await queue.get(job.id, '001.0001.000')).status == 'done'
+
+
+@pytest.mark.asyncio
+async def test_workers_bound_concurrency(stub_jobs, queue, monkeypatch):
+    monkeypatch.setattr(settings, 'JOB_CONCURRENCY', 2)
+    monkeypatch.setattr(settings, 'JOB_POLL_INTERVAL', 0.01)
+    running = 0
+    peak = 0
+
+    @queue.handler('sleep')
+    async def sleep(payload):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    for _ in range(6):
+        await queue.enqueue('sleep', {}, '001.0001.000')
+    queue.start()
+    while any(job['status'] != 'done' for job in stub_jobs):
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_workers_log_failed_runs(stub_jobs, queue, monkeypatch, caplog):
+    monkeypatch.setattr(settings, 'JOB_POLL_INTERVAL', 0.01)
+
+    async def update_one(find, update):
+        raise ConnectionError('connection closed')
+
+    monkeypatch.setattr(session.db['jobs'], 'update_one', update_one)
+    for _ in range(2):
+        await queue.enqueue('echo', {}, '001.0001.000')
+    queue.start()
+    while len(caplog.records) < 2:
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+    assert len(queue.runs) == 2
+    assert [str(record.exc_info[1]) for record in caplog.records] == [
+        'connection closed',
+        'connection closed',
+    ]
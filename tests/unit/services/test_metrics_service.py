@@ -0,0 +1,167 @@
+import os
+import time
+from datetime import timedelta
+
+import orjson
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pymongo import monitoring
+
+from sop_chatbot.config import settings
+from sop_chatbot.services.cache import Cache
+from sop_chatbot.services.metrics import (
+    Metrics,
+    MetricsMiddleware,
+    exposition,
+    merge,
+    metrics,
+)
+
+ADDRESS = ('localhost', 27017)
+
+
+def test_exposition_of_counters_and_histograms():
+    registry = Metrics()
+    registry.requests.inc('GET', '/users/{id}', '200')
+    registry.requests.inc('GET', '/users/{id}', '200')
+    registry.request_duration.observe('GET', '/users/{id}', value=0.003)
+    registry.request_duration.observe('GET', '/users/{id}', value=20)
+
+    text = exposition(merge([registry.collect()]))
+
+    assert '# TYPE http_requests_total counter' in text
+    assert (
+        'http_requests_total{method="GET",route="/users/{id}",status="200"} 2'
+        in text
+    )
+    labels = 'method="GET",route="/users/{id}"'
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="0.001"}} 0'
+        in text
+    )
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1'
+        in text
+    )
+    assert (
+        f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    )
+    assert f'http_request_duration_seconds_count{{{labels}}} 2' in text
+    assert f'http_request_duration_seconds_sum{{{labels}}} 20.003' in text
+
+
+def test_merge_adds_up_workers():
+    first, second = Metrics(), Metrics()
+    first.in_flight.inc('GET')
+    second.in_flight.inc('GET')
+    second.in_flight.inc('POST')
+    first.loop_lag.observe(value=0.002)
+    second.loop_lag.observe(value=0.2)
+
+    merged = merge(
+        [orjson.loads(orjson.dumps(m.collect())) for m in (first, second)]
+    )
+
+    assert merged['http_requests_in_flight']['values'] == {
+        ('GET',): 2,
+        ('POST',): 1,
+    }
+    *counts, total = merged['event_loop_lag_seconds']['values'][()]
+    assert sum(counts) == 2
+    assert total == 0.202
+
+
+def test_cache_hit_ratio():
+    cache = Cache('test_metrics_ratio', maxsize=2, ttl=60)
+    cache.set('key', 'value')
+    cache.get('key')
+    cache.get('key')
+    cache.get('missing')
+
+    text = exposition(merge([Metrics().collect()]))
+
+    assert 'cache_hits_total{cache="test_metrics_ratio"} 2' in text
+    assert 'cache_misses_total{cache="test_metrics_ratio"} 1' in text
+    assert f'cache_hit_ratio{{cache="test_metrics_ratio"}} {2 / 3}' in text
+
+
+def test_command_latencies_by_collection():
+    registry = Metrics()
+    collector = registry.command_collector
+    collector.started(
+        monitoring.CommandStartedEvent(
+            {'find': 'users', 'filter': {}}, 'sops', 1, ADDRESS, 1
+        )
+    )
+    collector.succeeded(
+        monitoring.CommandSucceededEvent(
+            timedelta(milliseconds=2), {'ok': 1}, 'find', 1, ADDRESS, 1
+        )
+    )
+    collector.started(
+        monitoring.CommandStartedEvent(
+            {'insert': 'jobs', 'documents': []}, 'sops', 2, ADDRESS, 2
+        )
+    )
+    collector.failed(
+        monitoring.CommandFailedEvent(
+            timedelta(milliseconds=1), {}, 'insert', 2, ADDRESS, 2
+        )
+    )
+
+    registry.collect()
+
+    *counts, total = registry.command_duration.values['users', 'find']
+    assert sum(counts) == 1
+    assert total == 0.002
+    assert registry.command_failures.values == {('jobs', 'insert'): 1}
+    assert not collector.commands
+
+
+def test_workers_share_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'METRICS_DIR', str(tmp_path))
+    other = Metrics()
+    other.requests.inc('GET', '/', '200')
+    (tmp_path / '1.json').write_bytes(orjson.dumps(other.collect()))
+    stale = tmp_path / '2.json'
+    stale.write_bytes(orjson.dumps(other.collect()))
+    old = time.time() - 4 * settings.METRICS_FLUSH_INTERVAL
+    os.utime(stale, (old, old))
+    registry = Metrics()
+    registry.requests.inc('GET', '/', '200')
+
+    snapshots = registry.read_snapshots(orjson.dumps(registry.collect()))
+
+    assert len(snapshots) == 2
+    assert not stale.exists()
+    assert (tmp_path / f'{os.getpid()}.json').exists()
+    assert merge(snapshots)['http_requests_total']['values'] == {
+        ('GET', '/', '200'): 2
+    }
+
+
+def test_middleware_records_route_templates():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @metrics.timed('test_dependency')
+    async def dependency(value: int = 0):
+        return value
+
+    @app.get('/items/{id}')
+    async def get_item(id: str, value: int = Depends(dependency)):
+        return {'id': id, 'value': value}
+
+    client = TestClient(app)
+    before = metrics.requests.values.get(('GET', '/items/{id}', '200'), 0)
+
+    response = client.get('/items/1', params={'value': 2})
+    client.get('/items/2')
+    client.get('/missing')
+
+    assert response.json() == {'id': '1', 'value': 2}
+    assert metrics.requests.values['GET', '/items/{id}', '200'] == before + 2
+    assert metrics.requests.values['GET', 'unmatched', '404'] >= 1
+    assert metrics.in_flight.values['GET',] == 0
+    *counts, _ = metrics.dependency_duration.values['test_dependency',]
+    assert sum(counts) >= 2
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo import monitoring
+
+from sop_chatbot import session
+from sop_chatbot.config import settings
+from sop_chatbot.services.monitoring import (
+    PoolMonitor,
+    RequestTimingMiddleware,
+    RequestTimings,
+    command_timer,
+    current_request,
+    pool_monitor,
+)
+
+ADDRESS = ('localhost', 27017)
+
+
+def command(
+    milliseconds: int, documents: int = 0
+) -> monitoring.CommandSucceededEvent:
+    reply = {'cursor': {'firstBatch': [{}] * documents}, 'ok': 1}
+    return monitoring.CommandSucceededEvent(
+        timedelta(milliseconds=milliseconds), reply, 'find', 1, ADDRESS, 1
+    )
+
+
+def timed_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestTimingMiddleware)
+
+    @app.get('/')
+    async def issue_commands(commands: int = 1):
+        for _ in range(commands):
+            # Commands run in other tasks still count for the request.
+            await asyncio.create_task(
+                asyncio.to_thread(command_timer.succeeded, command(5))
+            )
+        return {}
+
+    return app
+
+
+def test_pool_monitor_counts_connections():
+    monitor = PoolMonitor()
+
+    monitor.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+    monitor.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 2))
+    monitor.connection_closed(
+        monitoring.ConnectionClosedEvent(ADDRESS, 1, 'idle')
+    )
+    monitor.pool_cleared(monitoring.PoolClearedEvent(ADDRESS))
+
+    stats = monitor.stats()
+    assert stats.connections_created == 2
+    assert stats.connections_closed == 1
+    assert stats.connections_open == 1
+    assert stats.pools_cleared == 1
+
+
+def test_pool_monitor_records_checkout_waits():
+    monitor = PoolMonitor()
+
+    for _ in range(3):
+        monitor.connection_check_out_started(
+            monitoring.ConnectionCheckOutStartedEvent(ADDRESS)
+        )
+    monitor.connection_checked_out(
+        monitoring.ConnectionCheckedOutEvent(ADDRESS, 1, 0.01)
+    )
+    monitor.connection_checked_out(
+        monitoring.ConnectionCheckedOutEvent(ADDRESS, 2, 0.03)
+    )
+
+    stats = monitor.stats()
+    assert stats.waiters == 1
+    assert stats.max_waiters == 3
+    assert stats.connections_in_use == 2
+    assert stats.checkout_wait_mean_ms == 20
+    assert stats.checkout_wait_max_ms == 30
+
+    monitor.connection_check_out_failed(
+        monitoring.ConnectionCheckOutFailedEvent(ADDRESS, 'timeout', 0.05)
+    )
+    monitor.connection_checked_in(
+        monitoring.ConnectionCheckedInEvent(ADDRESS, 1)
+    )
+
+    stats = monitor.stats()
+    assert stats.waiters == 0
+    assert stats.checkouts == 2
+    assert stats.checkout_failures == 1
+    assert stats.connections_in_use == 1
+    assert stats.checkout_wait_max_ms == 50
+
+
+def test_connect_configures_the_pool(monkeypatch):
+    monkeypatch.setattr(settings, 'MONGO_DRIVER', 'pymongo')
+    monkeypatch.setattr(settings, 'MONGO_MAX_POOL_SIZE', 20)
+    monkeypatch.setattr(settings, 'MONGO_MIN_POOL_SIZE', 2)
+    monkeypatch.setattr(settings, 'MONGO_MAX_IDLE_TIME_MS', 60_000)
+    monkeypatch.setattr(settings, 'MONGO_WAIT_QUEUE_TIMEOUT_MS', 500)
+
+    options = session.connect(settings.TEST_MONGO_URI).options
+
+    assert options.pool_options.max_pool_size == 20
+    assert options.pool_options.min_pool_size == 2
+    assert options.pool_options.max_idle_time_seconds == 60
+    assert options.pool_options.wait_queue_timeout == 0.5
+    assert pool_monitor in options.event_listeners
+
+
+def test_connect_keeps_pool_options_of_the_uri():
+    uri = 'mongodb://localhost:27017/sops_test?maxPoolSize=7&minPoolSize=1'
+
+    options = session.connect(uri).options
+
+    assert options.pool_options.max_pool_size == 7
+    assert options.pool_options.min_pool_size == 1
+    assert options.pool_options.max_idle_time_seconds is None
+
+
+def test_command_timer_records_commands_of_the_current_request():
+    timings = RequestTimings()
+    token = current_request.set(timings)
+    try:
+        command_timer.succeeded(command(5, documents=3))
+        command_timer.failed(
+            monitoring.CommandFailedEvent(
+                timedelta(milliseconds=10), {}, 'find', 2, ADDRESS, 2
+            )
+        )
+    finally:
+        current_request.reset(token)
+    command_timer.succeeded(command(5))
+
+    assert timings.commands == 2
+    assert round(timings.db_time, 3) == 0.015
+    assert timings.db_documents == 3
+
+
+def test_server_timing_header():
+    response = TestClient(timed_app()).get('/', params={'commands': 2})
+
+    assert response.status_code == 200
+    db, app = response.headers['server-timing'].split(', ')
+    assert db == 'db;dur=10.00;desc="2 commands"'
+    assert app.startswith('app;dur=')
+
+
+def test_access_log_flags_too_many_queries(caplog, monkeypatch):
+    monkeypatch.setattr(settings, 'REQUEST_QUERY_LIMIT', 2)
+    client = TestClient(timed_app())
+
+    with caplog.at_level(logging.INFO, logger='sop_chatbot.access'):
+        client.get('/', params={'commands': 2})
+        client.get('/', params={'commands': 3})
+
+    allowed, flagged = caplog.records
+    assert allowed.levelno == logging.INFO
+    assert allowed.db_commands == 2
+    assert not allowed.too_many_queries
+    assert flagged.levelno == logging.WARNING
+    assert flagged.db_commands == 3
+    assert flagged.too_many_queries
+    assert flagged.status == 200
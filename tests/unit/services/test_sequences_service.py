@@ -0,0 +1,69 @@
+import asyncio
+import collections
+
+import pytest
+
+from sop_chatbot.services.sequences import Sequences
+from tests.conftest import mock_counters
+
+
+@pytest.fixture
+def stub_counters():
+    from sop_chatbot import session
+
+    calls = collections.Counter()
+    counters = mock_counters(0)
+
+    async def find_one_and_update(*args, **kwargs):
+        calls['find_one_and_update'] += 1
+        return await counters.find_one_and_update(*args, **kwargs)
+
+    MockCountersTable = collections.namedtuple(
+        'MockCountersTable', ('find_one_and_update',)
+    )
+    original_db = session.db
+    session.db = {
+        'counters': MockCountersTable(find_one_and_update=find_one_and_update)
+    }
+    yield calls
+    session.db = original_db
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_reserve(stub_counters):
+    sequences = Sequences()
+
+    assert await sequences.reserve('mocks:001.0001.000', 3) == range(1, 4)
+    assert await sequences.reserve('mocks:001.0001.000') == range(4, 5)
+    assert await sequences.reserve('mocks:001.0002.000') == range(1, 2)
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_next_without_blocks(stub_counters):
+    sequences = Sequences()
+
+    values = [await sequences.next('mocks:001.0001.000') for _ in range(3)]
+
+    assert values == [1, 2, 3]
+    assert stub_counters['find_one_and_update'] == 3
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_next_reserves_blocks(stub_counters):
+    sequences = Sequences(block_size=10)
+
+    values = [await sequences.next('mocks:001.0001.000') for _ in range(12)]
+
+    assert values == list(range(1, 13))
+    assert stub_counters['find_one_and_update'] == 2
+
+
+@pytest.mark.asyncio(loop_scope='session')
+async def test_concurrent_next_never_repeats(stub_counters):
+    sequences = Sequences(block_size=4)
+
+    values = await asyncio.gather(
+        *(sequences.next('mocks:001.0001.000') for _ in range(20))
+    )
+
+    assert len(set(values)) == 20
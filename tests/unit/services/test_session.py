@@ -0,0 +1,134 @@
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
+
+from sop_chatbot import session
+from sop_chatbot.config import settings
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.documents:
+            raise StopAsyncIteration
+        return self.documents.pop(0)
+
+
+class MotorCollection:
+    def aggregate(self, pipeline):
+        return Cursor([{'pipeline': pipeline}])
+
+
+class PyMongoCollection:
+    async def aggregate(self, pipeline):
+        return Cursor([{'pipeline': pipeline}])
+
+
+class Transaction:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        self.events.append('start')
+
+    async def __aexit__(self, *args):
+        self.events.append('commit')
+
+
+class MotorSession(Transaction):
+    def start_transaction(self):
+        return Transaction(self.events)
+
+
+class PyMongoSession(Transaction):
+    async def start_transaction(self):
+        return Transaction(self.events)
+
+
+class MockClient:
+    def __init__(self, session_class, awaited):
+        self.session_class = session_class
+        self.awaited = awaited
+        self.events = []
+
+    def start_session(self):
+        mongo_session = self.session_class(self.events)
+        if not self.awaited:
+            return mongo_session
+
+        async def started():
+            return mongo_session
+
+        return started()
+
+
+class MotorClient:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class PyMongoClient(MotorClient):
+    async def close(self):
+        self.closed = True
+
+
+class MockDatabase:
+    def __init__(self, client):
+        self.client = client
+
+
+@pytest.mark.parametrize(
+    ('driver', 'client_class'),
+    [('motor', AsyncIOMotorClient), ('pymongo', AsyncMongoClient)],
+)
+def test_connect(driver, client_class, monkeypatch):
+    monkeypatch.setattr(settings, 'MONGO_DRIVER', driver)
+
+    assert isinstance(session.connect(settings.TEST_MONGO_URI), client_class)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('collection', [MotorCollection, PyMongoCollection])
+async def test_aggregate(collection):
+    pipeline = [{'$match': {}}]
+
+    documents = [
+        document
+        async for document in session.aggregate(collection(), pipeline)
+    ]
+
+    assert documents == [{'pipeline': pipeline}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ('session_class', 'awaited'),
+    [(MotorSession, True), (PyMongoSession, False)],
+)
+async def test_transaction(session_class, awaited, monkeypatch):
+    client = MockClient(session_class, awaited)
+    monkeypatch.setattr(session, 'db', MockDatabase(client))
+
+    async with session.transaction() as mongo_session:
+        assert isinstance(mongo_session, session_class)
+        client.events.append('insert')
+
+    assert client.events == ['start', 'start', 'insert', 'commit', 'commit']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('client_class', [MotorClient, PyMongoClient])
+async def test_close(client_class, monkeypatch):
+    client = client_class()
+    monkeypatch.setattr(session, 'client', client)
+
+    await session.close()
+
+    assert client.closed
@@ -0,0 +1,105 @@
+import asyncio
+import asyncio.base_events
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sop_chatbot.config import settings
+from sop_chatbot.services.watchdog import (
+    Watchdog,
+    WatchdogMiddleware,
+    current_scope,
+    route_of,
+)
+
+
+@pytest.fixture
+def fast_watchdog(monkeypatch):
+    monkeypatch.setattr(settings, 'WATCHDOG_INTERVAL', 0.01)
+    monkeypatch.setattr(settings, 'WATCHDOG_THRESHOLD', 0.05)
+    return Watchdog()
+
+
+def block_the_loop():
+    time.sleep(0.2)
+
+
+def test_stats_percentiles():
+    watchdog = Watchdog()
+    watchdog.lags.extend(number / 1000 for number in range(1, 101))
+
+    stats = watchdog.stats()
+
+    assert stats.samples == 100
+    assert round(stats.p50_ms) == 50
+    assert round(stats.p99_ms) == 100
+    assert stats.max_ms == 100
+    assert stats.stalls == []
+
+
+def test_stats_without_samples():
+    stats = Watchdog().stats()
+
+    assert stats.samples == 0
+    assert stats.p99_ms == 0
+
+
+@pytest.mark.asyncio
+async def test_stall_captures_the_blocking_stack(fast_watchdog):
+    async def handle_request():
+        current_scope.set({'method': 'GET', 'path': '/slow'})
+        block_the_loop()
+
+    fast_watchdog.start()
+    await asyncio.sleep(0.05)
+    await asyncio.create_task(handle_request(), name='slow request')
+    await asyncio.sleep(0.05)
+    await fast_watchdog.stop()
+
+    (stall,) = fast_watchdog.stalls
+    assert stall.blocked_ms >= 50
+    assert stall.task == 'slow request'
+    assert stall.route == 'GET /slow'
+    assert 'block_the_loop' in stall.stack
+    assert fast_watchdog.stats().max_ms >= 150
+
+
+@pytest.mark.asyncio
+async def test_debug_mode_names_the_route_of_slow_callbacks(
+    fast_watchdog, monkeypatch, caplog
+):
+    monkeypatch.setattr(settings, 'WATCHDOG_DEBUG', True)
+    format_handle = asyncio.base_events._format_handle
+
+    async def handle_request():
+        current_scope.set({'method': 'POST', 'path': '/slow'})
+        block_the_loop()
+
+    fast_watchdog.start()
+    with caplog.at_level(logging.WARNING, logger='asyncio'):
+        await asyncio.create_task(handle_request())
+    await fast_watchdog.stop()
+
+    assert any(
+        'in route POST /slow' in record.getMessage()
+        for record in caplog.records
+        if record.name == 'asyncio'
+    )
+    assert asyncio.base_events._format_handle is format_handle
+    assert not asyncio.get_running_loop().get_debug()
+
+
+def test_middleware_keeps_the_scope_of_requests():
+    app = FastAPI()
+    app.add_middleware(WatchdogMiddleware)
+
+    @app.get('/items/{id}')
+    async def get_item(id: str):
+        return {'route': route_of(asyncio.current_task().get_context())}
+
+    response = TestClient(app).get('/items/1')
+
+    assert response.json() == {'route': 'GET /items/{id}'}